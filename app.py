@@ -1,5 +1,6 @@
 import cmd2
 
+from lib.exceptions import NotFoundError
 from lib.filesystem import Filesystem
 
 
@@ -19,7 +20,9 @@ class FilesystemApp(cmd2.Cmd):
         delattr(cmd2.Cmd, 'do_shell')
         delattr(cmd2.Cmd, 'do_shortcuts')
 
-        self.fs = Filesystem()
+        # keep a trigram index so find -x doesn't walk the whole tree
+        self.fs = Filesystem(trigram_index=True)
+        self.snapshots = {}
         self._update_prompt()
 
     def _update_prompt(self):
@@ -42,12 +45,16 @@ class FilesystemApp(cmd2.Cmd):
     ls_parser = cmd2.Cmd2ArgumentParser()
     ls_parser.add_argument('-l', action='store_true', dest='long',
                            help='show long list with type')
+    ls_parser.add_argument('-s', action='store_true', dest='sort', help='list in name order')
+    ls_parser.add_argument('-a', dest='start_after', help='list in name order, starting after this name')
+    ls_parser.add_argument('-p', dest='prefix', help='list in name order, only names starting with this')
+    ls_parser.add_argument('-n', type=int, dest='limit', help='list at most this many')
     ls_parser.add_argument('path', nargs='?', help='path to list')
 
     @cmd2.with_argparser(ls_parser)
     def do_ls(self, args):
         """List current working directory"""
-        for item in self.fs.ls(args.path, args.long):
+        for item in self.fs.ls(args.path, args.long, args.sort, args.start_after, args.limit, args.prefix):
             if args.long:
                 # long results give us a tuple, but we only need the first letter of the type
                 self.poutput('{} {}'.format(item[0][:1], item[1]))
@@ -57,12 +64,17 @@ class FilesystemApp(cmd2.Cmd):
     mkdir_parser = cmd2.Cmd2ArgumentParser()
     mkdir_parser.add_argument('-p', action='store_true', dest='create_intermediate',
                               help='create intermediate directories as required')
-    mkdir_parser.add_argument('path', help='path to create')
+    mkdir_parser.add_argument('path', nargs='+', help='paths to create')
 
     @cmd2.with_argparser(mkdir_parser)
     def do_mkdir(self, args):
         """Make a directory"""
-        self.fs.mkdir(args.path, args.create_intermediate)
+        if args.create_intermediate:
+            # every path in one pass
+            self.fs.makedirs_many(args.path)
+            return
+        for path in args.path:
+            self.fs.mkdir(path)
 
     rm_parser = cmd2.Cmd2ArgumentParser()
     rm_parser.add_argument('-f', action='store_true', dest='force', help='force removal of non-empty items')
@@ -82,21 +94,30 @@ class FilesystemApp(cmd2.Cmd):
         self.fs.touch(args.path)
 
     write_parser = cmd2.Cmd2ArgumentParser()
+    write_group = write_parser.add_mutually_exclusive_group()
+    write_group.add_argument('-a', action='store_true', dest='append', help='append to the end of the file')
+    write_group.add_argument('-o', type=int, dest='offset', help='overwrite from this byte offset')
     write_parser.add_argument('path', help='path to file to write to')
     write_parser.add_argument('contents', help='contents to write')
 
     @cmd2.with_argparser(write_parser)
     def do_write(self, args):
         """Write to a file"""
-        self.fs.write(args.path, args.contents)
+        if args.append:
+            self.fs.append(args.path, args.contents)
+        else:
+            self.fs.write(args.path, args.contents, args.offset)
 
     read_parser = cmd2.Cmd2ArgumentParser()
+    read_parser.add_argument('-o', type=int, default=0, dest='offset', help='byte offset to read from')
+    read_parser.add_argument('-n', type=int, dest='size', help='maximum number of bytes to read')
     read_parser.add_argument('path', help='path to file to read')
 
     @cmd2.with_argparser(read_parser)
     def do_read(self, args):
         """Read a file"""
-        self.poutput(self.fs.read(args.path))
+        # contents are bytes, so show anything that isn't utf-8 as replacement characters
+        self.poutput(self.fs.read(args.path, args.offset, args.size).decode(errors='replace'))
 
     mv_parser = cmd2.Cmd2ArgumentParser()
     mv_parser.add_argument('-f', action='store_true', dest='force_overwrite', help='force overwrite')
@@ -121,14 +142,45 @@ class FilesystemApp(cmd2.Cmd):
     find_parser = cmd2.Cmd2ArgumentParser()
     find_parser.add_argument('-x', action='store_true', dest='fuzzy', help='fuzzy search')
     find_parser.add_argument('-r', action='store_true', dest='recursive', help='recursive search')
-    find_parser.add_argument('path', help='path to remove')
+    find_parser.add_argument('-n', type=int, dest='limit', help='stop after this many results')
+    find_parser.add_argument('-d', type=int, dest='max_depth', help='search at most this many levels deep')
+    find_parser.add_argument('path', help='name to find')
 
     @cmd2.with_argparser(find_parser)
     def do_find(self, args):
         """Find a file or directory"""
-        for item in self.fs.find(args.path, args.fuzzy, args.recursive):
+        # print results as they are found rather than all at the end
+        for item in self.fs.ifind(args.path, args.fuzzy, args.recursive, args.limit, args.max_depth):
             self.poutput(item)
 
+    du_parser = cmd2.Cmd2ArgumentParser()
+    du_parser.add_argument('path', nargs='?', help='path to count')
+
+    @cmd2.with_argparser(du_parser)
+    def do_du(self, args):
+        """Count the dirs, files and bytes in a directory"""
+        usage = self.fs.du(args.path)
+        self.poutput('{} dirs, {} files, {} bytes'.format(usage.dirs, usage.files, usage.size))
+
+    snapshot_parser = cmd2.Cmd2ArgumentParser()
+    snapshot_parser.add_argument('name', help='name to save the snapshot as')
+
+    @cmd2.with_argparser(snapshot_parser)
+    def do_snapshot(self, args):
+        """Snapshot the filesystem"""
+        self.snapshots[args.name] = self.fs.snapshot()
+
+    restore_parser = cmd2.Cmd2ArgumentParser()
+    restore_parser.add_argument('name', help='name of the snapshot to restore')
+
+    @cmd2.with_argparser(restore_parser)
+    def do_restore(self, args):
+        """Restore a snapshot of the filesystem"""
+        if args.name not in self.snapshots:
+            raise NotFoundError(args.name)
+        self.fs.restore(self.snapshots[args.name])
+        self._update_prompt()
+
 
 if __name__ == '__main__':
     app = FilesystemApp()
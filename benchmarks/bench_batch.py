@@ -0,0 +1,40 @@
+import time
+
+from benchmarks.common import report
+from lib.filesystem import Filesystem
+
+DIRS = 500
+FILES = 200
+
+
+def ops():
+    # DIRS dirs four levels down with FILES files each, every file touched then written
+    for d in range(DIRS):
+        path = '/data/region{}/host{}/logs/d{}'.format(d % 5, d % 50, d)
+        yield 'mkdir', path, True
+        for f in range(FILES):
+            yield 'touch', '{}/f{}'.format(path, f)
+            yield 'write', '{}/f{}'.format(path, f), b'x'
+
+
+def timed(populate) -> float:
+    fs = Filesystem()
+    start = time.perf_counter()
+    populate(fs)
+    return time.perf_counter() - start
+
+
+def main():
+    def one_by_one(fs: Filesystem):
+        for op, *args in ops():
+            getattr(fs, op)(*args)
+
+    rows = [
+        ('one op at a time', '{:.2f} s'.format(timed(one_by_one))),
+        ('batch', '{:.2f} s'.format(timed(lambda fs: fs.batch(ops())))),
+    ]
+    report('populate ({} files)'.format(DIRS * FILES), rows)
+
+
+if __name__ == '__main__':
+    main()
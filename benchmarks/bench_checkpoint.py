@@ -0,0 +1,64 @@
+import os
+import tempfile
+import time
+
+from benchmarks.common import report
+from lib.filesystem import Filesystem
+
+DIRS = 200
+FILES = 50
+SIZE = 4096
+
+
+def build(wal: str) -> Filesystem:
+    # DIRS dirs of FILES files, every change logged
+    fs = Filesystem(wal=wal, wal_group_size=1024 * 1024, wal_group_delay=60)
+    for d in range(DIRS):
+        fs.mkdir('/d{}'.format(d))
+        fs.batch(op for f in range(FILES) for op in (
+            ('touch', '/d{}/f{}'.format(d, f)), ('write', '/d{}/f{}'.format(d, f), bytes([f]) * SIZE)))
+    fs.sync()
+    return fs
+
+
+def timed(func) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        wal = os.path.join(tmp, 'wal')
+        checkpoint = os.path.join(tmp, 'checkpoint')
+        fs = build(wal)
+        size = os.path.getsize(wal)
+        replay = timed(lambda: Filesystem.recover(wal).close())
+        save = timed(lambda: fs.save_checkpoint(checkpoint))
+        fs.close()
+
+        def restart():
+            # load, then touch one dir and one file the way a service's first request would
+            loaded = Filesystem.recover(wal, checkpoint)
+            loaded.read('/d0/f0')
+            loaded.close()
+        load = timed(restart)
+
+        def read_all():
+            loaded = Filesystem.load_checkpoint(checkpoint)
+            for d in range(DIRS):
+                for f in range(FILES):
+                    loaded.read('/d{}/f{}'.format(d, f))
+        full = timed(read_all)
+
+        rows = [
+            ('replay log ({:,} bytes)'.format(size), '{:.3f} s'.format(replay)),
+            ('save checkpoint ({:,} bytes)'.format(os.path.getsize(checkpoint)), '{:.3f} s'.format(save)),
+            ('recover from checkpoint, first read', '{:.4f} s'.format(load)),
+            ('load checkpoint, read every file', '{:.3f} s'.format(full)),
+        ]
+    report('restart ({} dirs x {} files of {} bytes)'.format(DIRS, FILES, SIZE), rows)
+
+
+if __name__ == '__main__':
+    main()
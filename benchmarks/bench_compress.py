@@ -0,0 +1,45 @@
+import random
+
+from benchmarks.common import measure, per_op, report
+from lib.filesystem import Filesystem
+
+FILES = 2000
+LINES = 200
+WORDS = ['lorem', 'ipsum', 'dolor', 'sit', 'amet', 'consectetur', 'adipiscing', 'elit', 'sed', 'do', 'eiusmod']
+
+
+def text(rand: random.Random) -> bytes:
+    return '\n'.join(' '.join(rand.choice(WORDS) for _ in range(10)) for _ in range(LINES)).encode()
+
+
+def main():
+    rows = []
+    for label, kwargs in [
+        ('no budget', {}),
+        ('zlib 1 MiB', {'memory_budget': 1024 * 1024}),
+        ('lzma 1 MiB', {'memory_budget': 1024 * 1024, 'compression': 'lzma'}),
+    ]:
+        def build() -> Filesystem:
+            # a dir of distinct text files that are written once and rarely read
+            rand = random.Random(0)
+            fs = Filesystem(**kwargs)
+            fs.mkdir('/logs')
+            for f in range(FILES):
+                fs.touch('/logs/file{}'.format(f))
+                fs.write('/logs/file{}'.format(f), text(rand))
+            return fs
+
+        fs, size = measure(build)
+        stats = fs.stats()
+        rows.append(('{} memory'.format(label), '{:.1f} MiB for {:.1f} MiB of text'.format(
+            size / 1024 / 1024, stats.size / 1024 / 1024)))
+        reads = iter(range(FILES))
+        read = per_op(lambda: fs.read('/logs/file{}'.format(next(reads))), FILES)
+        info = fs.compression_info()
+        rows.append(('{} cold read'.format(label), '{:.1f} us, ratio {:.1f}x, {:.1f} us per decompress'.format(
+            read, info.ratio, info.unpack_time * 1e6)))
+    report('compression ({} files of {} lines)'.format(FILES, LINES), rows)
+
+
+if __name__ == '__main__':
+    main()
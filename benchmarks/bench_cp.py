@@ -0,0 +1,46 @@
+from benchmarks.common import measure, per_op, report
+from lib.filesystem import Filesystem
+
+DIRS = 1000
+FILES = 100
+COPIES = 100
+
+
+def build() -> Filesystem:
+    # a template of DIRS dirs with FILES files each, around 100k nodes
+    fs = Filesystem()
+    for d in range(DIRS):
+        path = '/template/dir{}'.format(d)
+        fs.mkdir(path, True)
+        for f in range(FILES):
+            fs.touch('{}/file{}'.format(path, f))
+    return fs
+
+
+def main():
+    fs = build()
+    copies = iter(range(COPIES * 10))
+
+    def copy():
+        fs.cp('/template', '/tenant{}'.format(next(copies)))
+
+    rows = [('cp template', '{:.1f} us'.format(per_op(copy, COPIES)))]
+
+    # what holding on to a fresh set of copies costs
+    _, size = measure(lambda: [copy() for _ in range(COPIES)])
+    rows.append(('cp template x{} memory'.format(COPIES), '{:.1f} KiB'.format(size / 1024)))
+
+    # the first write into a copy pays for the path to the change, later ones don't
+    writes = iter(range(COPIES))
+
+    def write():
+        fs.write('/tenant{}/dir500/file50'.format(next(writes)), 'changed')
+
+    rows.append(('first write into copy', '{:.1f} us'.format(per_op(write, COPIES))))
+    rows.append(('later write into copy', '{:.1f} us'.format(per_op(lambda: fs.write('/tenant0/dir500/file50', 'x'),
+                                                                      COPIES))))
+    report('cp ({} node template)'.format(DIRS * (FILES + 1)), rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+from benchmarks.common import measure, report
+from lib.filesystem import Filesystem
+
+TENANTS = 1000
+CONFIGS = 20
+CONFIG = b'\n'.join(b'setting_%d = %d' % (i, i * i) for i in range(200))
+
+
+def main():
+    rows = []
+    for label, copy in [('written', False), ('copied', True)]:
+        def build() -> Filesystem:
+            # every tenant gets the same set of configs, either written one by one or copied from a template
+            fs = Filesystem()
+            fs.mkdir('/template')
+            for c in range(CONFIGS):
+                fs.touch('/template/config{}'.format(c))
+                fs.write('/template/config{}'.format(c), CONFIG)
+            for t in range(TENANTS):
+                if copy:
+                    fs.cp('/template', '/tenant{}'.format(t))
+                    # and one change each so the copies aren't entirely shared
+                    fs.write('/tenant{}/config0'.format(t), CONFIG + b'\n')
+                else:
+                    fs.mkdir('/tenant{}'.format(t))
+                    for c in range(CONFIGS):
+                        fs.touch('/tenant{}/config{}'.format(t, c))
+                        fs.write('/tenant{}/config{}'.format(t, c), CONFIG)
+            return fs
+
+        fs, size = measure(build)
+        stats = fs.stats()
+        rows.append(('{} memory'.format(label), '{:.1f} MiB'.format(size / 1024 / 1024)))
+        rows.append(('{} contents'.format(label), '{:.1f} MiB in files, {:.1f} KiB stored, {:.0f}x'.format(
+            stats.size / 1024 / 1024, stats.stored / 1024, stats.dedup_ratio)))
+    report('dedup ({} tenants x {} configs of {} bytes)'.format(TENANTS, CONFIGS, len(CONFIG)), rows)
+
+
+if __name__ == '__main__':
+    main()
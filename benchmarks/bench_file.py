@@ -0,0 +1,30 @@
+from benchmarks.common import per_op, report
+from lib.filesystem import Filesystem
+
+SIZE = 128 * 1024 * 1024
+RECORD = b'x' * 100
+OPS = 100
+
+
+def main():
+    rows = []
+    for label, chunk_size in [
+        ('contiguous', 1 << 40),
+        ('64 KiB chunks', 64 * 1024),
+    ]:
+        fs = Filesystem(chunk_size=chunk_size)
+        fs.touch('/big')
+        fs.write('/big', bytes(SIZE))
+        middle = SIZE // 2
+        rows.append(('{} append'.format(label), '{:.1f} us'.format(per_op(lambda: fs.append('/big', RECORD), OPS))))
+        rows.append(('{} overwrite middle'.format(label),
+                     '{:.1f} us'.format(per_op(lambda: fs.write('/big', RECORD, middle), OPS))))
+        rows.append(('{} insert middle'.format(label),
+                     '{:.1f} us'.format(per_op(lambda: fs.insert('/big', RECORD, middle), OPS))))
+        rows.append(('{} stream read'.format(label),
+                     '{:.1f} us'.format(per_op(lambda: sum(len(v) for v in fs.iread('/big')), 1))))
+    report('file ({} MiB)'.format(SIZE // 1024 // 1024), rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+from benchmarks.common import per_op, report
+from lib.filesystem import Filesystem
+
+TENANTS = 200
+DIRS = 10
+FILES = 20
+
+
+def build(**kwargs) -> Filesystem:
+    # TENANTS tenants of DIRS dirs with FILES files each, one config per tenant
+    fs = Filesystem(**kwargs)
+    for t in range(TENANTS):
+        for d in range(DIRS):
+            path = '/tenants/t{}/d{}'.format(t, d)
+            fs.mkdir(path, True)
+            for f in range(FILES):
+                fs.touch('{}/t{}-d{}-file{}.txt'.format(path, t, d, f))
+        fs.touch('/tenants/t{}/config.yaml'.format(t))
+    return fs
+
+
+def main():
+    rows = []
+    for label, kwargs in [
+        ('scan', {}),
+        ('name index', {'name_index': True}),
+        ('trigram index', {'trigram_index': True}),
+    ]:
+        fs = build(**kwargs)
+        rows.append(('{} exact find'.format(label),
+                     '{:.2f} ms'.format(per_op(lambda: fs.find('config.yaml', recursive=True), 10) / 1000)))
+        rows.append(('{} fuzzy find'.format(label),
+                     '{:.2f} ms'.format(per_op(lambda: fs.find('fig.y', fuzzy=True, recursive=True), 10) / 1000)))
+        rows.append(('{} short fuzzy find'.format(label),
+                     '{:.2f} ms'.format(per_op(lambda: fs.find('ml', fuzzy=True, recursive=True), 10) / 1000)))
+    report('find ({} entries)'.format(TENANTS * DIRS * (FILES + 1) + TENANTS * 2 + 1), rows)
+
+
+if __name__ == '__main__':
+    main()
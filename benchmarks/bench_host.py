@@ -0,0 +1,40 @@
+import os
+import tempfile
+import time
+
+from benchmarks.common import report
+from lib.filesystem import Filesystem
+
+DIRS = 100
+FILES = 200
+SIZE = 4096
+
+
+def timed(func) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def main():
+    with tempfile.TemporaryDirectory() as host:
+        # a fixture tree of DIRS dirs with FILES files each on the host
+        src = os.path.join(host, 'src')
+        for d in range(DIRS):
+            os.makedirs(os.path.join(src, 'd{}'.format(d)))
+            for f in range(FILES):
+                with open(os.path.join(src, 'd{}'.format(d), 'f{}'.format(f)), 'wb') as fh:
+                    fh.write(os.urandom(SIZE))
+        rows = []
+        for workers in [0, 8]:
+            fs = Filesystem()
+            rows.append(('import, {} workers'.format(workers),
+                         '{:.2f} s'.format(timed(lambda: fs.import_tree(src, '/src', workers)))))
+            out = os.path.join(host, 'out{}'.format(workers))
+            rows.append(('export, {} workers'.format(workers),
+                         '{:.2f} s'.format(timed(lambda: fs.export_tree('/src', out, workers)))))
+        report('host trees ({} files of {} bytes)'.format(DIRS * FILES, SIZE), rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,33 @@
+from itertools import count
+
+from benchmarks.common import per_op, report
+from lib.filesystem import Filesystem
+
+ENTRIES = 1000000
+PAGE = 100
+
+
+def main():
+    # one spool dir with ENTRIES files, created out of order
+    fs = Filesystem(cache_size=0)
+    fs.mkdir('/spool')
+    for i in range(ENTRIES):
+        fs.touch('/spool/msg{:07}'.format((i * 7919) % ENTRIES))
+    middle = 'msg{:07}'.format(ENTRIES // 2)
+    new = count()
+    rows = [
+        ('ls, whole dir', '{:.2f} ms'.format(per_op(lambda: fs.ls('/spool'), 3) / 1000)),
+        ('sorted(ls), whole dir', '{:.2f} ms'.format(per_op(lambda: sorted(fs.ls('/spool')), 3) / 1000)),
+        # the first sorted ls builds the order, every page after it is a bisect
+        ('first sorted page', '{:.2f} ms'.format(per_op(lambda: fs.ls('/spool', sort=True, limit=PAGE), 1) / 1000)),
+        ('sorted page', '{:.1f} us'.format(per_op(lambda: fs.ls('/spool', sort=True, limit=PAGE), 100))),
+        ('page after a name', '{:.1f} us'.format(per_op(lambda: fs.ls('/spool', start_after=middle, limit=PAGE), 100))),
+        ('page of a prefix', '{:.1f} us'.format(per_op(lambda: fs.ls('/spool', prefix='msg05', limit=PAGE), 100))),
+        ('touch with the order kept', '{:.1f} us'.format(
+            per_op(lambda: fs.touch('/spool/new{}'.format(next(new))), 1000))),
+    ]
+    report('ls ({} entries, {} per page)'.format(ENTRIES, PAGE), rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+import time
+
+from benchmarks.common import report
+from lib.filesystem import Filesystem
+
+TENANTS = 2000
+LAYOUT = ['logs/app', 'logs/audit', 'data/cache', 'data/uploads/tmp', 'config', 'spool/in', 'spool/out']
+
+
+def paths():
+    # the same nested layout for every tenant
+    return ['/tenants/t{}/{}'.format(t, d) for t in range(TENANTS) for d in LAYOUT]
+
+
+def timed(create) -> float:
+    fs = Filesystem()
+    start = time.perf_counter()
+    create(fs)
+    return time.perf_counter() - start
+
+
+def main():
+    def one_by_one(fs: Filesystem):
+        for path in paths():
+            fs.mkdir(path, True)
+
+    rows = [
+        ('mkdir -p per path', '{:.2f} s'.format(timed(one_by_one))),
+        ('makedirs_many', '{:.2f} s'.format(timed(lambda fs: fs.makedirs_many(paths())))),
+    ]
+    report('makedirs ({} paths)'.format(TENANTS * len(LAYOUT)), rows)
+
+
+if __name__ == '__main__':
+    main()
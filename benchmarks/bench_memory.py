@@ -0,0 +1,54 @@
+from benchmarks.common import measure, per_op, report
+from lib.directory import Directory
+from lib.file import File
+from lib.filesystem import Filesystem
+from lib.inode import InodeFilesystem
+
+NODES = 100000
+
+
+def main():
+    rows = []
+    for label, cls in [('empty file', File), ('empty dir', Directory)]:
+        # the nodes on their own, then what the filesystem holds for each one in a dir full of them
+        nodes, size = measure(lambda: [cls() for _ in range(NODES)])
+        rows.append(('{} node'.format(label), '{:.0f} bytes'.format(size / NODES)))
+
+        def build() -> Filesystem:
+            fs = Filesystem(cache_size=0)
+            fs.mkdir('/dir')
+            make = fs.touch if cls is File else fs.mkdir
+            for i in range(NODES):
+                make('/dir/n{}'.format(i))
+            return fs
+
+        fs, size = measure(build)
+        rows.append(('{} in tree'.format(label), '{:.0f} bytes'.format(size / NODES)))
+    # the hot paths that check the type of every node they pass
+    rows.append(('ls -l of {} nodes'.format(NODES), '{:.0f} us'.format(per_op(lambda: fs.ls('/dir', True), 10))))
+    rows.append(('find over {} nodes'.format(NODES),
+                 '{:.0f} us'.format(per_op(lambda: fs.find('nope', recursive=True), 10))))
+    report('memory ({} nodes)'.format(NODES), rows)
+
+    # the same trees in both engines: every name unique, then names repeated across dirs like most real trees
+    rows = []
+    shapes = [('unique names', 1, NODES), ('repeated names', NODES // 100, 100)]
+    for shape, dirs, files in shapes:
+        for engine, make_fs in [('tree', lambda: Filesystem(cache_size=0)), ('inode table', InodeFilesystem)]:
+            def build():
+                fs = make_fs()
+                for d in range(dirs):
+                    fs.mkdir('/d{}'.format(d))
+                    for f in range(files):
+                        fs.touch('/d{}/f{}'.format(d, f if dirs > 1 else d * files + f))
+                return fs
+
+            fs, size = measure(build)
+            rows.append(('{}, {}'.format(shape, engine), '{:.0f} bytes'.format(size / (dirs + dirs * files))))
+            rows.append(('{}, {} find'.format(shape, engine),
+                         '{:.0f} us'.format(per_op(lambda: fs.find('f1', recursive=True), 10))))
+    report('engines ({} nodes)'.format(NODES), rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+from benchmarks.common import measure, per_op, report
+from lib.filesystem import Filesystem
+
+DEPTH = 50
+WIDTH = 20
+FILES = 10
+
+
+def build(**kwargs) -> Filesystem:
+    # a WIDTH wide fan of DEPTH deep chains with FILES files at every level
+    fs = Filesystem(**kwargs)
+    for w in range(WIDTH):
+        path = '/tenant{}'.format(w)
+        for d in range(DEPTH):
+            path = '{}/level{}'.format(path, d)
+            fs.mkdir(path, True)
+            for f in range(FILES):
+                fs.touch('{}/file{}'.format(path, f))
+    return fs
+
+
+def main():
+    deep = '/tenant7' + ''.join('/level{}'.format(d) for d in range(DEPTH)) + '/file3'
+    rows = []
+    for label, kwargs in [
+        ('walk', {'cache_size': 0}),
+        ('cache', {}),
+        ('index', {'path_index': True}),
+    ]:
+        fs, size = measure(lambda: build(**kwargs))
+        rows.append(('{} read depth {}'.format(label, DEPTH), '{:.2f} us'.format(per_op(lambda: fs.read(deep), 20000))))
+        rows.append(('{} exists depth {}'.format(label, DEPTH),
+                     '{:.2f} us'.format(per_op(lambda: fs.exists(deep), 20000))))
+        rows.append(('{} memory'.format(label), '{:.1f} MB'.format(size / 2 ** 20)))
+        if label == 'walk':
+            base = size
+        if label == 'index':
+            nodes = WIDTH * DEPTH * (FILES + 1) + WIDTH
+            rows.append(('index extra per node', '{:.1f} B'.format((size - base) / nodes)))
+            rows.append(('index extra per dir', '{:.1f} B'.format((size - base) / (WIDTH * (DEPTH + 1)))))
+    report('path index ({} dirs, {} files)'.format(WIDTH * (DEPTH + 1), WIDTH * DEPTH * FILES), rows)
+
+
+if __name__ == '__main__':
+    main()
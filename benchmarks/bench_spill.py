@@ -0,0 +1,54 @@
+import os
+import tempfile
+import time
+
+from benchmarks.common import measure, report
+from lib.filesystem import Filesystem
+
+FILES = 200
+SIZE = 256 * 1024
+BUDGET = 4 * 1024 * 1024
+
+
+def main():
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, kwargs, read_ahead in [
+            ('no budget', {}, None),
+            ('zlib 4 MiB', {'memory_budget': BUDGET}, None),
+            ('spill 4 MiB, no read-ahead', {'memory_budget': BUDGET, 'spill_dir': tmp}, 0),
+            ('spill 4 MiB', {'memory_budget': BUDGET, 'spill_dir': tmp}, 8),
+        ]:
+            def build() -> Filesystem:
+                # distinct files that don't compress, many times the budget between them
+                fs = Filesystem(**kwargs)
+                if read_ahead is not None:
+                    fs._blobs.READ_AHEAD = read_ahead
+                fs.mkdir('/data')
+                for f in range(FILES):
+                    fs.touch('/data/file{}'.format(f))
+                    fs.write('/data/file{}'.format(f), os.urandom(SIZE))
+                return fs
+
+            fs, size = measure(build)
+            segment = fs._blobs._segment
+            if segment is not None:
+                # drop the segment file from the page cache, so reads go to the disk as they would on a busy host
+                os.fsync(segment.fileno())
+                os.posix_fadvise(segment.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+            start = time.perf_counter()
+            for f in range(FILES):
+                fs.read('/data/file{}'.format(f))
+            elapsed = time.perf_counter() - start
+            info = fs.spill_info()
+            rows.append(('{} memory'.format(label), '{:.1f} MiB for {:.1f} MiB of files'.format(
+                size / 1024 / 1024, FILES * SIZE / 1024 / 1024)))
+            rows.append(('{} read all'.format(label), '{:.0f} MiB/s, hit rate {:.2f}, {:,} read ahead, {:.1f} us per '
+                         'page-in'.format(FILES * SIZE / 1024 / 1024 / elapsed, info.hit_rate, info.read_ahead,
+                                          info.page_time * 1e6)))
+            del fs
+    report('tiered storage ({} files of {} KiB)'.format(FILES, SIZE // 1024), rows)
+
+
+if __name__ == '__main__':
+    main()
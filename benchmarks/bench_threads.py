@@ -0,0 +1,75 @@
+import os
+import tempfile
+import threading
+import time
+
+from benchmarks.common import report
+from lib.filesystem import Filesystem
+from lib.rwlock import RWLock
+
+FILES = 400
+SIZE = 64 * 1024
+READS = 800
+
+
+class ExclusiveLock(RWLock):
+    # every read takes the lock alone, as one plain mutex around the filesystem would
+    def acquire_read(self):
+        self.acquire_write()
+
+    def release_read(self):
+        self.release_write()
+
+
+def build(tmp: str, **options) -> Filesystem:
+    # files spilled to disk, so reads wait on it the way they would on a tree larger than memory
+    fs = Filesystem(memory_budget=1024 * 1024, spill_dir=tmp, **options)
+    fs._blobs.READ_AHEAD = 0
+    fs.mkdir('/data')
+    for f in range(FILES):
+        fs.touch('/data/f{}'.format(f))
+        fs.write('/data/f{}'.format(f), os.urandom(SIZE))
+    return fs
+
+
+def drop(fs: Filesystem):
+    # drop the segment file from the page cache so every read goes to the disk
+    segment = fs._blobs._segment
+    os.fsync(segment.fileno())
+    os.posix_fadvise(segment.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+
+
+def reads_per_second(fs: Filesystem, threads: int) -> float:
+    drop(fs)
+
+    def run(n: int):
+        for i in range(n, READS, threads):
+            fs.read('/data/f{}'.format(i * 7919 % FILES))
+
+    workers = [threading.Thread(target=run, args=(n,)) for n in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return READS / (time.perf_counter() - start)
+
+
+def main():
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        fs = build(tmp)
+        rows.append(('not thread safe, 1 thread', '{:,.0f} reads/s'.format(reads_per_second(fs, 1))))
+        fs = build(tmp, thread_safe=True)
+        for threads in (1, 2, 4, 8):
+            rows.append(('shared reads, {} threads'.format(threads),
+                         '{:,.0f} reads/s'.format(reads_per_second(fs, threads))))
+        fs._lock = ExclusiveLock()
+        for threads in (1, 8):
+            rows.append(('exclusive lock, {} threads'.format(threads),
+                         '{:,.0f} reads/s'.format(reads_per_second(fs, threads))))
+    report('concurrent reads ({} reads of {} KiB files paged from disk)'.format(READS, SIZE // 1024), rows)
+
+
+if __name__ == '__main__':
+    main()
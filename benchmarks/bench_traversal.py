@@ -0,0 +1,46 @@
+import time
+
+from benchmarks.common import report
+from lib.filesystem import Filesystem
+
+DEEP = 100000
+WIDE = 1000000
+
+
+def timed(func) -> str:
+    start = time.perf_counter()
+    func()
+    return '{:.2f} s'.format(time.perf_counter() - start)
+
+
+def main():
+    rows = []
+
+    # a single chain of dirs with a file at the bottom
+    fs = Filesystem()
+    path = '/d' * DEEP
+    rows.append(('deep mkdir -p', timed(lambda: fs.mkdir(path, True))))
+    fs.touch('{}/x'.format(path))
+    rows.append(('deep find', timed(lambda: fs.find('x', recursive=True))))
+    rows.append(('deep cp', timed(lambda: fs.cp('/d', '/copy'))))
+    rows.append(('deep du', timed(lambda: fs.du('/copy'))))
+    rows.append(('deep rm -f', timed(lambda: fs.rm('/copy', True))))
+
+    # a single dir full of files
+    fs = Filesystem()
+    fs.mkdir('/wide')
+
+    def populate():
+        for i in range(WIDE):
+            fs.touch('/wide/file{}'.format(i))
+
+    rows.append(('wide touch', timed(populate)))
+    rows.append(('wide find', timed(lambda: fs.find('file999999', recursive=True))))
+    rows.append(('wide fuzzy find', timed(lambda: fs.find('99999', fuzzy=True, recursive=True))))
+    rows.append(('wide cp', timed(lambda: fs.cp('/wide', '/copy'))))
+    rows.append(('wide du', timed(lambda: fs.du('/copy'))))
+    report('traversal ({} deep, {} wide)'.format(DEEP, WIDE), rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+import os
+import tempfile
+import time
+
+from benchmarks.common import report
+from lib.filesystem import Filesystem
+
+FILES = 2000
+
+
+def ops_per_second(logged: bool, **options) -> float:
+    # touch and write FILES files, then sync whatever is left so every change is on disk
+    with tempfile.TemporaryDirectory() as tmp:
+        fs = Filesystem(wal=os.path.join(tmp, 'wal') if logged else None, **options)
+        start = time.perf_counter()
+        for i in range(FILES):
+            fs.touch('/f{}'.format(i))
+            fs.write('/f{}'.format(i), b'x' * 100)
+        fs.sync()
+        elapsed = time.perf_counter() - start
+        fs.close()
+    return FILES * 2 / elapsed
+
+
+def main():
+    rows = [
+        ('no log', '{:,.0f} ops/s'.format(ops_per_second(False))),
+        ('fsync per op', '{:,.0f} ops/s'.format(ops_per_second(True, wal_group_size=0))),
+        ('group commit, 64 KiB / 5 ms', '{:,.0f} ops/s'.format(ops_per_second(True))),
+    ]
+    report('write-ahead log ({} ops)'.format(FILES * 2), rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+import time
+import tracemalloc
+from typing import Any, Callable, Tuple
+
+
+def per_op(func: Callable, ops: int) -> float:
+    # average microseconds per call of func over ops calls
+    start = time.perf_counter()
+    for _ in range(ops):
+        func()
+    return (time.perf_counter() - start) / ops * 1e6
+
+
+def measure(build: Callable[[], Any]) -> Tuple[Any, int]:
+    # build something and return it with the bytes it is still holding on to
+    tracemalloc.start()
+    try:
+        result = build()
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return result, size
+
+
+def report(title: str, rows: list):
+    print(title)
+    width = max(len(row[0]) for row in rows)
+    for label, value in rows:
+        print('  {}  {}'.format(label.ljust(width), value))
+    print()
@@ -0,0 +1,300 @@
+import lzma
+import os
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict, namedtuple
+from typing import List, Sequence, Tuple
+from weakref import WeakValueDictionary, finalize, ref
+
+BlobInfo = namedtuple('BlobInfo', ['hits', 'misses', 'blobs', 'size'])
+CompressionInfo = namedtuple('CompressionInfo', ['packed', 'ratio', 'unpacks', 'unpack_time'])
+SpillInfo = namedtuple('SpillInfo', ['hits', 'misses', 'hit_rate', 'evictions', 'eviction_rate', 'read_ahead',
+                                     'page_time', 'segment_size'])
+
+COMPRESSORS = {
+    'zlib': (zlib.compress, zlib.decompress),
+    'lzma': (lzma.compress, lzma.decompress),
+}
+
+
+def digest(data: bytes) -> int:
+    # a blob's key, its checksum and length rather than hash() as that changes from run to run,
+    # so a key can be saved with the data (see checkpoint)
+    return zlib.crc32(data) | len(data) << 32
+
+
+class Blob:
+    # immutable file contents, the store only keeps it while some file (or clone, or snapshot) still does
+    __slots__ = ('_data', '_packed', '_store', 'key', 'size', 'spilled', '__weakref__')
+    # whether the data can be read again from a checkpoint's map (see checkpoint.MappedBlob)
+    mapped = False
+
+    def __init__(self, data: bytes):
+        self._data = data
+        self.size = len(data)
+        self._packed = None
+        # only set when a store with a memory budget may compress (or spill) the data
+        self._store = None
+        # set by the store that holds it
+        self.key = None
+        # where the data is in the store's segment file, once it has been spilled there
+        self.spilled = None
+
+    @property
+    def data(self) -> bytes:
+        if self._store is not None:
+            return self._store.load(self)
+        return self._data
+
+    @property
+    def on_disk(self) -> bool:
+        # only in the segment file, so reading it means paging it in
+        return self._data is None and self.spilled is not None
+
+    @property
+    def stored(self) -> int:
+        # the bytes actually held, which for a hot blob that was compressed before are both copies
+        return (len(self._data) if self._data is not None else 0) + (len(self._packed) if self._packed else 0)
+
+
+class BlobStore:
+    # chunks after one paged in that are paged in with it, and the segment file size (and dead share of it)
+    # it's compacted at
+    READ_AHEAD = 8
+    COMPACT_SIZE = 64 * 1024 * 1024
+
+    def __init__(self, budget: int = None, compression: str = 'zlib', spill_dir: str = None):
+        self.hits = 0
+        self.misses = 0
+        # key -> blob, python's own reference counting drops a blob once nothing holds it
+        self._blobs = WeakValueDictionary()
+        # with a budget, the uncompressed blobs are kept in an LRU (key -> size) and the least recently used are
+        # compressed whenever they add up to more than it, entries for freed blobs go when they reach the cold end
+        self._budget = budget
+        self._compress, self._decompress = COMPRESSORS[compression]
+        self._lru = OrderedDict()
+        self._hot_size = 0
+        self.packed = 0
+        self.packed_in = 0
+        self.packed_out = 0
+        self.unpacks = 0
+        self.unpack_seconds = 0.0
+        # with a spill dir, cold blobs are written to a segment file there instead of compressed, and read back
+        # when next needed along with the chunks after them; the file is deleted with the store, as it only holds
+        # what's in memory anyway. a spilled blob keeps its place in it, so going cold again costs no write, and
+        # its bytes are counted dead once it's freed, the file being rewritten without them once half of it is
+        self._spill_dir = spill_dir
+        self._segment = None
+        self._segment_end = 0
+        self._dead = 0
+        self._spilled = {}
+        self._paging = 0
+        self.resident = 0
+        self.paged = 0
+        self.prefetched = 0
+        self.evicted = 0
+        self.page_reads = 0
+        self.page_seconds = 0.0
+        # reads change the lru (and page in or decompress), so concurrent ones take turns at it
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._blobs)
+
+    def intern(self, data: bytes) -> Blob:
+        with self._lock:
+            return self._intern(data)
+
+    def _intern(self, data: bytes) -> Blob:
+        # the key is only a hint, so equal data is checked before sharing a blob
+        key = digest(data)
+        existing = self._blobs.get(key)
+        if existing is not None and (self._load(existing) if existing._store is not None else existing.data) == data:
+            self.hits += 1
+            return existing
+        self.misses += 1
+        blob = Blob(data)
+        blob.key = key
+        if existing is None:
+            # on a collision the older blob keeps the key and this one just isn't shared
+            self._blobs[key] = blob
+            if self._budget is not None:
+                blob._store = self
+                self._hot(blob)
+        return blob
+
+    def add(self, blob: Blob):
+        # take in a blob whose data isn't read yet under the key saved with it, to be shared and budgeted like
+        # any other; equal data can't be told from a collision without reading it, so on a clash it isn't shared
+        with self._lock:
+            if blob.key not in self._blobs:
+                self._blobs[blob.key] = blob
+                if self._budget is not None:
+                    blob._store = self
+
+    def load(self, blob: Blob) -> bytes:
+        with self._lock:
+            return self._load(blob)
+
+    def _load(self, blob: Blob) -> bytes:
+        data = blob._data
+        if data is None:
+            if blob.spilled is not None:
+                (data,) = self._page_in([(blob.spilled, blob.size)])
+                if blob._data is not None:
+                    # another thread paged it in meanwhile
+                    return blob._data
+                blob._data = data
+                self.paged += 1
+            elif blob._packed is not None:
+                start = time.perf_counter()
+                data = blob._data = self._decompress(blob._packed)
+                self.unpack_seconds += time.perf_counter() - start
+                self.unpacks += 1
+            else:
+                # mapped from a checkpoint and not read yet
+                data = blob._data = blob.read()
+            self._hot(blob)
+        else:
+            self.resident += 1
+            if blob.key in self._lru:
+                self._lru.move_to_end(blob.key)
+        return data
+
+    def read_ahead(self, blobs: Sequence[Blob], i: int) -> bytes:
+        with self._lock:
+            if not blobs[i].on_disk:
+                # another thread paged it in first
+                return self._load(blobs[i])
+            return self._read_ahead(blobs, i)
+
+    def _read_ahead(self, blobs: Sequence[Blob], i: int) -> bytes:
+        # page in a file's chunk along with the spilled ones after it, which a read most likely carries on into,
+        # as many as fit in the budget and a run at a time where they sit next to each other in the segment file
+        window, size = [blobs[i]], blobs[i].size
+        for b in blobs[i + 1:i + 1 + self.READ_AHEAD]:
+            size += b.size
+            if size > self._budget:
+                break
+            if b.on_disk:
+                window.append(b)
+        runs = []
+        for b in sorted(window, key=lambda b: b.spilled):
+            if runs and runs[-1][-1].spilled + runs[-1][-1].size == b.spilled:
+                runs[-1].append(b)
+            else:
+                runs.append([b])
+        spans = [(run[0].spilled, run[-1].spilled + run[-1].size - run[0].spilled) for run in runs]
+        for run, (start, _), data in zip(runs, spans, self._page_in(spans)):
+            for b in run:
+                # unless another thread paged it in meanwhile
+                if b._data is None:
+                    b._data = data if len(run) == 1 else data[b.spilled - start:b.spilled - start + b.size]
+        self.paged += 1
+        self.prefetched += len(window) - 1
+        # hot in file order, so the chunk read now is the first of them to go cold again
+        data = blobs[i]._data
+        for b in window:
+            self._hot(b)
+        return data
+
+    def _page_in(self, spans: Sequence[Tuple[int, int]]) -> List[bytes]:
+        # read (offset, size) spans of the segment file, called holding the lock but reading without it so other
+        # reads carry on meanwhile, and as the segment file isn't compacted while any are in flight the spans hold
+        segment = self._segment
+        self._paging += 1
+        self._lock.release()
+        try:
+            start = time.perf_counter()
+            pieces = [os.pread(segment.fileno(), size, offset) for offset, size in spans]
+            elapsed = time.perf_counter() - start
+        finally:
+            self._lock.acquire()
+            self._paging -= 1
+        self.page_seconds += elapsed
+        self.page_reads += len(spans)
+        return pieces
+
+    def _hot(self, blob: Blob):
+        size = blob.size
+        self._hot_size += size - self._lru.pop(blob.key, 0)
+        self._lru[blob.key] = size
+        while self._hot_size > self._budget and self._lru:
+            key, size = self._lru.popitem(last=False)
+            self._hot_size -= size
+            cold = self._blobs.get(key)
+            if cold is not None and cold._data is not None:
+                if cold.mapped:
+                    # it can be read from the map again, so going cold just drops it
+                    cold._data = None
+                elif self._spill_dir is not None:
+                    self._spill(cold)
+                else:
+                    self._pack(cold)
+
+    def _pack(self, blob: Blob):
+        if blob._packed is None:
+            packed = self._compress(blob._data)
+            if len(packed) >= len(blob._data):
+                # not worth it, so it's left as it is and out of the budget
+                return
+            blob._packed = packed
+            self.packed += 1
+            self.packed_in += len(blob._data)
+            self.packed_out += len(packed)
+        # once compressed the data never changes, so going cold again just drops it
+        blob._data = None
+
+    def _spill(self, blob: Blob):
+        if blob.spilled is None:
+            if self._segment is None:
+                self._segment = self._open()
+            elif self._segment_end >= self.COMPACT_SIZE and self._dead * 2 > self._segment_end and not self._paging:
+                self._compact()
+            blob.spilled = self._segment_end
+            os.pwrite(self._segment.fileno(), blob._data, self._segment_end)
+            self._segment_end += blob.size
+            self._spilled[blob.key] = ref(blob, lambda r, key=blob.key, size=blob.size: self._freed(key, size, r))
+        # once written the data never changes, so going cold again just drops it
+        blob._data = None
+        self.evicted += 1
+
+    def _open(self):
+        segment = tempfile.TemporaryFile(dir=self._spill_dir)
+        finalize(self, segment.close)
+        return segment
+
+    def _freed(self, key: int, size: int, dead: ref):
+        # a spilled blob was freed, so its bytes in the segment file are no longer needed
+        if self._spilled.get(key) is dead:
+            del self._spilled[key]
+            self._dead += size
+
+    def _compact(self):
+        # rewrite the segment file with only the blobs still alive, in the order they're laid out
+        segment = self._open()
+        end = 0
+        for blob in sorted(filter(None, (r() for r in self._spilled.values())), key=lambda b: b.spilled):
+            os.pwrite(segment.fileno(), os.pread(self._segment.fileno(), blob.size, blob.spilled), end)
+            blob.spilled = end
+            end += blob.size
+        self._segment.close()
+        self._segment, self._segment_end, self._dead = segment, end, 0
+
+    def info(self) -> BlobInfo:
+        return BlobInfo(self.hits, self.misses, len(self._blobs), sum(b.stored for b in self._blobs.values()))
+
+    def compression_info(self) -> CompressionInfo:
+        return CompressionInfo(self.packed, self.packed_in / self.packed_out if self.packed_out else 1.0,
+                               self.unpacks, self.unpack_seconds / self.unpacks if self.unpacks else 0.0)
+
+    def spill_info(self) -> SpillInfo:
+        # hits are reads of budgeted blobs already in memory, misses the ones paged in from the segment file
+        # (not counting those read ahead), and evictions are blobs dropped to it
+        reads = self.resident + self.paged
+        return SpillInfo(self.resident, self.paged, self.resident / reads if reads else 1.0, self.evicted,
+                         self.evicted / reads if reads else 0.0, self.prefetched,
+                         self.page_seconds / self.page_reads if self.page_reads else 0.0,
+                         self._segment_end)
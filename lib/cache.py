@@ -0,0 +1,54 @@
+import threading
+from collections import OrderedDict, namedtuple
+from typing import Optional, Tuple
+from weakref import ref
+
+from lib.directory import Directory
+from lib.node import Node
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+
+class PathCache:
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        # path -> (parent, name, node, parent generation, filesystem epoch, mutable), oldest first, holding the nodes
+        # weakly so removing them frees them (and their contents) without waiting for their entries to go
+        self._entries = OrderedDict()
+        # lookups reorder the entries, so concurrent reads of a thread safe filesystem take turns at it
+        self._lock = threading.Lock()
+
+    def get(self, path: str, epoch: int, mutable: bool = False) -> Optional[Tuple[Directory, str, Node]]:
+        with self._lock:
+            return self._get(path, epoch, mutable)
+
+    def _get(self, path: str, epoch: int, mutable: bool) -> Optional[Tuple[Directory, str, Node]]:
+        entry = self._entries.get(path)
+        if entry is not None:
+            parent, name, node, generation, entry_epoch, entry_mutable = entry
+            parent, node = parent(), node()
+            # an entry is only good while its parent and every dir above it are still in place
+            if node is None or parent is None or entry_epoch != epoch or parent.generation != generation:
+                del self._entries[path]
+            elif entry_mutable or not mutable:
+                # and can only be changed through if it was resolved for changing
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return parent, name, node
+        self.misses += 1
+        return None
+
+    def put(self, path: str, parent: Directory, name: str, node: Node, epoch: int, mutable: bool = False):
+        with self._lock:
+            self._entries[path] = (ref(parent), name, ref(node), parent.generation, epoch, mutable)
+            if len(self._entries) > self.maxsize:
+                # evict the least recently used
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def info(self) -> CacheInfo:
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self._entries))
@@ -0,0 +1,244 @@
+import mmap
+import os
+import struct
+import threading
+from array import array
+from typing import Dict, List, Tuple
+from weakref import WeakValueDictionary
+
+from lib.blob import Blob, BlobStore, digest
+from lib.directory import Directory
+from lib.file import File
+from lib.node import Node
+
+# a checkpoint is a header, the wal token it was taken at and the token of the log started after it and the pwd,
+# then a node table in breadth-first order so every dir's children are one run of it, the names the nodes use
+# (each distinct name once) as an offset table and the bytes they point into, every file's chunks as indexes into
+# a blob table of offsets, sizes and store keys, and finally the content region holding every distinct chunk once
+MAGIC = b'MFSCKPT\x02'
+HEADER = struct.Struct('<8sqQQQQQ')
+LENGTH = struct.Struct('<I')
+# kind, name, then for a dir its first child and child count or for a file its first chunk and chunk count,
+# then the dir's totals or just the file's size
+NODE = struct.Struct('<BIQQQQQ')
+KIND_DIRECTORY = 0
+KIND_FILE = 1
+NO_NAME = 0xFFFFFFFF
+
+
+def _contents(blob: Blob):
+    # a chunk still only in an older checkpoint is copied from its map without being read into memory for good
+    if blob.mapped and blob._data is None:
+        return blob.read()
+    return blob.data
+
+
+def _string(value: str) -> bytes:
+    data = value.encode()
+    return LENGTH.pack(len(data)) + data
+
+
+def save(path: str, root: Directory, pwd: str, token: str = '', offset: int = 0, next_token: str = ''):
+    # lay the tree out breadth first, then write it to a temp file swapped in once it's synced,
+    # so a crash while saving leaves the last checkpoint as it was
+    nodes: List[Node] = [root]
+    names: List[str] = [None]
+    for node in nodes:
+        if node.is_dir:
+            names.extend(node.children)
+            nodes.extend(node.children.values())
+    name_ids: Dict[str, int] = {}
+    blob_ids: Dict[int, int] = {}
+    keys: Dict[int, int] = {}
+    blobs: List[Blob] = []
+    refs = []
+    table = bytearray()
+    first = 1
+    for node, name in zip(nodes, names):
+        nid = NO_NAME if name is None else name_ids.setdefault(name, len(name_ids))
+        if node.is_dir:
+            count = len(node.children)
+            table += NODE.pack(KIND_DIRECTORY, nid, first, count, node.dirs, node.files, node.size)
+            first += count
+            continue
+        chunks = list(node.chunks)
+        if node.tail:
+            # an unsealed tail is saved as one more chunk, leaving the file itself as it is
+            chunks.append(Blob(bytes(node.tail)))
+        table += NODE.pack(KIND_FILE, nid, len(refs), len(chunks), 0, 0, node.size)
+        for blob in chunks:
+            bid = blob_ids.get(id(blob))
+            if bid is None:
+                if blob.key is None:
+                    blob.key = digest(blob.data)
+                # a tail can hold the same bytes as another file's chunk, which are then saved once too
+                bid = keys.get(blob.key)
+                if bid is None or _contents(blobs[bid]) != _contents(blob):
+                    bid = blob_ids[id(blob)] = len(blobs)
+                    keys.setdefault(blob.key, bid)
+                    blobs.append(blob)
+            refs.append(bid)
+    strings = [name.encode() for name in name_ids]
+    offsets, end = [0], 0
+    for data in strings:
+        end += len(data)
+        offsets.append(end)
+    spans, end = [], 0
+    for blob in blobs:
+        spans += (end, blob.size, blob.key)
+        end += blob.size
+
+    tmp = path + '.new'
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, offset, len(nodes), len(strings), offsets[-1], len(refs), len(blobs)))
+        f.write(_string(token) + _string(next_token) + _string(pwd))
+        f.write(table)
+        f.write(array('Q', offsets))
+        f.write(b''.join(strings))
+        f.write(array('I', refs))
+        f.write(array('Q', spans))
+        for blob in blobs:
+            f.write(_contents(blob))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class MappedBlob(Blob):
+    # a chunk in a checkpoint, only read from the map the first time its data is needed, and with a budget
+    # dropped again whenever it goes cold as it can always be read from the map again
+    __slots__ = ('_map', '_offset')
+    mapped = True
+
+    def __init__(self, data: mmap.mmap, offset: int, size: int, key: int):
+        super().__init__(b'')
+        self._data = None
+        self._map = data
+        self._offset = offset
+        self.size = size
+        self.key = key
+
+    def read(self) -> bytes:
+        return self._map[self._offset:self._offset + self.size]
+
+    @property
+    def data(self) -> bytes:
+        if self._data is None and self._store is None:
+            # without a budget it's read in for good
+            self._data = self.read()
+        return Blob.data.fget(self)
+
+
+# the children slot of every dir, which a lazy dir has to reach past its own property
+_CHILDREN = Directory.children
+
+
+class LazyDirectory(Directory):
+    # a dir in a checkpoint, with its totals but only (checkpoint, index) in place of children until they're needed,
+    # then they're read in and it becomes a plain Directory, so loaded dirs cost nothing extra to use
+    __slots__ = ()
+
+    def __init__(self, checkpoint: 'Checkpoint', index: int, dirs: int, files: int, size: int):
+        _CHILDREN.__set__(self, (checkpoint, index))
+        self.generation = 0
+        self.shared = False
+        self.owned = None
+        self.dirs = dirs
+        self.files = files
+        self.size = size
+        self.order = None
+
+    def _get_children(self) -> dict:
+        with Checkpoint.lock:
+            # another thread may have read them in while this one waited
+            pending = _CHILDREN.__get__(self)
+            if type(pending) is tuple:
+                checkpoint, index = pending
+                _CHILDREN.__set__(self, checkpoint.children(index))
+                self.__class__ = Directory
+        return _CHILDREN.__get__(self)
+
+    def _set_children(self, children: dict):
+        _CHILDREN.__set__(self, children)
+        self.__class__ = Directory
+
+    children = property(_get_children, _set_children)
+
+
+class Checkpoint:
+    # dirs from every checkpoint are read in under one lock, which is only ever taken once per dir
+    lock = threading.Lock()
+
+    def __init__(self, path: str, chunk_size: int = File.CHUNK_SIZE, store: BlobStore = None):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.wal_offset, nodes, names, strings, refs, blobs = HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            raise ValueError('{} is not a checkpoint'.format(path))
+        pos = HEADER.size
+        self.token, pos = self._string(pos)
+        self.next_token, pos = self._string(pos)
+        self.pwd, pos = self._string(pos)
+        view = memoryview(self._map)
+        self._nodes_at = pos
+        pos += nodes * NODE.size
+        self._name_offsets = view[pos:pos + (names + 1) * 8].cast('Q')
+        pos += (names + 1) * 8
+        self._strings_at = pos
+        pos += strings
+        self._refs = view[pos:pos + refs * 4].cast('I')
+        pos += refs * 4
+        self._spans = view[pos:pos + blobs * 24].cast('Q')
+        self._data_at = pos + blobs * 24
+        # files read in are made like any other, and each chunk is shared by every file holding it
+        self._chunk_size = chunk_size
+        self._store = store
+        self._names: Dict[int, str] = {}
+        self._blobs = WeakValueDictionary()
+
+    def _string(self, pos: int) -> Tuple[str, int]:
+        (n,) = LENGTH.unpack_from(self._map, pos)
+        pos += LENGTH.size
+        return self._map[pos:pos + n].decode(), pos + n
+
+    def _name(self, nid: int) -> str:
+        name = self._names.get(nid)
+        if name is None:
+            start = self._strings_at + self._name_offsets[nid]
+            end = self._strings_at + self._name_offsets[nid + 1]
+            name = self._names[nid] = self._map[start:end].decode()
+        return name
+
+    def _blob(self, bid: int) -> Blob:
+        blob = self._blobs.get(bid)
+        if blob is None:
+            offset, size, key = self._spans[3 * bid:3 * bid + 3]
+            blob = self._blobs[bid] = MappedBlob(self._map, self._data_at + offset, size, key)
+            if self._store is not None:
+                # so it's shared with equal chunks written later, and counted and budgeted like them
+                self._store.add(blob)
+        return blob
+
+    def root(self) -> Directory:
+        _, _, _, _, dirs, files, size = NODE.unpack_from(self._map, self._nodes_at)
+        return LazyDirectory(self, 0, dirs, files, size)
+
+    def children(self, index: int) -> dict:
+        _, _, first, count, _, _, _ = NODE.unpack_from(self._map, self._nodes_at + index * NODE.size)
+        start = self._nodes_at + first * NODE.size
+        children = {}
+        for i, (kind, nid, a, b, dirs, files, size) in enumerate(
+                NODE.iter_unpack(self._map[start:start + count * NODE.size]), first):
+            if kind == KIND_DIRECTORY:
+                children[self._name(nid)] = LazyDirectory(self, i, dirs, files, size)
+                continue
+            node = File(self._chunk_size, self._store)
+            if b:
+                node.chunks = [self._blob(bid) for bid in self._refs[a:a + b]]
+                end, ends = 0, []
+                for chunk in node.chunks:
+                    end += chunk.size
+                    ends.append(end)
+                node.ends = ends
+            children[self._name(nid)] = node
+        return children
@@ -1,6 +1,48 @@
 from lib.node import Node
+from lib.sortedlist import SortedList
 
 
 class Directory(Node):
+    __slots__ = ('children', 'generation', 'shared', 'owned', 'dirs', 'files', 'size', 'order')
+    type = Node.TYPE_DIRECTORY
+    is_dir = True
+
     def __init__(self):
         self.children = {}
+        # bumped whenever a child is removed or replaced so cached lookups through it go stale
+        self.generation = 0
+        # copy-on-write state: shared means children is also another dir's, owned is the names of the children
+        # known to be this dir's alone once it has its own children again (None meaning all of them)
+        self.shared = False
+        self.owned = None
+        # totals for everything below this dir, kept up to date by the filesystem so du never walks
+        self.dirs = 0
+        self.files = 0
+        self.size = 0
+        # the names of the children kept sorted, only once the dir has been listed in order
+        self.order = None
+
+    def clone(self) -> 'Directory':
+        # an O(1) copy that shares children until either side changes them
+        c = Directory()
+        c.children = self.children
+        c.dirs, c.files, c.size = self.dirs, self.files, self.size
+        c.shared = self.shared = True
+        self.owned = None
+        # the clone sorts its own names if it's ever listed in order, so the two can change apart
+        return c
+
+    def sorted(self) -> SortedList:
+        if self.order is None:
+            self.order = SortedList(self.children)
+        return self.order
+
+    def owns(self, name: str) -> bool:
+        return not self.shared and (self.owned is None or name in self.owned)
+
+    def unshare(self):
+        # take a private copy of children before changing them, none of which are known to be ours yet
+        if self.shared:
+            self.children = dict(self.children)
+            self.shared = False
+            self.owned = set()
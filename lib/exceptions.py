@@ -36,6 +36,21 @@ class NotDirectoryError(FilesystemError):
         super().__init__('"{}" exists but is not a directory'.format(name))
 
 
+class SubdirectoryError(FilesystemError):
+    def __init__(self, name):
+        super().__init__('"{}" cannot be moved into itself'.format(name))
+
+
+class ReadOnlyError(FilesystemError):
+    def __init__(self):
+        super().__init__('a snapshot cannot be changed')
+
+
+class NotLoggableError(FilesystemError):
+    def __init__(self, name):
+        super().__init__('"{}" cannot be written to the log'.format(name))
+
+
 class RootError(FilesystemError):
     def __init__(self):
         super().__init__('this action cannot be performed on root')
@@ -1,6 +1,191 @@
+from bisect import bisect_right
+from typing import Iterator, List
+
+from lib.blob import Blob, BlobStore
 from lib.node import Node
 
 
 class File(Node):
-    def __init__(self):
-        self.contents = ''
+    CHUNK_SIZE = 64 * 1024
+
+    __slots__ = ('chunk_size', 'store', 'chunks', 'ends', 'tail')
+    type = Node.TYPE_FILE
+
+    def __init__(self, chunk_size: int = CHUNK_SIZE, store: BlobStore = None):
+        self.chunk_size = chunk_size
+        # with a store, identical chunks are kept once however many files hold them
+        self.store = store
+        # contents are a list of immutable chunks of up to chunk_size bytes, so clones can share them and a change
+        # only rebuilds the chunks it touches, then a tail that's still being appended to in place,
+        # all of which start out as shared empty constants until the first write
+        self.chunks = ()
+        # the end offset of every chunk, to find the one holding an offset
+        self.ends = ()
+        self.tail = b''
+
+    def clone(self) -> 'File':
+        # seal the tail first so the clone only has to share chunks
+        self._seal()
+        c = File(self.chunk_size, self.store)
+        if self.chunks:
+            c.chunks = list(self.chunks)
+            c.ends = list(self.ends)
+        return c
+
+    @staticmethod
+    def check_range(offset: int, size: int = None):
+        # offsets and sizes count from the start of the file, so can't be negative
+        if offset is not None and offset < 0:
+            raise ValueError('negative offset {}'.format(offset))
+        if size is not None and size < 0:
+            raise ValueError('negative size {}'.format(size))
+
+    def _writable(self):
+        if not isinstance(self.tail, bytearray):
+            self.chunks, self.ends, self.tail = list(self.chunks), list(self.ends), bytearray()
+
+    @property
+    def size(self) -> int:
+        return (self.ends[-1] if self.ends else 0) + len(self.tail)
+
+    @property
+    def contents(self) -> bytes:
+        return b''.join(chunk.data for chunk in self.chunks) + self.tail
+
+    def _blob(self, data) -> Blob:
+        data = bytes(data)
+        return self.store.intern(data) if self.store is not None else Blob(data)
+
+    def _split(self, data) -> List[Blob]:
+        return [self._blob(data[i:i + self.chunk_size]) for i in range(0, len(data), self.chunk_size)]
+
+    def _reindex(self, start: int = 0):
+        # recount the ends from a chunk on, after chunks there changed size
+        end = self.ends[start - 1] if start else 0
+        del self.ends[start:]
+        for chunk in self.chunks[start:]:
+            end += chunk.size
+            self.ends.append(end)
+
+    def _seal(self):
+        if self.tail:
+            self.chunks.append(self._blob(self.tail))
+            self.ends.append(self.size)
+            self.tail = bytearray()
+
+    def _extend(self, data):
+        self._writable()
+        data = memoryview(data)
+        if data and not self.tail and self.chunks and self.chunks[-1].size < self.chunk_size:
+            # carry on filling a short last chunk, sealed by a write or a clone
+            self.tail = bytearray(self.chunks.pop().data)
+            self.ends.pop()
+        while data:
+            if not self.tail and len(data) >= self.chunk_size:
+                # whole chunks skip the tail
+                self.chunks.append(self._blob(data[:self.chunk_size]))
+                self.ends.append((self.ends[-1] if self.ends else 0) + self.chunk_size)
+                data = data[self.chunk_size:]
+                continue
+            piece, data = data[:self.chunk_size - len(self.tail)], data[self.chunk_size - len(self.tail):]
+            try:
+                self.tail += piece
+            except BufferError:
+                # a view from read() still holds the tail, so it keeps the old one and we move on to a copy
+                self.tail = self.tail + piece
+            if len(self.tail) == self.chunk_size:
+                self._seal()
+
+    def iread(self, offset: int = 0, size: int = None) -> Iterator[memoryview]:
+        # stream a range as views of the chunks holding it, checking it straight away rather than on the first chunk
+        self.check_range(offset, size)
+        return self._iread(offset, size)
+
+    def _iread(self, offset: int, size: int = None) -> Iterator[memoryview]:
+        end = self.size if size is None else min(offset + size, self.size)
+        i = bisect_right(self.ends, offset)
+        start = self.ends[i - 1] if i else 0
+        while offset < end:
+            if i < len(self.chunks):
+                blob = self.chunks[i]
+                # a chunk spilled to disk is paged in with the ones after it, as the read most likely carries on
+                chunk = self.store.read_ahead(self.chunks, i) if blob.on_disk else blob.data
+            else:
+                chunk = self.tail
+            yield memoryview(chunk)[offset - start:end - start].toreadonly()
+            start += len(chunk)
+            offset = start
+            i += 1
+
+    def read(self, offset: int = 0, size: int = None) -> memoryview:
+        pieces = list(self.iread(offset, size))
+        if len(pieces) == 1:
+            # a range inside one chunk can be viewed without copying
+            return pieces[0]
+        return memoryview(b''.join(pieces))
+
+    def write(self, data, offset: int = None):
+        self.check_range(offset)
+        if offset is None:
+            # replace the whole contents, sealed straight away as they're most likely to be read or copied next
+            self.chunks, self.ends, self.tail = [], [], bytearray()
+            self._extend(data)
+            self._seal()
+            return
+        self._writable()
+        data = memoryview(data)
+        size = self.size
+        if offset > size:
+            # writing past the end leaves a gap of zeros
+            self._extend(bytes(offset - size))
+            size = offset
+        # overwrite what's already there, only rebuilding the chunks it covers, then extend with the rest
+        end = min(offset + len(data), size)
+        i = bisect_right(self.ends, offset)
+        start = self.ends[i - 1] if i else 0
+        pos = offset
+        while pos < end:
+            head = data[pos - offset:end - offset]
+            a = pos - start
+            if i < len(self.chunks):
+                chunk = self.chunks[i].data
+                b = min(len(chunk), a + len(head))
+                self.chunks[i] = self._blob(chunk[:a] + head[:b - a] + chunk[b:])
+                start += len(chunk)
+            else:
+                self.tail[a:a + len(head)] = head
+                start += len(self.tail)
+            pos = start
+            i += 1
+        self._extend(data[end - offset:])
+
+    def insert(self, data, offset: int):
+        # insert without overwriting, rebuilding the chunk at the offset rather than moving everything after it
+        self.check_range(offset)
+        if offset > self.size:
+            self.write(data, offset)
+            return
+        self._writable()
+        base = self.ends[-1] if self.ends else 0
+        if offset >= base:
+            # inside the tail, which is small enough to rebuild
+            tail = self.tail
+            self.tail = bytearray()
+            self._extend(tail[:offset - base] + bytes(data) + tail[offset - base:])
+            return
+        i = bisect_right(self.ends, offset)
+        start = self.ends[i - 1] if i else 0
+        chunk = self.chunks[i].data
+        joined = chunk[:offset - start] + bytes(data) + chunk[offset - start:]
+        end = i + 1
+        short = len(joined) % self.chunk_size
+        if short and end < len(self.chunks) and short + self.chunks[end].size <= self.chunk_size:
+            # a short last piece takes in the next chunk if they fit in one, so no two chunks side by side would,
+            # which keeps the chunk count under twice the whole ones however many inserts there are
+            joined += self.chunks[end].data
+            end += 1
+        self.chunks[i:end] = self._split(joined)
+        self._reindex(i)
+
+    def append(self, data):
+        self._extend(data)
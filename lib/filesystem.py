@@ -1,8 +1,13 @@
-import copy
+import heapq
 import os
-from contextlib import contextmanager
-from typing import Any, List
+from collections import namedtuple
+from functools import wraps
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
 
+from lib import checkpoint, host
+from lib.blob import BlobStore, CompressionInfo, SpillInfo
+from lib.cache import CacheInfo, PathCache
 from lib.directory import Directory
 from lib.exceptions import (
     DirectoryAlreadyExistsError,
@@ -12,59 +17,508 @@ from lib.exceptions import (
     NotDirectoryError,
     NotFileError,
     NotFoundError,
-    RootError
+    NotLoggableError,
+    ReadOnlyError,
+    RootError,
+    SubdirectoryError
 )
 from lib.file import File
+from lib.index import NameIndex, PathIndex, TrigramIndex
 from lib.node import Node
+from lib.path import abspath, join
+from lib.rwlock import RWLock, reader, writer
+from lib.wal import BEGIN, GROUP_DELAY, GROUP_SIZE, WriteAheadLog, empty, new_token, records, token
+
+DiskUsage = namedtuple('DiskUsage', ['dirs', 'files', 'size'])
+Stats = namedtuple('Stats', ['files', 'size', 'stored', 'blobs', 'dedup_ratio'])
+
+BATCH_OPS = ('mkdir', 'touch', 'write', 'rm')
+
+# args that go into the log as they are, anything else is an iterable and is logged (and passed on) as a list
+LOGGABLE = (str, bytes, bytearray, memoryview, int, type(None))
+
+
+def logged(method):
+    # write a call to the log, if there is one, before making it, but not the calls it makes itself
+    op = method.__name__
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self._wal is None or self._changing:
+            return method(self, *args, **kwargs)
+        args = tuple(a if isinstance(a, LOGGABLE) else list(a) for a in args)
+        kwargs = {k: v if isinstance(v, LOGGABLE) else list(v) for k, v in kwargs.items()}
+        self._wal.log(op, args, kwargs)
+        self._changing = True
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self._changing = False
+    return wrapper
 
 
 class Filesystem:
-    def __init__(self):
+    def __init__(self, cache_size: int = 1024, path_index: bool = False, name_index: bool = False,
+                 trigram_index: bool = False, chunk_size: int = File.CHUNK_SIZE, memory_budget: int = None,
+                 compression: str = 'zlib', spill_dir: str = None, wal: str = None, wal_group_size: int = GROUP_SIZE,
+                 wal_group_delay: float = GROUP_DELAY, thread_safe: bool = False):
         self._root = Directory()
+        # file contents are kept in chunks of this many bytes, each chunk stored once however many files hold it,
+        # and with a memory budget the chunks read least recently are compressed ('zlib' or 'lzma') to stay under it,
+        # or with a spill dir written out to a segment file there and paged back in when next read
+        self._chunk_size = chunk_size
+        self._blobs = BlobStore(memory_budget, compression, spill_dir)
+        # absolute paths resolve through an LRU cache (0 to disable), entries are validated against
+        # the parent's generation and an epoch bumped whenever any dir leaves the tree
+        self._cache = PathCache(cache_size) if cache_size > 0 else None
+        self._epoch = 0
+        # indexes are told about every node added to or removed from the tree, the optional path index
+        # replaces walking (and the cache) for absolute paths at the cost of memory per dir
+        self._indexes = []
+        self._path_index = None
+        if path_index:
+            self._path_index = PathIndex()
+            self._indexes.append(self._path_index)
+        # the optional name index lets finds skip walking the tree, adding trigrams makes fuzzy ones fast too
+        self._name_index = None
+        if name_index or trigram_index:
+            self._name_index = TrigramIndex() if trigram_index else NameIndex()
+            self._indexes.append(self._name_index)
+        for index in self._indexes:
+            index.add('/', self._root)
+        # the working directory is tracked as parallel stacks of names, resolved nodes and pwd strings
+        # so that neither the cwd nor pwd() ever needs to walk from root
         self._stack = []
+        self._nodes = [self._root]
+        self._paths = ['/']
+        # cp shares dirs copy-on-write, so once any dir has been copied changes have to make every node on their
+        # path this tree's own first; the cwd stack remembers whether it is already known to be
+        self._clones = 0
+        self._cwd_owned = True
+        # with a write-ahead log every change (and change of dir, as relative paths depend on it) is logged before
+        # it's made, synced in groups of wal_group_size bytes or after wal_group_delay seconds, see recover
+        self._wal = None
+        self._changing = False
+        # thread safe, reads share a lock and changes (and changes of dir, as the cwd is shared too) take it alone,
+        # the path cache and chunk store lock what reads change of them themselves
+        self._lock = RWLock() if thread_safe else None
+        if wal is not None:
+            if not empty(wal):
+                raise FileExistsError('{} already has changes in it, use Filesystem.recover'.format(wal))
+            if os.path.exists(wal):
+                # a log with no changes yet is started over, under a token no checkpoint was taken with
+                os.truncate(wal, 0)
+            self._wal = WriteAheadLog(wal, wal_group_size, wal_group_delay)
 
     @property
-    # get the current working directory by walking the stack
+    # the current working directory is always the top of the node stack
     def _cwd(self) -> Directory:
-        d = self._root
-        # this is the one part about the stack I don't love...the iteration here
-        for name in self._stack:
-            d = d.children[name]
-        return d
-
-    @contextmanager
-    def _resetting_stack(self):
-        # save the current stack to reset cwd
-        old_stack = self._stack.copy()
+        return self._nodes[-1]
+
+    def _walk(self, path: str, create: bool = False) -> Tuple[List[str], List[Directory]]:
+        # walk every part of the path as a directory, returning the names and nodes from root,
+        # when creating every dir on the way is made this tree's own too
+        if path.startswith('/'):
+            names, nodes = [], [self._root]
+        else:
+            if create:
+                self._owned_cwd()
+            names, nodes = self._stack.copy(), self._nodes.copy()
+        # when creating, the number of new dirs below each node on the way, only added to its totals
+        # once the walk is done with it so a deep path doesn't update every ancestor for every new dir
+        added = [0] * len(nodes) if create else None
         try:
-            yield
+            for part in path.split('/'):
+                if not part or part == '.':
+                    continue
+                if part == '..':
+                    if names:
+                        names.pop()
+                        done = nodes.pop()
+                        if create:
+                            count = added.pop()
+                            done.dirs += count
+                            added[-1] += count
+                    continue
+                parent = nodes[-1]
+                node = parent.children.get(part)
+                if node is None:
+                    if not create:
+                        raise NotFoundError(part)
+                    node = Directory()
+                    self._attach(parent, part, node)
+                    added[-1] += 1
+                    if self._indexes:
+                        self._index_add('/{}'.format('/'.join(names + [part])), node)
+                elif not node.is_dir:
+                    if create:
+                        # error if a file exists where we need a dir
+                        raise FileAlreadyExistsError(part)
+                    raise NotDirectoryError(part)
+                elif create and not parent.owns(part):
+                    at = '/{}'.format('/'.join(names + [part])) if self._path_index is not None else None
+                    node = self._own(parent, part, at)
+                names.append(part)
+                nodes.append(node)
+                if create:
+                    added.append(0)
         finally:
-            # make sure we put the old stack back
-            self._stack = old_stack
-
-    def _deep_child_action(self, path: str, action: callable, *args) -> Any:
-        if path == '/':
-            # you cannot action on root
-            raise RootError
-        # ensure there is no trailing slash
-        path = path.rstrip('/')
-        with self._resetting_stack():
-            # try to change to parent then act (or error)
-            parent, child = path.rsplit('/', 1)
-            self.cd(parent if parent else '/')
-            return action(child, *args)
+            if create:
+                # dirs made before an error still count
+                for i in range(len(nodes) - 1, -1, -1):
+                    nodes[i].dirs += added[i]
+                    if i:
+                        added[i - 1] += added[i]
+        return names, nodes
+
+    def _resolve(self, path: str) -> Tuple[Optional[Directory], Optional[str], Optional[Node]]:
+        # resolve a path in a single pass to (parent, name, node) without touching the stack,
+        # node is None if only the last part is missing and parent is None if the path names the start dir
+        if '..' in path:
+            # only paths that climb need the ancestors, so leave those to the slower walk
+            return self._resolve_climbing(path)
+        if self._path_index is not None and path.startswith('/') and path != '/' and \
+                '//' not in path and '/.' not in path and not path.endswith('/'):
+            # a plain absolute path is its parent's indexed path plus one name
+            head, _, name = path.rpartition('/')
+            parent = self._path_index.get(head or '/')
+            if parent is not None:
+                return parent, name, parent.children.get(name)
+            # let the walk work out which part is missing
+            return self._resolve_from(self._root, path)
+        if self._cache is None or not path.startswith('/'):
+            return self._resolve_from(self._root if path.startswith('/') else self._cwd, path)
+        resolved = self._cache.get(path, self._epoch)
+        if resolved is None:
+            resolved = self._resolve_from(self._root, path)
+            # only existing children are cached, so creating new ones never makes an entry stale
+            if resolved[0] is not None and resolved[2] is not None:
+                self._cache.put(path, *resolved, self._epoch)
+        return resolved
+
+    def _resolve_from(self, node: Directory, path: str) -> Tuple[Optional[Directory], Optional[str], Optional[Node]]:
+        parent = name = None
+        for part in path.split('/'):
+            if not part or part == '.':
+                continue
+            if node is None:
+                raise NotFoundError(name)
+            if not node.is_dir:
+                raise NotDirectoryError(name)
+            parent, name, node = node, part, node.children.get(part)
+        return parent, name, node
+
+    def _resolve_owned(self, path: str) -> Tuple[Optional[Directory], Optional[str], Optional[Node]]:
+        # like _resolve, but every node on the way (and the node itself) is made this tree's own to change,
+        # which only needs doing once a dir has been copied
+        if not self._clones:
+            return self._resolve(path)
+        if '..' in path:
+            # resolve the path the usual way so it means the same with or without copies, then climb it without
+            # the tree, unless it names a dir reached by climbing, which nothing changes as a child
+            resolved = self._resolve(path)
+            if resolved[0] is None:
+                return resolved
+            path = abspath(path, self._stack)
+        absolute = path.startswith('/')
+        if absolute and self._cache is not None:
+            resolved = self._cache.get(path, self._epoch, mutable=True)
+            if resolved is not None:
+                return resolved
+        node = self._root if absolute else self._owned_cwd()
+        # the path index has to follow any dir swapped for a clone, so only then keep track of where we are
+        at = '/' if absolute else self.pwd()
+        track = self._path_index is not None
+        parent = name = None
+        for part in path.split('/'):
+            if not part or part == '.':
+                continue
+            if node is None:
+                raise NotFoundError(name)
+            if not node.is_dir:
+                raise NotDirectoryError(name)
+            if track:
+                at = join(at, part)
+            child = node.children.get(part)
+            if child is not None and not node.owns(part):
+                child = self._own(node, part, at if track else None)
+            parent, name, node = node, part, child
+        if absolute and self._cache is not None and parent is not None and node is not None:
+            self._cache.put(path, parent, name, node, self._epoch, mutable=True)
+        return parent, name, node
+
+    def _owned_cwd(self) -> Directory:
+        # make every dir on the stack this tree's own before changing anything through the cwd
+        if not self._cwd_owned:
+            for i, name in enumerate(self._stack):
+                if not self._nodes[i].owns(name):
+                    self._own(self._nodes[i], name, self._paths[i + 1])
+            self._cwd_owned = True
+        return self._nodes[-1]
+
+    def _climb(self):
+        # a dir was removed, replaced or moved away, so if it was on the stack the cwd climbs to the nearest dir
+        # still in the tree; called once a change is done, as paths in it are relative to the cwd it started in
+        nodes = self._nodes
+        for i, name in enumerate(self._stack):
+            if nodes[i].children.get(name) is not nodes[i + 1]:
+                del self._stack[i:], nodes[i + 1:], self._paths[i + 1:]
+                return
+
+    def _own(self, parent: Directory, name: str, path: str = None) -> Node:
+        # swap a child that may still be shared with a copy for a clone of it only this tree can see
+        parent.unshare()
+        old = parent.children[name]
+        child = parent.children[name] = old.clone()
+        parent.owned.add(name)
+        # the path now leads to a different node
+        parent.generation += 1
+        if child.is_dir:
+            self._epoch += 1
+            if self._path_index is not None and path is not None:
+                self._path_index.add(path, child)
+        if not self._cwd_owned:
+            # keep the cwd on the new node if it was walking through the old one
+            try:
+                i = self._nodes.index(old)
+            except ValueError:
+                pass
+            else:
+                if i and self._nodes[i - 1] is parent:
+                    self._nodes[i] = child
+        return child
+
+    def _attach(self, parent: Directory, name: str, node: Node):
+        if parent.shared:
+            parent.unshare()
+        if parent.order is not None and name not in parent.children:
+            parent.order.add(name)
+        parent.children[name] = node
+        if parent.owned is not None:
+            parent.owned.add(name)
+
+    def _detach(self, parent: Directory, name: str):
+        if parent.shared:
+            parent.unshare()
+        del parent.children[name]
+        if parent.order is not None:
+            parent.order.remove(name)
+        if parent.owned is not None:
+            parent.owned.discard(name)
+
+    def _cloned(self):
+        # a dir now shares its children with a copy, so nothing below it can be changed in place any more,
+        # including anything cached or on the cwd stack
+        self._clones += 1
+        self._epoch += 1
+        self._cwd_owned = False
+
+    def _resolve_climbing(self, path: str) -> Tuple[Optional[Directory], Optional[str], Optional[Node]]:
+        head, _, tail = path.rstrip('/').rpartition('/')
+        if tail in ('', '.', '..'):
+            # the path names a directory reached by climbing
+            return None, None, self._walk(path)[1][-1]
+        if not head and path.startswith('/'):
+            head = '/'
+        parent = self._walk(head)[1][-1]
+        return parent, tail, parent.children.get(tail)
+
+    # the traversal engine: everything that visits a subtree goes through one of these two walks, which keep
+    # their own stack (or level) instead of recursing, so any depth works and there is no per-frame overhead
+
+    def _depth_first(self, node: Node,
+                     path: str = None) -> Iterator[Tuple[Optional[str], Optional[Directory], str, Node]]:
+        # yield (path, parent, name, node) for a node and everything below it, parents before children,
+        # paths are only built when a starting path is given
+        stack = [(path, None, None, node)]
+        while stack:
+            entry = stack.pop()
+            yield entry
+            path, _, _, node = entry
+            if node.is_dir:
+                if path is None:
+                    stack.extend((None, node, k, v) for k, v in node.children.items())
+                else:
+                    stack.extend((join(path, k), node, k, v) for k, v in node.children.items())
+
+    def _breadth_first(self, node: Directory, path: str, max_depth: int = None) -> Iterator[Tuple[int, str, List]]:
+        # yield (depth, dir path, children) one dir at a time, a whole level before the next, depth 1 being the
+        # children of node; children are copied out so callers can change the tree between dirs
+        level = [(path, node)]
+        depth = 1
+        while level and (max_depth is None or depth <= max_depth):
+            next_level = []
+            for parent, directory in level:
+                items = list(directory.children.items())
+                yield depth, parent, items
+                if max_depth is None or depth < max_depth:
+                    next_level.extend((join(parent, k), v) for k, v in items if v.is_dir)
+            level = next_level
+            depth += 1
+
+    def _index_add(self, path: str, node: Node):
+        for p, _, _, n in self._depth_first(node, path):
+            for index in self._indexes:
+                index.add(p, n)
+
+    def _index_remove(self, path: str, node: Node):
+        for p, _, _, n in self._depth_first(node, path):
+            for index in self._indexes:
+                index.remove(p, n)
+
+    def _ancestors(self, path: str) -> List[Directory]:
+        # every dir above the node at path, root first
+        head, sep, name = path.rpartition('/')
+        if name in ('', '.', '..'):
+            head, sep, name = abspath(path, self._stack).rpartition('/')
+        if not sep:
+            return self._nodes
+        return self._walk(head + sep)[1]
+
+    @staticmethod
+    def _totals(node: Node) -> Tuple[int, int, int]:
+        # the dirs, files and bytes in a subtree, itself included
+        if node.is_dir:
+            return node.dirs + 1, node.files, node.size
+        return 0, 1, node.size
+
+    def _account(self, path: str, dirs: int = 0, files: int = 0, size: int = 0, ancestors: List[Directory] = None):
+        # keep the totals of every dir above a change in step with it
+        for n in self._ancestors(path) if ancestors is None else ancestors:
+            n.dirs += dirs
+            n.files += files
+            n.size += size
 
+    def _adding(self, path: str, node: Node, ancestors: List[Directory] = None):
+        # a node is joining the tree at path
+        self._account(path, *self._totals(node), ancestors=ancestors)
+        if self._indexes:
+            self._index_add(abspath(path, self._stack), node)
+
+    def _removing(self, parent: Directory, path: str, node: Node, ancestors: List[Directory] = None):
+        # a child is being removed or replaced, so lookups through its parent are stale,
+        # and if it's a dir every lookup below it is too
+        parent.generation += 1
+        if node.is_dir:
+            self._epoch += 1
+        dirs, files, size = self._totals(node)
+        self._account(path, -dirs, -files, -size, ancestors)
+        if self._indexes:
+            self._index_remove(abspath(path, self._stack), node)
+
+    def _resolve_child(self, path: str, owned: bool = False) -> Tuple[Directory, str, Optional[Node]]:
+        parent, name, node = self._resolve_owned(path) if owned else self._resolve(path)
+        if parent is None:
+            if node is self._root:
+                # you cannot action on root
+                raise RootError
+            raise NotFoundError(path)
+        return parent, name, node
+
+    def _resolve_dir(self, path: str) -> Directory:
+        _, name, node = self._resolve(path)
+        if node is None:
+            raise NotFoundError(name)
+        if not node.is_dir:
+            raise NotDirectoryError(name)
+        return node
+
+    @classmethod
+    def recover(cls, wal: str, checkpoint_path: str = None, **options) -> 'Filesystem':
+        # rebuild a filesystem from its last checkpoint, if there is one, and the changes in its write-ahead log
+        # since, then carry on logging to it, a missing log being empty
+        fs = cls(**{k: v for k, v in options.items() if k not in ('wal_group_size', 'wal_group_delay')})
+        start = end = 0
+        if checkpoint_path is not None and os.path.exists(checkpoint_path):
+            saved = fs._load(checkpoint_path)
+            current = token(wal)
+            if current == saved.token:
+                # the log wasn't started over before the crash, so only what came after the checkpoint is replayed
+                start = end = saved.wal_offset
+            elif current not in (None, saved.next_token):
+                raise ValueError('{} was not taken from {}'.format(checkpoint_path, wal))
+        if os.path.exists(wal):
+            with open(wal, 'rb') as f:
+                f.seek(start)
+                for end, op, args, kwargs in records(f):
+                    if op == BEGIN:
+                        continue
+                    try:
+                        getattr(fs, op)(*args, **kwargs)
+                    except (FilesystemError, ValueError):
+                        # it failed the first time too, after doing just as much
+                        pass
+            # drop a record torn by the crash so new ones follow on from the last whole one
+            os.truncate(wal, end)
+        fs._wal = WriteAheadLog(wal, options.get('wal_group_size', GROUP_SIZE),
+                                options.get('wal_group_delay', GROUP_DELAY))
+        return fs
+
+    @classmethod
+    def load_checkpoint(cls, path: str, **options) -> 'Filesystem':
+        # open a checkpoint without reading it in, each dir is read from it the first time it's used and each chunk
+        # the first time it's read, only indexes need the whole tree up front
+        fs = cls(**options)
+        fs._load(path)
+        return fs
+
+    def _load(self, path: str) -> checkpoint.Checkpoint:
+        saved = checkpoint.Checkpoint(path, self._chunk_size, self._blobs)
+        self._root = saved.root()
+        for index in self._indexes:
+            index.clear()
+        if self._indexes:
+            self._index_add('/', self._root)
+        # and carry on from the cwd it was saved in, which is where any logged changes after it start from
+        self._stack, self._nodes, self._paths = [], [self._root], ['/']
+        self.cd(saved.pwd)
+        return saved
+
+    @writer
+    def save_checkpoint(self, path: str):
+        # write the whole tree to a checkpoint file, with a log starting it over so it only holds what comes after,
+        # the checkpoint recording both logs so a crash on either side of starting over recovers the same
+        if self._wal is None:
+            checkpoint.save(path, self._root, self.pwd())
+            return
+        following = new_token()
+        checkpoint.save(path, self._root, self.pwd(), self._wal.token, self._wal.size, following)
+        self._wal.reset(following)
+
+    def sync(self):
+        # write and fsync any logged changes still waiting for the rest of their group
+        if self._wal is not None:
+            self._wal.sync()
+
+    @writer
+    def close(self):
+        if self._wal is not None:
+            self._wal.close()
+            self._wal = None
+
+    @writer
+    @logged
     def pushdir(self, directory: str):
-        if directory not in self._cwd.children:
+        node = self._cwd.children.get(directory)
+        if node is None:
             raise NotFoundError(directory)
-        if self._cwd.children[directory].type != Node.TYPE_DIRECTORY:
+        if not node.is_dir:
             raise NotDirectoryError(directory)
+        self._cwd_owned = self._cwd_owned and self._cwd.owns(directory)
         self._stack.append(directory)
+        self._nodes.append(node)
+        self._paths.append(join(self._paths[-1], directory))
 
+    @writer
+    @logged
     def popdir(self):
         if len(self._stack):
             self._stack.pop()
+            self._nodes.pop()
+            self._paths.pop()
 
+    @writer
+    @logged
     def cd(self, path: str):
         if path == '.':
             # change to current dir is a noop
@@ -75,171 +529,534 @@ class Filesystem:
         elif '/' not in path:
             self.pushdir(path)
         else:
-            # save the current stack in case we hit an exception
-            old_stack = self._stack.copy()
-            if path.startswith('/'):
-                # the absolute case, start at root
-                self._stack = []
-            try:
-                # push all the parts of the path with a filter for no empty strings
-                for d in filter(None, path.split('/')):
-                    self.cd(d)
-            except FilesystemError as e:
-                # if we hit an exception we want to put the old stack back
-                self._stack = old_stack
-                raise e
+            # walking doesn't touch the stack, so on error the cwd is left as it was
+            names, nodes = self._walk(path)
+            # keep the pwd strings for the part of the stack shared with the new one
+            shared = 0
+            for old, new in zip(self._stack, names):
+                if old != new:
+                    break
+                shared += 1
+            paths = self._paths[:shared + 1]
+            for name in names[shared:]:
+                paths.append(join(paths[-1], name))
+            self._stack, self._nodes, self._paths = names, nodes, paths
+            self._cwd_owned = not self._clones
 
+    @reader
     def pwd(self) -> str:
-        return '/{}'.format('/'.join(self._stack))
+        return self._paths[-1]
 
-    def ls(self, path: str = None, long: bool = False) -> List:
+    @reader
+    def du(self, path: str = None) -> DiskUsage:
+        # count the dirs, files and bytes in a subtree, itself included, from the totals every dir keeps
         if path:
-            # the absolute/deep case
-            with self._resetting_stack():
-                self.cd(path)
-                return self.ls(long=long)
+            _, name, node = self._resolve(path)
+            if node is None:
+                raise NotFoundError(name)
         else:
-            if long:
-                # return a tuple with the type
-                return [(v.type, k) for k, v in self._cwd.children.items()]
-            else:
-                # just return the keys
-                return list(self._cwd.children.keys())
+            node = self._cwd
+        return DiskUsage(*self._totals(node))
 
-    def mkdir(self, path: str, create_intermediate: bool = False):
-        if '/' in path:
-            # the absolute/deep case
-            if path == '/':
-                # creating root is a noop
-                return
-            with self._resetting_stack():
-                if create_intermediate:  # TODO: because of this case, we cannot use self._deep_child_action()
-                    # recurse for all the parts of the path with a filter for no empty strings
-                    for d in filter(None, path.split('/')):
-                        self.mkdir(d)
-                        self.pushdir(d)
-                else:
-                    # if we aren't creating intermediates, try to change to parent then create (or error)
-                    parent, child = path.rsplit('/', 1)
-                    self.cd(parent if parent else '/')
-                    self.mkdir(child)
+    @reader
+    def exists(self, path: str) -> bool:
+        try:
+            return self._resolve(path)[2] is not None
+        except FilesystemError:
+            # a missing (or file) parent means the path can't exist either
+            return False
+
+    @reader
+    def stats(self) -> Stats:
+        # compare the bytes in every file in the tree to the bytes actually stored for them,
+        # which are the shared chunks plus every distinct file's unsealed tail
+        files = size = tails = 0
+        seen = set()
+        for _, _, _, n in self._depth_first(self._root):
+            if not n.is_dir:
+                files += 1
+                size += n.size
+                if id(n) not in seen:
+                    seen.add(id(n))
+                    tails += len(n.tail)
+        info = self._blobs.info()
+        stored = info.size + tails
+        return Stats(files, size, stored, info.blobs, size / stored if stored else 1.0)
+
+    def compression_info(self) -> CompressionInfo:
+        return self._blobs.compression_info()
+
+    def spill_info(self) -> SpillInfo:
+        return self._blobs.spill_info()
+
+    def cache_info(self) -> CacheInfo:
+        if self._cache is None:
+            return CacheInfo(0, 0, 0, 0)
+        return self._cache.info()
+
+    @writer
+    def snapshot(self) -> 'Snapshot':
+        # the snapshot shares the whole tree copy-on-write, so it only costs what later changes
+        snap = Snapshot(self._root.clone(), self._cache.info().maxsize if self._cache is not None else 0)
+        self._cloned()
+        # and keeps its chunks in the same store, and its lock as they share nodes
+        snap._blobs = self._blobs
+        snap._lock = self._lock
+        # and starts out in the same cwd
+        snap._stack = self._stack.copy()
+        snap._nodes = [snap._root] + self._nodes[1:]
+        snap._paths = self._paths.copy()
+        return snap
+
+    @writer
+    def restore(self, snap: 'Snapshot'):
+        if self._wal is not None:
+            # the snapshot's tree isn't in the log, so replaying couldn't get it back
+            raise NotLoggableError('restore')
+        # share the snapshot's tree the same way, so the snapshot can be restored again later
+        self._root = snap._root.clone()
+        self._cloned()
+        # only the indexes need to see the whole tree again
+        for index in self._indexes:
+            index.clear()
+        if self._indexes:
+            self._index_add('/', self._root)
+        # stay in the cwd if it's still there, or else the nearest dir above it that is
+        names = self._stack
+        self._stack, self._nodes, self._paths = [], [self._root], ['/']
+        try:
+            for name in names:
+                self.pushdir(name)
+        except FilesystemError:
+            pass
+
+    @reader
+    def ls(self, path: str = None, long: bool = False, sort: bool = False, start_after: str = None,
+           limit: int = None, prefix: str = None) -> List:
+        node = self._resolve_dir(path) if path else self._cwd
+        children = node.children
+        if sort or start_after is not None or prefix is not None:
+            # page through the names in order, which the dir keeps sorted from the first time it's asked for
+            names = list(islice(node.sorted().irange(start_after, prefix), limit))
+        elif limit is not None:
+            names = list(islice(children, limit))
+        elif long:
+            # return a tuple with the type
+            return [(v.type, k) for k, v in children.items()]
         else:
-            if path in self._cwd.children:
-                node = self._cwd.children[path]
-                if node.type == Node.TYPE_FILE:
-                    # error if a file exists with the same name
-                    raise FileAlreadyExistsError(path)
-                else:
-                    # if it's a dir, then  noop
-                    return
-            self._cwd.children[path] = Directory()
+            # just return the keys
+            return list(children.keys())
+        if long:
+            return [(children[k].type, k) for k in names]
+        return names
+
+    @writer
+    @logged
+    def mkdir(self, path: str, create_intermediate: bool = False):
+        if create_intermediate:
+            # create every missing part of the path in one walk
+            self._walk(path, create=True)
+            return
+        parent, name, node = self._resolve_owned(path)
+        if parent is None:
+            # creating root (or the cwd) is a noop
+            return
+        self._mkdir(parent, name, node, path)
+
+    @writer
+    @logged
+    def makedirs_many(self, paths: Iterable[str]):
+        # mkdir -p every path in one pass over a trie of them, so a parent shared by many paths is visited once,
+        # and nothing is created if a file is in the way of any of them
+        trie = {}
+        cwd = None
+        for path in paths:
+            if path.startswith('/'):
+                nodes = [trie]
+            else:
+                if cwd is None:
+                    cwd = [trie]
+                    for name in self._stack:
+                        cwd.append(cwd[-1].setdefault(name, {}))
+                nodes = cwd
+            if '..' in path:
+                # climbing is walked like mkdir -p walks it, so every dir climbed out of is made (or in the way) too
+                nodes = nodes.copy()
+                for part in path.split('/'):
+                    if part == '..':
+                        if len(nodes) > 1:
+                            nodes.pop()
+                    elif part and part != '.':
+                        nodes.append(nodes[-1].setdefault(part, {}))
+                continue
+            node = nodes[-1]
+            for part in path.split('/'):
+                if part and part != '.':
+                    node = node.setdefault(part, {})
+        stack = [(trie, self._root)]
+        while stack:
+            below, directory = stack.pop()
+            for name, sub in below.items():
+                child = directory.children.get(name)
+                if child is not None:
+                    if not child.is_dir:
+                        # error if a file exists where we need a dir
+                        raise FileAlreadyExistsError(name)
+                    stack.append((sub, child))
+        # then create what's missing, remembering every dir visited with its parent's place in the list and the
+        # dirs created below it, so the totals can be added up from the bottom afterwards
+        # paths are only needed for the indexes and for making copied dirs our own
+        track = bool(self._indexes) or bool(self._clones)
+        visited = []
+        stack = [(trie, self._root, '/', -1)]
+        while stack:
+            below, directory, path, up = stack.pop()
+            i = len(visited)
+            visited.append([directory, up, 0])
+            children = directory.children
+            for name, sub in below.items():
+                child = children.get(name)
+                at = join(path, name) if track else None
+                if child is None:
+                    child = Directory()
+                    self._attach(directory, name, child)
+                    visited[i][2] += 1
+                    if self._indexes:
+                        self._index_add(at, child)
+                elif self._clones and not directory.owns(name):
+                    child = self._own(directory, name, at)
+                if sub:
+                    stack.append((sub, child, at, i))
+        for directory, up, added in reversed(visited):
+            directory.dirs += added
+            if up >= 0:
+                visited[up][2] += added
+
+    @writer
+    def import_tree(self, host_path: str, dest: str, workers: int = 0):
+        # copy a host dir's contents into dest, reading files on a thread pool if given workers
+        host.import_tree(self, host_path, dest, workers)
+
+    @reader
+    def export_tree(self, src: str, host_path: str, workers: int = 0):
+        # write a dir (or file) out to the host, writing files on a thread pool if given workers
+        host.export_tree(self, src, host_path, workers)
 
+    # each change below is split into resolving its path then making it, so batch can resolve once for many
+
+    def _mkdir(self, parent: Directory, name: str, node: Optional[Node], path: str,
+               ancestors: List[Directory] = None):
+        if node is not None:
+            if not node.is_dir:
+                # error if a file exists with the same name
+                raise FileAlreadyExistsError(name)
+            # if it's a dir, then  noop
+            return
+        node = Directory()
+        self._attach(parent, name, node)
+        self._adding(path, node, ancestors)
+
+    @writer
+    @logged
     def rm(self, path: str, force: bool = False):
-        if '/' in path:
-            self._deep_child_action(path, self.rm, force)
-        else:
-            try:
-                node = self._cwd.children[path]
-                # don't allow removing non-empty dirs unless forced (rm -f)
-                if not force and node.type == Node.TYPE_DIRECTORY and len(node.children) > 0:
-                    raise DirectoryNotEmptyError(path)
-                del self._cwd.children[path]
-            except KeyError:
-                raise NotFoundError(path)
+        parent, name, node = self._resolve_child(path, owned=True)
+        self._rm(parent, name, node, path, force)
+
+    def _rm(self, parent: Directory, name: str, node: Optional[Node], path: str, force: bool = False,
+            ancestors: List[Directory] = None):
+        if node is None:
+            raise NotFoundError(name)
+        # don't allow removing non-empty dirs unless forced (rm -f)
+        if not force and node.is_dir and len(node.children) > 0:
+            raise DirectoryNotEmptyError(name)
+        self._removing(parent, path, node, ancestors)
+        self._detach(parent, name)
+        if node.is_dir:
+            self._climb()
 
+    @writer
+    @logged
     def touch(self, path: str):
-        if '/' in path:
-            self._deep_child_action(path, self.touch)
-        else:
-            if path in self._cwd.children:
-                node = self._cwd.children[path]
-                if node.type == Node.TYPE_DIRECTORY:
-                    # error if a dir exists with the same name
-                    raise DirectoryAlreadyExistsError(path)
+        parent, name, node = self._resolve_child(path, owned=True)
+        self._touch(parent, name, node, path)
+
+    def _touch(self, parent: Directory, name: str, node: Optional[Node], path: str,
+               ancestors: List[Directory] = None):
+        if node is not None:
+            if node.is_dir:
+                # error if a dir exists with the same name
+                raise DirectoryAlreadyExistsError(name)
+            # if it's a file, then  noop
+            return
+        node = File(self._chunk_size, self._blobs)
+        self._attach(parent, name, node)
+        self._adding(path, node, ancestors)
+
+    def _resolve_file(self, path: str, owned: bool = False) -> File:
+        _, name, node = self._resolve_child(path, owned)
+        return self._check_file(name, node)
+
+    @staticmethod
+    def _check_file(name: str, node: Optional[Node]) -> File:
+        if node is None:
+            raise NotFoundError(name)
+        if node.is_dir:
+            # error if the name exists, but is not a file
+            raise NotFileError(name)
+        return node
+
+    @staticmethod
+    def _bytes(data: str | bytes) -> bytes:
+        # text is stored as utf-8
+        return data.encode() if isinstance(data, str) else data
+
+    @writer
+    @logged
+    def write(self, path: str, data: str | bytes, offset: int = None):
+        # without an offset the whole file is replaced, with one it's overwritten from there on
+        self._write(self._resolve_file(path, owned=True), path, data, offset)
+
+    def _write(self, node: File, path: str, data: str | bytes, offset: int = None,
+               ancestors: List[Directory] = None):
+        size = node.size
+        node.write(self._bytes(data), offset)
+        self._account(path, size=node.size - size, ancestors=ancestors)
+
+    @writer
+    @logged
+    def append(self, path: str, data: str | bytes):
+        node = self._resolve_file(path, owned=True)
+        size = node.size
+        node.append(self._bytes(data))
+        self._account(path, size=node.size - size)
+
+    @writer
+    @logged
+    def insert(self, path: str, data: str | bytes, offset: int):
+        # move everything from offset on along to make room
+        node = self._resolve_file(path, owned=True)
+        size = node.size
+        node.insert(self._bytes(data), offset)
+        self._account(path, size=node.size - size)
+
+    @reader
+    def read(self, path: str, offset: int = 0, size: int = None, view: bool = False) -> bytes | memoryview:
+        # a view saves copying a range inside one chunk, but may show later overwrites near the end of the file
+        contents = self._resolve_file(path).read(offset, size)
+        return contents if view else bytes(contents)
+
+    @reader
+    def iread(self, path: str, offset: int = 0, size: int = None) -> Iterator[memoryview]:
+        # stream a range chunk by chunk without ever joining it, or when thread safe view them all under the lock
+        chunks = self._resolve_file(path).iread(offset, size)
+        return iter(list(chunks)) if self._lock is not None else chunks
+
+    @staticmethod
+    def _check_overwrite(dst: str, node: Optional[Node], force_overwrite: bool):
+        if node is not None and not force_overwrite:
+            # don't allow overwriting unless forced
+            if not node.is_dir:
+                raise FileAlreadyExistsError(dst)
+            raise DirectoryAlreadyExistsError(dst)
+
+    @writer
+    @logged
+    def mv(self, src: str, dst: str, force_overwrite: bool = False):
+        # resolve both ends before changing anything so a bad destination can't lose the source
+        dst_parent, dst_name, dst_node = self._resolve_child(dst, owned=True)
+        self._check_overwrite(dst, dst_node, force_overwrite)
+        src_parent, src_name, src_node = self._resolve_child(src, owned=True)
+        if src_node is None:
+            raise NotFoundError(src)
+        if src_node.is_dir and abspath(dst, self._stack).startswith(abspath(src, self._stack) + '/'):
+            # a dir can't be moved into its own subtree
+            raise SubdirectoryError(src)
+        if dst_node is src_node:
+            # moving onto itself changes nothing
+            return
+        # either path may climb through the node moving, so find the dirs above each before it goes
+        src_ancestors = self._ancestors(src)
+        dst_ancestors = self._ancestors(dst)
+        self._removing(src_parent, src, src_node, src_ancestors)
+        self._detach(src_parent, src_name)
+        if dst_node is not None:
+            self._removing(dst_parent, dst, dst_node, dst_ancestors)
+        self._attach(dst_parent, dst_name, src_node)
+        self._adding(dst, src_node, dst_ancestors)
+        if src_node.is_dir or (dst_node is not None and dst_node.is_dir):
+            self._climb()
+
+    @writer
+    @logged
+    def cp(self, src: str, dst: str, force_overwrite: bool = False):
+        self._check_overwrite(dst, self._resolve_child(dst)[2], force_overwrite)
+        src_node = self._resolve_child(src)[2]
+        if src_node is None:
+            raise NotFoundError(src)
+        # copying is O(1), a copied dir shares its children with the source until either side changes
+        node = src_node.clone()
+        if node.is_dir:
+            self._cloned()
+        # the destination may be under the source, so only make it ours once the source is shared
+        dst_parent, dst_name, dst_node = self._resolve_child(dst, owned=True)
+        # the destination may climb through the node it replaces, so find the dirs above it first
+        ancestors = self._ancestors(dst)
+        if dst_node is not None:
+            self._removing(dst_parent, dst, dst_node, ancestors)
+        self._attach(dst_parent, dst_name, node)
+        self._adding(dst, node, ancestors)
+        if dst_node is not None and dst_node.is_dir:
+            self._climb()
+
+    @writer
+    def batch(self, ops: Iterable[Sequence]) -> List[Optional[FilesystemError]]:
+        # run ('mkdir' | 'touch' | 'write' | 'rm', path, *args) ops in order, resolving each parent dir once
+        # for the whole batch rather than once per op, returning None for each op that worked or its error
+        parents = {}
+        results = []
+        # the log gets each op as the call it stands for
+        log = self._wal is not None and not self._changing
+        self._changing = True
+        try:
+            for op, path, *args in ops:
+                if op not in BATCH_OPS:
+                    raise ValueError('"{}" cannot be batched'.format(op))
+                if log:
+                    self._wal.log(op, (path, *args), {})
+                try:
+                    self._batch_op(parents, op, path, *args)
+                except FilesystemError as e:
+                    results.append(e)
                 else:
-                    # if it's a file, then  noop
-                    return
-            self._cwd.children[path] = File()
+                    results.append(None)
+        finally:
+            self._changing = False
+        return results
 
-    def write(self, path: str, contents: str | Any):
-        if '/' in path:
-            self._deep_child_action(path, self.write, contents)
+    def _batch_op(self, parents: dict, op: str, path: str, *args):
+        head, sep, name = path.rpartition('/')
+        if name in ('', '.', '..') or '..' in head or (op == 'mkdir' and args and args[0]):
+            # paths that name a dir or climb, and mkdir -p, take the usual way
+            if op == 'rm':
+                parents.clear()
+            getattr(self, op)(path, *args)
+            return
+        ancestors = parents.get(head + sep)
+        if ancestors is None:
+            # walking raises the same errors resolving through the parent would, and once there are copies
+            # walking again to create makes every dir on the way this tree's own, which lasts the whole batch
+            ancestors = self._walk(head + sep)[1]
+            if self._clones:
+                ancestors = self._walk(head + sep, create=True)[1]
+            parents[head + sep] = ancestors
+        parent = ancestors[-1]
+        node = parent.children.get(name)
+        if node is not None and not parent.owns(name):
+            node = self._own(parent, name, abspath(path, self._stack) if self._path_index is not None else None)
+        if op == 'mkdir':
+            self._mkdir(parent, name, node, path, ancestors)
+        elif op == 'touch':
+            self._touch(parent, name, node, path, ancestors)
+        elif op == 'write':
+            self._write(self._check_file(name, node), path, *args, ancestors=ancestors)
         else:
-            try:
-                node = self._cwd.children[path]
-                if node.type != Node.TYPE_FILE:
-                    # error if the name exists, but is not a file
-                    raise NotFileError(path)
-                node.contents = contents
-            except KeyError:
-                raise NotFoundError(path)
-
-    def read(self, path: str) -> str | Any:
-        if '/' in path:
-            return self._deep_child_action(path, self.read)
+            self._rm(parent, name, node, path, *args, ancestors=ancestors)
+            if node.is_dir:
+                # dirs below it may be remembered
+                parents.clear()
+
+    def _find_indexed(self, name: str, fuzzy: bool, max_depth: Optional[int], limit: int = None) -> Iterator[str]:
+        # the index gives us every match up front, so keep the ones under the cwd by depth, then only sort a depth
+        # once it's reached, and only as many of it as are still wanted
+        prefix = join(self.pwd(), '')
+        base = prefix.count('/') - 1
+        depths = {}
+        for match in self._name_index.names_containing(name) if fuzzy else [name]:
+            for path in self._name_index.paths(match):
+                if path.startswith(prefix):
+                    depth = path.count('/') - base
+                    if max_depth is None or depth <= max_depth:
+                        depths.setdefault(depth, []).append(path)
+        for depth in sorted(depths):
+            paths = depths.pop(depth)
+            if limit is not None and limit < len(paths):
+                yield from heapq.nsmallest(limit, paths)
+                return
+            yield from sorted(paths)
+            if limit is not None:
+                limit -= len(paths)
+
+    def _find_walking(self, name: str, fuzzy: bool, max_depth: Optional[int]) -> Iterator[str]:
+        # walk breadth first so each level can be sorted and yielded before the next is read
+        matches = []
+        current = 1
+        for depth, parent, items in self._breadth_first(self._cwd, self.pwd(), max_depth):
+            if depth != current:
+                yield from sorted(matches)
+                matches = []
+                current = depth
+            for k, v in items:
+                if (fuzzy and name in k) or name == k:
+                    matches.append(join(parent, k))
+        yield from sorted(matches)
+
+    @reader
+    def ifind(self, name: str, fuzzy: bool = False, recursive: bool = False, limit: int = None,
+              max_depth: int = None) -> Iterator[str]:
+        # lazily find matches shallowest first then alphabetically, max_depth 1 being the cwd's own children
+        if not recursive:
+            max_depth = 1
+        if self._name_index is not None:
+            found = islice(self._find_indexed(name, fuzzy, max_depth, limit), limit)
         else:
-            try:
-                node = self._cwd.children[path]
-                if node.type != Node.TYPE_FILE:
-                    # error if the name exists, but is not a file
-                    raise NotFileError(path)
-                return node.contents
-            except KeyError:
-                raise NotFoundError(path)
-
-    def _move_copy_helper(self, src: str, dst: str, src_func: callable, force_overwrite: bool = False):
-        if not force_overwrite:
-            with self._resetting_stack():
-                if '/' in dst:
-                    # try to change to parent then act (or error)
-                    dst_parent, dst_child = dst.rsplit('/', 1)
-                    self.cd(dst_parent if dst_parent else '/')
-                else:
-                    dst_child = dst
-                if dst_child in self._cwd.children:
-                    # don't allow overwriting unless forced
-                    node = self._cwd.children[dst]
-                    if node.type == Node.TYPE_FILE:
-                        raise FileAlreadyExistsError(dst)
-                    elif node.type == Node.TYPE_DIRECTORY:
-                        raise DirectoryAlreadyExistsError(dst)
-        try:
-            with self._resetting_stack():
-                if '/' in src:
-                    # try to change to parent then act (or error)
-                    src_parent, src_child = src.rsplit('/', 1)
-                    self.cd(src_parent if src_parent else '/')
-                else:
-                    src_child = src
-                src_node = src_func(self._cwd.children, src_child)
-            with self._resetting_stack():
-                if '/' in dst:
-                    # try to change to parent then act (or error)
-                    dst_parent, dst_child = dst.rsplit('/', 1)
-                    self.cd(dst_parent if dst_parent else '/')
-                else:
-                    dst_child = dst
-                self._cwd.children[dst_child] = src_node
-        except KeyError:
-            raise NotFoundError(src)
+            found = islice(self._find_walking(name, fuzzy, max_depth), limit)
+        # the lock only covers the call, so thread safe finds aren't lazy as changes could come mid way otherwise
+        return iter(list(found)) if self._lock is not None else found
+
+    @reader
+    def find(self, name: str, fuzzy: bool = False, recursive: bool = False) -> List[str]:
+        return list(self.ifind(name, fuzzy, recursive))
+
+
+class Snapshot(Filesystem):
+    # a read-only view of a filesystem, only moving around and reading are allowed
+    def __init__(self, root: Directory, cache_size: int = 1024):
+        super().__init__(cache_size)
+        self._root = root
+        self._nodes = [root]
+
+    def restore(self, snap: 'Snapshot'):
+        raise ReadOnlyError
+
+    def mkdir(self, path: str, create_intermediate: bool = False):
+        raise ReadOnlyError
+
+    def rm(self, path: str, force: bool = False):
+        raise ReadOnlyError
+
+    def touch(self, path: str):
+        raise ReadOnlyError
+
+    def write(self, path: str, data: str | bytes, offset: int = None):
+        raise ReadOnlyError
+
+    def append(self, path: str, data: str | bytes):
+        raise ReadOnlyError
+
+    def insert(self, path: str, data: str | bytes, offset: int):
+        raise ReadOnlyError
 
     def mv(self, src: str, dst: str, force_overwrite: bool = False):
-        if src == '/':
-            # you cannot move root
-            raise RootError
-        self._move_copy_helper(src, dst, lambda c, s: c.pop(s), force_overwrite)
+        raise ReadOnlyError
 
     def cp(self, src: str, dst: str, force_overwrite: bool = False):
-        self._move_copy_helper(src, dst, lambda c, s: copy.deepcopy(c[s]), force_overwrite)
+        raise ReadOnlyError
 
-    def find(self, name: str, fuzzy: bool = False, recursive: bool = False) -> List[str]:
-        results = []
-        for k, v in self._cwd.children.items():
-            if (fuzzy and name in k) or name == k:
-                results.append('{}/{}'.format(self.pwd().rstrip('/'), k))
-            if recursive and v.type == Node.TYPE_DIRECTORY:
-                with self._resetting_stack():
-                    self.pushdir(k)
-                    results.extend(self.find(name, fuzzy, recursive))
-        # sort alphabetically with deeper paths later
-        return sorted(sorted(results), key=lambda p: (p.count(os.path.sep), p))
+    def batch(self, ops: Iterable[Sequence]) -> List[Optional[FilesystemError]]:
+        raise ReadOnlyError
+
+    def makedirs_many(self, paths: Iterable[str]):
+        raise ReadOnlyError
+
+    def import_tree(self, host_path: str, dest: str, workers: int = 0):
+        raise ReadOnlyError
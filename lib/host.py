@@ -0,0 +1,97 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List, Tuple
+
+from lib.exceptions import NotDirectoryError
+from lib.node import Node
+from lib.path import join
+
+# files are read and written in blocks this big, and at most this many per worker are in flight at once
+BUFFER_SIZE = 1024 * 1024
+WINDOW = 64
+
+
+def _map(func: Callable, items: Iterable, workers: int) -> Iterator:
+    # map in order, on a thread pool when there are workers, a window at a time so results don't pile up
+    if not workers:
+        yield from map(func, items)
+        return
+    items = iter(items)
+    with ThreadPoolExecutor(workers) as pool:
+        while True:
+            window = list(islice(items, workers * WINDOW))
+            if not window:
+                return
+            yield from pool.map(func, window)
+
+
+def _scan(host_path: str) -> Tuple[List[str], List[str]]:
+    # every dir and file below a host dir, as paths relative to it, without following links to dirs
+    dirs, files = [], []
+    stack = ['']
+    while stack:
+        rel = stack.pop()
+        with os.scandir(os.path.join(host_path, rel)) as entries:
+            for entry in entries:
+                path = join(rel, entry.name) if rel else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    dirs.append(path)
+                    stack.append(path)
+                elif entry.is_file():
+                    files.append(path)
+    return dirs, files
+
+
+def _read(path: str) -> bytes:
+    with open(path, 'rb', buffering=BUFFER_SIZE) as f:
+        return f.read()
+
+
+def import_tree(fs, host_path: str, dest: str, workers: int = 0):
+    # copy everything below a host dir into dest, created if need be, with the files read on workers threads
+    dirs, files = _scan(host_path)
+    fs.makedirs_many([dest] + [join(dest, d) for d in dirs])
+
+    def ops() -> Iterator[Tuple]:
+        contents = _map(_read, (os.path.join(host_path, f) for f in files), workers)
+        for path, data in zip(files, contents):
+            yield 'touch', join(dest, path)
+            yield 'write', join(dest, path), data
+
+    for error in fs.batch(ops()):
+        if error is not None:
+            raise error
+
+
+def _write(item: Tuple[str, List[memoryview]]):
+    path, views = item
+    with open(path, 'wb', buffering=BUFFER_SIZE) as f:
+        for view in views:
+            f.write(view)
+
+
+def export_tree(fs, src: str, host_path: str, workers: int = 0):
+    # write a dir and everything below it out to a host dir, created if need be, or a file to a host file,
+    # with the files written on workers threads; only the tree is read here, so threads never touch it
+    try:
+        fs.ls(src)
+    except NotDirectoryError:
+        _write((host_path, list(fs.iread(src))))
+        return
+
+    def files() -> Iterator[Tuple[str, List[memoryview]]]:
+        os.makedirs(host_path, exist_ok=True)
+        stack = [(src, host_path)]
+        while stack:
+            path, host = stack.pop()
+            for kind, name in fs.ls(path, True):
+                if kind == Node.TYPE_DIRECTORY:
+                    os.makedirs(os.path.join(host, name), exist_ok=True)
+                    stack.append((join(path, name), os.path.join(host, name)))
+                else:
+                    # views of the file's chunks, which stay as they are however the file changes later
+                    yield os.path.join(host, name), list(fs.iread(join(path, name)))
+
+    for _ in _map(_write, files(), workers):
+        pass
@@ -0,0 +1,113 @@
+from typing import Iterable, List, Optional, Set
+
+from lib.directory import Directory
+from lib.node import Node
+
+
+class PathIndex:
+    def __init__(self):
+        # absolute path -> dir, files are found through their parent's children so only dirs are kept
+        self._dirs = {}
+
+    def __len__(self) -> int:
+        return len(self._dirs)
+
+    def __contains__(self, path: str) -> bool:
+        return path in self._dirs
+
+    def get(self, path: str) -> Optional[Directory]:
+        return self._dirs.get(path)
+
+    def add(self, path: str, node: Node):
+        if node.is_dir:
+            self._dirs[path] = node
+
+    def clear(self):
+        self._dirs.clear()
+
+    def remove(self, path: str, node: Node):
+        if node.is_dir:
+            self._dirs.pop(path, None)
+
+
+class NameIndex:
+    def __init__(self):
+        # basename -> absolute paths of every node with that name
+        self._names = {}
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def paths(self, name: str) -> Set[str]:
+        return self._names.get(name, set())
+
+    def names_containing(self, text: str) -> List[str]:
+        # scanning the distinct names is still far cheaper than walking the tree
+        return [name for name in self._names if text in name]
+
+    def add(self, path: str, node: Node):
+        name = path.rpartition('/')[2]
+        if name:
+            self._names.setdefault(name, set()).add(path)
+
+    def clear(self):
+        self._names.clear()
+
+    def remove(self, path: str, node: Node):
+        name = path.rpartition('/')[2]
+        paths = self._names.get(name)
+        if paths is not None:
+            paths.discard(path)
+            if not paths:
+                # don't keep empty sets around for names that are gone
+                del self._names[name]
+
+
+class TrigramIndex(NameIndex):
+    def __init__(self):
+        super().__init__()
+        # trigram -> distinct names containing it
+        self._grams = {}
+
+    @staticmethod
+    def _trigrams(text: str) -> Iterable[str]:
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+    def add(self, path: str, node: Node):
+        name = path.rpartition('/')[2]
+        if name and name not in self._names:
+            # only a name's first path adds its postings
+            for gram in self._trigrams(name):
+                self._grams.setdefault(gram, set()).add(name)
+        super().add(path, node)
+
+    def remove(self, path: str, node: Node):
+        super().remove(path, node)
+        name = path.rpartition('/')[2]
+        if name and name not in self._names:
+            # and its last path removes them
+            for gram in self._trigrams(name):
+                names = self._grams.get(gram)
+                if names is not None:
+                    names.discard(name)
+                    if not names:
+                        del self._grams[gram]
+
+    def clear(self):
+        super().clear()
+        self._grams.clear()
+
+    def names_containing(self, text: str) -> List[str]:
+        if len(text) < 3:
+            # too short to have a trigram
+            return super().names_containing(text)
+        postings = []
+        for gram in self._trigrams(text):
+            names = self._grams.get(gram)
+            if names is None:
+                return []
+            postings.append(names)
+        # intersect smallest first, then check the survivors really contain the text
+        postings.sort(key=len)
+        candidates = postings[0].intersection(*postings[1:])
+        return [name for name in candidates if text in name]
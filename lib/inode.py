@@ -0,0 +1,681 @@
+from array import array
+from itertools import compress, count, islice
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from lib import host
+from lib.blob import BlobStore, CompressionInfo, SpillInfo
+from lib.exceptions import (
+    DirectoryAlreadyExistsError,
+    DirectoryNotEmptyError,
+    FileAlreadyExistsError,
+    FilesystemError,
+    NotDirectoryError,
+    NotFileError,
+    NotFoundError,
+    RootError,
+    SubdirectoryError
+)
+from lib.file import File
+from lib.filesystem import BATCH_OPS, DiskUsage, Stats
+from lib.node import Node
+from lib.path import join
+from lib.sortedlist import SortedList
+
+ROOT = 0
+NONE = -1
+FREE = 0
+DIRECTORY = 1
+FILE = 2
+
+TYPES = {DIRECTORY: Node.TYPE_DIRECTORY, FILE: Node.TYPE_FILE}
+
+
+class InodeFilesystem:
+    # the same api as Filesystem, but every node is an integer inode indexing a set of array columns rather than
+    # an object of its own, which costs a fraction of the memory per node and lets find scan a whole column at once
+    def __init__(self, chunk_size: int = File.CHUNK_SIZE, memory_budget: int = None, compression: str = 'zlib',
+                 spill_dir: str = None):
+        # 32 bits is plenty for inode and name ids, and for counts of nodes, only sizes need 64
+        self._kind = array('b', [DIRECTORY])
+        self._parent = array('i', [NONE])
+        self._name = array('i', [NONE])
+        # totals for everything below a dir, and a file's own size in _bytes, so du never walks
+        self._dirs = array('i', [0])
+        self._files = array('i', [0])
+        self._bytes = array('q', [0])
+        # removed inodes are reused before the columns grow
+        self._free = []
+        # every name is kept once in a string table and referred to by its index
+        self._names = []
+        self._name_ids = {}
+        # dir inode -> {name id: inode}, only for dirs that have children
+        self._children = {}
+        # dir inode -> SortedList of its children's names, only for dirs that have been listed in order
+        self._order = {}
+        # file inode -> File holding its contents, only for files that have been written to
+        self._contents = {}
+        self._chunk_size = chunk_size
+        self._blobs = BlobStore(memory_budget, compression, spill_dir)
+        # the working directory as parallel stacks of names, inodes and pwd strings, like Filesystem's
+        self._stack = []
+        self._nodes = [ROOT]
+        self._paths = ['/']
+
+    def __len__(self) -> int:
+        # the number of inodes in use, root included
+        return len(self._kind) - len(self._free)
+
+    def _intern(self, name: str) -> int:
+        nid = self._name_ids.get(name)
+        if nid is None:
+            nid = self._name_ids[name] = len(self._names)
+            self._names.append(name)
+        return nid
+
+    def _child(self, node: int, name: str) -> int:
+        nid = self._name_ids.get(name)
+        children = self._children.get(node)
+        if nid is None or children is None:
+            return NONE
+        return children.get(nid, NONE)
+
+    def _alloc(self, kind: int, parent: int, name: str) -> int:
+        nid = self._intern(name)
+        if self._free:
+            node = self._free.pop()
+            self._kind[node] = kind
+            self._parent[node] = parent
+            self._name[node] = nid
+        else:
+            node = len(self._kind)
+            self._kind.append(kind)
+            self._parent.append(parent)
+            self._name.append(nid)
+            self._dirs.append(0)
+            self._files.append(0)
+            self._bytes.append(0)
+        if parent != NONE:
+            self._children.setdefault(parent, {})[nid] = node
+            if parent in self._order:
+                self._order[parent].add(name)
+        return node
+
+    def _detach(self, node: int):
+        parent = self._parent[node]
+        children = self._children[parent]
+        del children[self._name[node]]
+        if not children:
+            del self._children[parent]
+        if parent in self._order:
+            self._order[parent].remove(self._names[self._name[node]])
+        self._parent[node] = NONE
+
+    def _attach(self, node: int, parent: int, name: str):
+        nid = self._intern(name)
+        self._name[node] = nid
+        self._parent[node] = parent
+        self._children.setdefault(parent, {})[nid] = node
+        if parent in self._order:
+            self._order[parent].add(name)
+
+    def _free_subtree(self, node: int):
+        stack = [node]
+        while stack:
+            n = stack.pop()
+            stack.extend(self._children.pop(n, {}).values())
+            self._order.pop(n, None)
+            self._contents.pop(n, None)
+            self._kind[n] = FREE
+            self._parent[n] = NONE
+            self._name[n] = NONE
+            self._dirs[n] = self._files[n] = self._bytes[n] = 0
+            self._free.append(n)
+
+    def _totals(self, node: int) -> Tuple[int, int, int]:
+        if self._kind[node] == DIRECTORY:
+            return self._dirs[node] + 1, self._files[node], self._bytes[node]
+        return 0, 1, self._bytes[node]
+
+    def _account(self, node: int, dirs: int = 0, files: int = 0, size: int = 0):
+        # climb the parent column from a dir, adding a change to every total on the way to root
+        while node != NONE:
+            self._dirs[node] += dirs
+            self._files[node] += files
+            self._bytes[node] += size
+            node = self._parent[node]
+
+    def _path(self, node: int) -> str:
+        names = []
+        while node != ROOT and node != NONE:
+            names.append(self._names[self._name[node]])
+            node = self._parent[node]
+        return '/' + '/'.join(reversed(names))
+
+    def _walk(self, path: str, create: bool = False) -> Tuple[List[str], List[int]]:
+        # walk every part of the path as a directory, returning the names and inodes from root
+        if path.startswith('/'):
+            names, nodes = [], [ROOT]
+        else:
+            names, nodes = self._stack.copy(), self._nodes.copy()
+        # when creating, the number of new dirs below each inode on the way, only added to its totals
+        # once the walk is done with it, like Filesystem's walk
+        added = [0] * len(nodes) if create else None
+        try:
+            for part in path.split('/'):
+                if not part or part == '.':
+                    continue
+                if part == '..':
+                    if names:
+                        names.pop()
+                        done = nodes.pop()
+                        if create:
+                            n = added.pop()
+                            self._dirs[done] += n
+                            added[-1] += n
+                    continue
+                node = self._child(nodes[-1], part)
+                if node == NONE:
+                    if not create:
+                        raise NotFoundError(part)
+                    node = self._alloc(DIRECTORY, nodes[-1], part)
+                    added[-1] += 1
+                elif self._kind[node] != DIRECTORY:
+                    if create:
+                        # error if a file exists where we need a dir
+                        raise FileAlreadyExistsError(part)
+                    raise NotDirectoryError(part)
+                names.append(part)
+                nodes.append(node)
+                if create:
+                    added.append(0)
+        finally:
+            if create:
+                # dirs made before an error still count
+                for i in range(len(nodes) - 1, -1, -1):
+                    self._dirs[nodes[i]] += added[i]
+                    if i:
+                        added[i - 1] += added[i]
+        return names, nodes
+
+    def _below(self, node: int, top: int) -> bool:
+        # whether top is one of the dirs above node
+        while node != NONE:
+            node = self._parent[node]
+            if node == top:
+                return True
+        return False
+
+    def _resolve(self, path: str) -> Tuple[int, Optional[str], int]:
+        # resolve a path to (parent, name, node) like Filesystem does, with NONE for no parent or no node
+        if '..' in path:
+            return self._resolve_climbing(path)
+        node = ROOT if path.startswith('/') else self._nodes[-1]
+        parent, name = NONE, None
+        for part in path.split('/'):
+            if not part or part == '.':
+                continue
+            if node == NONE:
+                raise NotFoundError(name)
+            if self._kind[node] != DIRECTORY:
+                raise NotDirectoryError(name)
+            parent, name, node = node, part, self._child(node, part)
+        return parent, name, node
+
+    def _resolve_climbing(self, path: str) -> Tuple[int, Optional[str], int]:
+        head, _, tail = path.rstrip('/').rpartition('/')
+        if tail in ('', '.', '..'):
+            # the path names a directory reached by climbing
+            return NONE, None, self._walk(path)[1][-1]
+        if not head and path.startswith('/'):
+            head = '/'
+        parent = self._walk(head)[1][-1]
+        return parent, tail, self._child(parent, tail)
+
+    def _resolve_child(self, path: str) -> Tuple[int, str, int]:
+        parent, name, node = self._resolve(path)
+        if parent == NONE:
+            if node == ROOT:
+                # you cannot action on root
+                raise RootError
+            raise NotFoundError(path)
+        return parent, name, node
+
+    def _resolve_dir(self, path: str) -> int:
+        _, name, node = self._resolve(path)
+        if node == NONE:
+            raise NotFoundError(name)
+        if self._kind[node] != DIRECTORY:
+            raise NotDirectoryError(name)
+        return node
+
+    def _resolve_file(self, path: str) -> int:
+        _, name, node = self._resolve_child(path)
+        return self._check_file(name, node)
+
+    def _check_file(self, name: str, node: int) -> int:
+        if node == NONE:
+            raise NotFoundError(name)
+        if self._kind[node] != FILE:
+            # error if the name exists, but is not a file
+            raise NotFileError(name)
+        return node
+
+    def _file(self, node: int) -> File:
+        contents = self._contents.get(node)
+        if contents is None:
+            contents = self._contents[node] = File(self._chunk_size, self._blobs)
+        return contents
+
+    def pushdir(self, directory: str):
+        node = self._child(self._nodes[-1], directory)
+        if node == NONE:
+            raise NotFoundError(directory)
+        if self._kind[node] != DIRECTORY:
+            raise NotDirectoryError(directory)
+        self._stack.append(directory)
+        self._nodes.append(node)
+        self._paths.append(join(self._paths[-1], directory))
+
+    def popdir(self):
+        if len(self._stack):
+            self._stack.pop()
+            self._nodes.pop()
+            self._paths.pop()
+
+    def cd(self, path: str):
+        if path == '.':
+            # change to current dir is a noop
+            return
+        if path == '..':
+            # shortcut for popdir
+            self.popdir()
+        elif '/' not in path:
+            self.pushdir(path)
+        else:
+            names, nodes = self._walk(path)
+            paths = ['/']
+            for name in names:
+                paths.append(join(paths[-1], name))
+            self._stack, self._nodes, self._paths = names, nodes, paths
+
+    def pwd(self) -> str:
+        return self._paths[-1]
+
+    def du(self, path: str = None) -> DiskUsage:
+        # count the dirs, files and bytes in a subtree, itself included, from the total columns
+        if path:
+            _, name, node = self._resolve(path)
+            if node == NONE:
+                raise NotFoundError(name)
+        else:
+            node = self._nodes[-1]
+        return DiskUsage(*self._totals(node))
+
+    def exists(self, path: str) -> bool:
+        try:
+            return self._resolve(path)[2] != NONE
+        except FilesystemError:
+            # a missing (or file) parent means the path can't exist either
+            return False
+
+    def stats(self) -> Stats:
+        files, size = self._files[ROOT], self._bytes[ROOT]
+        info = self._blobs.info()
+        stored = info.size + sum(len(f.tail) for f in self._contents.values())
+        return Stats(files, size, stored, info.blobs, size / stored if stored else 1.0)
+
+    def compression_info(self) -> CompressionInfo:
+        return self._blobs.compression_info()
+
+    def spill_info(self) -> SpillInfo:
+        return self._blobs.spill_info()
+
+    def ls(self, path: str = None, long: bool = False, sort: bool = False, start_after: str = None,
+           limit: int = None, prefix: str = None) -> List:
+        node = self._resolve_dir(path) if path else self._nodes[-1]
+        children = self._children.get(node, {})
+        if sort or start_after is not None or prefix is not None:
+            # page through the names in order, sorted for a dir the first time it's asked for
+            order = self._order.get(node)
+            if order is None:
+                order = self._order[node] = SortedList(self._names[nid] for nid in children)
+            names = list(islice(order.irange(start_after, prefix), limit))
+            if long:
+                return [(TYPES[self._kind[children[self._name_ids[k]]]], k) for k in names]
+            return names
+        if long:
+            # return a tuple with the type
+            return [(TYPES[self._kind[c]], self._names[nid]) for nid, c in islice(children.items(), limit)]
+        else:
+            return [self._names[nid] for nid in islice(children, limit)]
+
+    def mkdir(self, path: str, create_intermediate: bool = False):
+        if create_intermediate:
+            # create every missing part of the path in one walk
+            self._walk(path, create=True)
+            return
+        parent, name, node = self._resolve(path)
+        if parent == NONE:
+            # creating root (or the cwd) is a noop
+            return
+        self._mkdir(parent, name, node)
+
+    def makedirs_many(self, paths: Iterable[str]):
+        # mkdir -p every path in one pass over a trie of them, so a parent shared by many paths is visited once,
+        # and nothing is created if a file is in the way of any of them
+        trie = {}
+        cwd = None
+        for path in paths:
+            if path.startswith('/'):
+                nodes = [trie]
+            else:
+                if cwd is None:
+                    cwd = [trie]
+                    for name in self._stack:
+                        cwd.append(cwd[-1].setdefault(name, {}))
+                nodes = cwd
+            if '..' in path:
+                # climbing is walked like mkdir -p walks it, so every dir climbed out of is made (or in the way) too
+                nodes = nodes.copy()
+                for part in path.split('/'):
+                    if part == '..':
+                        if len(nodes) > 1:
+                            nodes.pop()
+                    elif part and part != '.':
+                        nodes.append(nodes[-1].setdefault(part, {}))
+                continue
+            node = nodes[-1]
+            for part in path.split('/'):
+                if part and part != '.':
+                    node = node.setdefault(part, {})
+        stack = [(trie, ROOT)]
+        while stack:
+            below, directory = stack.pop()
+            for name, sub in below.items():
+                child = self._child(directory, name)
+                if child != NONE:
+                    if self._kind[child] != DIRECTORY:
+                        # error if a file exists where we need a dir
+                        raise FileAlreadyExistsError(name)
+                    stack.append((sub, child))
+        # then create what's missing, remembering every dir visited with its parent's place in the list and the
+        # dirs created below it, so the totals can be added up from the bottom afterwards
+        visited = []
+        stack = [(trie, ROOT, -1)]
+        while stack:
+            below, directory, up = stack.pop()
+            i = len(visited)
+            visited.append([directory, up, 0])
+            for name, sub in below.items():
+                child = self._child(directory, name)
+                if child == NONE:
+                    child = self._alloc(DIRECTORY, directory, name)
+                    visited[i][2] += 1
+                stack.append((sub, child, i))
+        for directory, up, added in reversed(visited):
+            self._dirs[directory] += added
+            if up >= 0:
+                visited[up][2] += added
+
+    def import_tree(self, host_path: str, dest: str, workers: int = 0):
+        # copy a host dir's contents into dest, reading files on a thread pool if given workers
+        host.import_tree(self, host_path, dest, workers)
+
+    def export_tree(self, src: str, host_path: str, workers: int = 0):
+        # write a dir (or file) out to the host, writing files on a thread pool if given workers
+        host.export_tree(self, src, host_path, workers)
+
+    # each change below is split into resolving its path then making it, so batch can resolve once for many
+
+    def _mkdir(self, parent: int, name: str, node: int):
+        if node != NONE:
+            if self._kind[node] == FILE:
+                # error if a file exists with the same name
+                raise FileAlreadyExistsError(name)
+            # if it's a dir, then  noop
+            return
+        self._alloc(DIRECTORY, parent, name)
+        self._account(parent, dirs=1)
+
+    def _remove(self, node: int):
+        # take a node out of the tree along with its totals
+        parent = self._parent[node]
+        dirs, files, size = self._totals(node)
+        self._detach(node)
+        self._account(parent, -dirs, -files, -size)
+
+    def _leave(self, node: int):
+        # a node is leaving its place in the tree, so if the cwd is inside it, it climbs to the node's parent
+        if node in self._nodes:
+            i = self._nodes.index(node)
+            del self._stack[i - 1:], self._nodes[i:], self._paths[i:]
+
+    def _drop(self, node: int):
+        # remove a node for good, its inodes are reused so the cwd can't stay inside it
+        self._leave(node)
+        self._remove(node)
+        self._free_subtree(node)
+
+    def _replace(self, old: int, node: int):
+        # put a detached node in place of another for good, under its name and at its place in the listing
+        parent, nid = self._parent[old], self._name[old]
+        dirs, files, size = self._totals(old)
+        self._leave(old)
+        self._account(parent, -dirs, -files, -size)
+        self._children[parent][nid] = node
+        self._parent[old] = NONE
+        self._free_subtree(old)
+        self._name[node], self._parent[node] = nid, parent
+        self._account(parent, *self._totals(node))
+
+    def rm(self, path: str, force: bool = False):
+        _, name, node = self._resolve_child(path)
+        self._rm(name, node, force)
+
+    def _rm(self, name: str, node: int, force: bool = False):
+        if node == NONE:
+            raise NotFoundError(name)
+        # don't allow removing non-empty dirs unless forced (rm -f)
+        if not force and node in self._children:
+            raise DirectoryNotEmptyError(name)
+        self._drop(node)
+
+    def touch(self, path: str):
+        parent, name, node = self._resolve_child(path)
+        self._touch(parent, name, node)
+
+    def _touch(self, parent: int, name: str, node: int):
+        if node != NONE:
+            if self._kind[node] == DIRECTORY:
+                # error if a dir exists with the same name
+                raise DirectoryAlreadyExistsError(name)
+            # if it's a file, then  noop
+            return
+        self._alloc(FILE, parent, name)
+        self._account(parent, files=1)
+
+    @staticmethod
+    def _bytes_of(data: str | bytes) -> bytes:
+        # text is stored as utf-8
+        return data.encode() if isinstance(data, str) else data
+
+    def _resize(self, node: int, contents: File):
+        size = contents.size - self._bytes[node]
+        self._bytes[node] = contents.size
+        self._account(self._parent[node], size=size)
+
+    def write(self, path: str, data: str | bytes, offset: int = None):
+        self._write(self._resolve_file(path), data, offset)
+
+    def _write(self, node: int, data: str | bytes, offset: int = None):
+        contents = self._file(node)
+        contents.write(self._bytes_of(data), offset)
+        self._resize(node, contents)
+
+    def append(self, path: str, data: str | bytes):
+        node = self._resolve_file(path)
+        contents = self._file(node)
+        contents.append(self._bytes_of(data))
+        self._resize(node, contents)
+
+    def insert(self, path: str, data: str | bytes, offset: int):
+        node = self._resolve_file(path)
+        contents = self._file(node)
+        contents.insert(self._bytes_of(data), offset)
+        self._resize(node, contents)
+
+    def read(self, path: str, offset: int = 0, size: int = None, view: bool = False) -> bytes | memoryview:
+        contents = self._contents.get(self._resolve_file(path))
+        if contents is None:
+            File.check_range(offset, size)
+            return memoryview(b'') if view else b''
+        contents = contents.read(offset, size)
+        return contents if view else bytes(contents)
+
+    def iread(self, path: str, offset: int = 0, size: int = None) -> Iterator[memoryview]:
+        contents = self._contents.get(self._resolve_file(path))
+        if contents is None:
+            File.check_range(offset, size)
+            return iter(())
+        return contents.iread(offset, size)
+
+    @staticmethod
+    def _check_overwrite(dst: str, kind: Optional[int], force_overwrite: bool):
+        if kind is not None and not force_overwrite:
+            # don't allow overwriting unless forced
+            if kind == FILE:
+                raise FileAlreadyExistsError(dst)
+            raise DirectoryAlreadyExistsError(dst)
+
+    def mv(self, src: str, dst: str, force_overwrite: bool = False):
+        # resolve both ends before changing anything so a bad destination can't lose the source
+        dst_parent, dst_name, dst_node = self._resolve_child(dst)
+        self._check_overwrite(dst, self._kind[dst_node] if dst_node != NONE else None, force_overwrite)
+        _, _, src_node = self._resolve_child(src)
+        if src_node == NONE:
+            raise NotFoundError(src)
+        if self._kind[src_node] == DIRECTORY and (dst_parent == src_node or self._below(dst_parent, src_node)):
+            # a dir can't be moved into its own subtree
+            raise SubdirectoryError(src)
+        if dst_node == src_node:
+            # moving onto itself changes nothing
+            return
+        self._leave(src_node)
+        self._remove(src_node)
+        if dst_node != NONE:
+            self._replace(dst_node, src_node)
+            return
+        self._attach(src_node, dst_parent, dst_name)
+        self._account(dst_parent, *self._totals(src_node))
+
+    def _copy(self, node: int) -> int:
+        # copy a subtree to new inodes, sharing file contents copy-on-write, returning the detached copy
+        copy = NONE
+        stack = [(node, NONE)]
+        while stack:
+            n, parent = stack.pop()
+            c = self._alloc(self._kind[n], parent, self._names[self._name[n]])
+            if parent == NONE:
+                copy = c
+            self._dirs[c], self._files[c], self._bytes[c] = self._dirs[n], self._files[n], self._bytes[n]
+            if n in self._contents:
+                self._contents[c] = self._contents[n].clone()
+            stack.extend((child, c) for child in self._children.get(n, {}).values())
+        return copy
+
+    def cp(self, src: str, dst: str, force_overwrite: bool = False):
+        _, _, dst_node = self._resolve_child(dst)
+        self._check_overwrite(dst, self._kind[dst_node] if dst_node != NONE else None, force_overwrite)
+        _, _, src_node = self._resolve_child(src)
+        if src_node == NONE:
+            raise NotFoundError(src)
+        # copy before attaching, the destination may be under the source
+        node = self._copy(src_node)
+        dst_parent, dst_name, dst_node = self._resolve_child(dst)
+        if dst_node != NONE:
+            self._replace(dst_node, node)
+            return
+        self._attach(node, dst_parent, dst_name)
+        self._account(dst_parent, *self._totals(node))
+
+    def batch(self, ops: Iterable[Sequence]) -> List[Optional[FilesystemError]]:
+        # run ('mkdir' | 'touch' | 'write' | 'rm', path, *args) ops in order, resolving each parent dir once
+        # for the whole batch rather than once per op, returning None for each op that worked or its error
+        parents = {}
+        results = []
+        for op, path, *args in ops:
+            if op not in BATCH_OPS:
+                raise ValueError('"{}" cannot be batched'.format(op))
+            try:
+                self._batch_op(parents, op, path, *args)
+            except FilesystemError as e:
+                results.append(e)
+            else:
+                results.append(None)
+        return results
+
+    def _batch_op(self, parents: dict, op: str, path: str, *args):
+        head, sep, name = path.rpartition('/')
+        if name in ('', '.', '..') or '..' in head or (op == 'mkdir' and args and args[0]):
+            # paths that name a dir or climb, and mkdir -p, take the usual way
+            if op == 'rm':
+                parents.clear()
+            getattr(self, op)(path, *args)
+            return
+        parent = parents.get(head + sep)
+        if parent is None:
+            # walking raises the same errors resolving through the parent would
+            parent = parents[head + sep] = self._walk(head + sep)[1][-1]
+        node = self._child(parent, name)
+        if op == 'mkdir':
+            self._mkdir(parent, name, node)
+        elif op == 'touch':
+            self._touch(parent, name, node)
+        elif op == 'write':
+            self._write(self._check_file(name, node), *args)
+        else:
+            is_dir = node != NONE and self._kind[node] == DIRECTORY
+            self._rm(name, node, *args)
+            if is_dir:
+                # its inodes may be reused, and dirs below it may be remembered
+                parents.clear()
+
+    def _matches(self, name: str, fuzzy: bool) -> Iterator[int]:
+        # scan the whole name column at once for the inodes with a matching name
+        if fuzzy:
+            nids = {nid for nid, n in enumerate(self._names) if name in n}
+            return compress(count(), map(nids.__contains__, self._name))
+        nid = self._name_ids.get(name)
+        if nid is None:
+            return iter(())
+        # an exact name is a byte search of the raw column, keeping only hits on an item boundary
+        column = self._name.tobytes()
+        pattern = array(self._name.typecode, [nid]).tobytes()
+        width = len(pattern)
+        matches = []
+        i = column.find(pattern)
+        while i != -1:
+            if not i % width:
+                matches.append(i // width)
+            i = column.find(pattern, i + 1)
+        return iter(matches)
+
+    def ifind(self, name: str, fuzzy: bool = False, recursive: bool = False, limit: int = None,
+              max_depth: int = None) -> Iterator[str]:
+        # lazily find matches shallowest first then alphabetically, max_depth 1 being the cwd's own children
+        if not recursive:
+            max_depth = 1
+        cwd = self._nodes[-1]
+        results = []
+        for node in self._matches(name, fuzzy):
+            # climb to the cwd to find the depth, skipping anything that isn't under it
+            depth, n = 0, node
+            while n != cwd and n != NONE:
+                n = self._parent[n]
+                depth += 1
+            if n == cwd and node != cwd and (max_depth is None or depth <= max_depth):
+                results.append((depth, self._path(node)))
+        return islice((path for _, path in sorted(results)), limit)
+
+    def find(self, name: str, fuzzy: bool = False, recursive: bool = False) -> List[str]:
+        return list(self.ifind(name, fuzzy, recursive))
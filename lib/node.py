@@ -2,6 +2,8 @@ class Node:
     TYPE_DIRECTORY = 'Directory'
     TYPE_FILE = 'File'
 
-    @property
-    def type(self):
-        return self.__class__.__name__
+    # no per-node __dict__, subclasses list their own slots and set their type (and is_dir for hot paths) on the class,
+    # nodes can be referred to weakly (see PathCache)
+    __slots__ = ('__weakref__',)
+    type = None
+    is_dir = False
@@ -0,0 +1,19 @@
+from typing import List
+
+
+def join(parent: str, name: str) -> str:
+    # root (or a path given with a trailing slash) is the only one that already ends with a slash
+    return '{}{}'.format(parent, name) if parent.endswith('/') else '{}/{}'.format(parent, name)
+
+
+def abspath(path: str, cwd: List[str]) -> str:
+    # normalize a path against the names of the dirs down to the cwd without touching the tree,
+    # '..' at root stays at root
+    parts = [] if path.startswith('/') else cwd.copy()
+    for part in path.split('/'):
+        if part == '..':
+            if parts:
+                parts.pop()
+        elif part and part != '.':
+            parts.append(part)
+    return '/{}'.format('/'.join(parts))
@@ -0,0 +1,93 @@
+import threading
+from functools import wraps
+
+
+class RWLock:
+    # any number of readers or one writer, with waiting writers let in before new readers so a steady stream of
+    # reads can't hold changes off forever. it's reentrant, so a method holding it can call others that take it,
+    # and a writer can read, but a reader can't become a writer as two readers trying to would wait on each other
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._waiting = 0
+        self._writer = None
+        self._writes = 0
+        # how many reads each thread is inside of
+        self._local = threading.local()
+
+    def acquire_read(self):
+        local = self._local
+        reads = getattr(local, 'reads', 0)
+        if reads or self._writer == threading.get_ident():
+            local.reads = reads + 1
+            return
+        with self._cond:
+            while self._writer is not None or self._waiting:
+                self._cond.wait()
+            self._readers += 1
+        local.reads = 1
+
+    def release_read(self):
+        local = self._local
+        local.reads -= 1
+        if local.reads or self._writer == threading.get_ident():
+            return
+        with self._cond:
+            self._readers -= 1
+            if not self._readers:
+                self._cond.notify_all()
+
+    def acquire_write(self):
+        me = threading.get_ident()
+        if self._writer == me:
+            self._writes += 1
+            return
+        if getattr(self._local, 'reads', 0):
+            raise RuntimeError('a reader cannot become a writer')
+        with self._cond:
+            self._waiting += 1
+            try:
+                while self._writer is not None or self._readers:
+                    self._cond.wait()
+            finally:
+                self._waiting -= 1
+            self._writer = me
+            self._writes = 1
+
+    def release_write(self):
+        self._writes -= 1
+        if self._writes:
+            return
+        with self._cond:
+            self._writer = None
+            self._cond.notify_all()
+
+
+def reader(method):
+    # run a method holding its object's lock shared with other readers, if it has one
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        lock = self._lock
+        if lock is None:
+            return method(self, *args, **kwargs)
+        lock.acquire_read()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            lock.release_read()
+    return wrapper
+
+
+def writer(method):
+    # run a method holding its object's lock alone, if it has one
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        lock = self._lock
+        if lock is None:
+            return method(self, *args, **kwargs)
+        lock.acquire_write()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            lock.release_write()
+    return wrapper
@@ -0,0 +1,70 @@
+from bisect import bisect_left, bisect_right, insort
+from typing import Iterable, Iterator
+
+
+class SortedList:
+    # names kept sorted in blocks of up to twice LOAD, so adding or removing one only moves the rest of its block
+    # rather than everything after it, and a page is a bisect of the block maxes then one of a block
+    LOAD = 1000
+
+    __slots__ = ('_blocks', '_maxes', '_len')
+
+    def __init__(self, names: Iterable[str] = ()):
+        names = sorted(names)
+        self._blocks = [names[i:i + self.LOAD] for i in range(0, len(names), self.LOAD)]
+        self._maxes = [block[-1] for block in self._blocks]
+        self._len = len(names)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator[str]:
+        return self.irange()
+
+    def add(self, name: str):
+        self._len += 1
+        if not self._blocks:
+            self._blocks.append([name])
+            self._maxes.append(name)
+            return
+        # the first block that can hold it, or the last if it sorts after everything
+        i = min(bisect_left(self._maxes, name), len(self._blocks) - 1)
+        block = self._blocks[i]
+        insort(block, name)
+        self._maxes[i] = block[-1]
+        if len(block) > 2 * self.LOAD:
+            # split a full block in two
+            self._blocks.insert(i + 1, block[self.LOAD:])
+            del block[self.LOAD:]
+            self._maxes.insert(i, block[-1])
+
+    def remove(self, name: str):
+        i = bisect_left(self._maxes, name)
+        block = self._blocks[i] if i < len(self._blocks) else []
+        j = bisect_left(block, name)
+        if j == len(block) or block[j] != name:
+            raise ValueError(name)
+        del block[j]
+        self._len -= 1
+        if block:
+            self._maxes[i] = block[-1]
+        else:
+            del self._blocks[i], self._maxes[i]
+
+    def irange(self, start_after: str = None, prefix: str = None) -> Iterator[str]:
+        # yield the names after start_after that start with prefix, in order
+        if start_after is not None and (prefix is None or start_after >= prefix):
+            i = bisect_right(self._maxes, start_after)
+            j = bisect_right(self._blocks[i], start_after) if i < len(self._blocks) else 0
+        else:
+            low = prefix or ''
+            i = bisect_left(self._maxes, low)
+            j = bisect_left(self._blocks[i], low) if i < len(self._blocks) else 0
+        for k in range(i, len(self._blocks)):
+            block = self._blocks[k]
+            for name in block[j:] if j else block:
+                if prefix and not name.startswith(prefix):
+                    # everything after this sorts past the prefix too
+                    return
+                yield name
+            j = 0
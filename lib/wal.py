@@ -0,0 +1,191 @@
+import os
+import struct
+import threading
+import uuid
+import zlib
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+# every record is its body's length and crc32 then the body, so a torn write at the end of the log is spotted
+HEADER = struct.Struct('<II')
+LENGTH = struct.Struct('<I')
+INT = struct.Struct('<q')
+
+GROUP_SIZE = 64 * 1024
+GROUP_DELAY = 0.005
+
+# every log starts with a begin record holding a token of its own, so a checkpoint can tell which log it was taken from
+BEGIN = 'begin'
+
+
+def _encode(value, out: bytearray):
+    # values are tagged: None, True, False, int, str, bytes, or a list of them
+    if value is None:
+        out += b'N'
+    elif value is True:
+        out += b'T'
+    elif value is False:
+        out += b'F'
+    elif isinstance(value, int):
+        out += b'i'
+        out += INT.pack(value)
+    elif isinstance(value, str):
+        data = value.encode()
+        out += b's'
+        out += LENGTH.pack(len(data))
+        out += data
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        out += b'b'
+        out += LENGTH.pack(len(value))
+        out += value
+    else:
+        out += b'l'
+        out += LENGTH.pack(len(value))
+        for item in value:
+            _encode(item, out)
+
+
+def _decode(body: bytes, pos: int) -> Tuple[object, int]:
+    tag = body[pos:pos + 1]
+    pos += 1
+    if tag == b'N':
+        return None, pos
+    if tag == b'T':
+        return True, pos
+    if tag == b'F':
+        return False, pos
+    if tag == b'i':
+        return INT.unpack_from(body, pos)[0], pos + INT.size
+    (n,) = LENGTH.unpack_from(body, pos)
+    pos += LENGTH.size
+    if tag == b's':
+        return body[pos:pos + n].decode(), pos + n
+    if tag == b'b':
+        return body[pos:pos + n], pos + n
+    items = []
+    for _ in range(n):
+        item, pos = _decode(body, pos)
+        items.append(item)
+    return items, pos
+
+
+def encode(op: str, args: tuple, kwargs: dict) -> bytearray:
+    # a record is the op, its positional args and its keyword args
+    body = bytearray()
+    _encode(op, body)
+    _encode(list(args), body)
+    _encode([v for item in kwargs.items() for v in item], body)
+    return bytearray(HEADER.pack(len(body), zlib.crc32(body))) + body
+
+
+def records(f: BinaryIO) -> Iterator[Tuple[int, str, list, dict]]:
+    # yield (end offset, op, args, kwargs) for every whole record, stopping at the first torn or corrupt one
+    end = f.tell()
+    while True:
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            return
+        length, crc = HEADER.unpack(header)
+        body = f.read(length)
+        if len(body) < length or zlib.crc32(body) != crc:
+            return
+        end += HEADER.size + length
+        op, pos = _decode(body, 0)
+        args, pos = _decode(body, pos)
+        pairs, _ = _decode(body, pos)
+        yield end, op, args, dict(zip(pairs[::2], pairs[1::2]))
+
+
+def token(path: str) -> Optional[str]:
+    # the token from a log's begin record, if it has one yet
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        for _, op, args, _ in records(f):
+            return args[0] if op == BEGIN else None
+    return None
+
+
+def empty(path: str) -> bool:
+    # whether a log is missing or holds nothing but its begin record
+    if not os.path.exists(path):
+        return True
+    with open(path, 'rb') as f:
+        return all(op == BEGIN for _, op, _, _ in records(f))
+
+
+def new_token() -> str:
+    return uuid.uuid4().hex
+
+
+def _begin(f: BinaryIO, new: str = None) -> str:
+    new = new or new_token()
+    f.write(encode(BEGIN, (new,), {}))
+    f.flush()
+    os.fsync(f.fileno())
+    return new
+
+
+class WriteAheadLog:
+    def __init__(self, path: str, group_size: int = GROUP_SIZE, group_delay: float = GROUP_DELAY):
+        self.path = path
+        self._file = open(path, 'ab')
+        self.token = token(path) if self._file.tell() else _begin(self._file)
+        # group commit: records are buffered and written with one fsync once there are group_size bytes of them
+        # or the oldest has waited group_delay seconds, 0 meaning every record is synced on its own
+        self._group_size = group_size
+        self._group_delay = group_delay
+        self._buffer = bytearray()
+        # the timer syncs from another thread, so the buffer and file are only touched holding the lock
+        self._lock = threading.Lock()
+        self._timer = None
+        self.records = 0
+        self.syncs = 0
+
+    def log(self, op: str, args: tuple, kwargs: dict):
+        record = encode(op, args, kwargs)
+        with self._lock:
+            self._buffer += record
+            self.records += 1
+            if len(self._buffer) >= self._group_size:
+                self._sync()
+            elif self._timer is None:
+                self._timer = threading.Timer(self._group_delay, self.sync)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def sync(self):
+        with self._lock:
+            self._sync()
+
+    def _sync(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._buffer:
+            self._file.write(self._buffer)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._buffer.clear()
+            self.syncs += 1
+
+    @property
+    def size(self) -> int:
+        # the bytes synced so far
+        with self._lock:
+            self._sync()
+            return self._file.tell()
+
+    def reset(self, new: str = None):
+        # start over with an empty log under a new token, swapped in whole so a crash leaves one log or the other
+        with self._lock:
+            self._sync()
+            self._file.close()
+            with open(self.path + '.new', 'wb') as f:
+                self.token = _begin(f, new)
+            os.replace(self.path + '.new', self.path)
+            self._file = open(self.path, 'ab')
+
+    def close(self):
+        with self._lock:
+            self._sync()
+            self._file.close()
@@ -0,0 +1,174 @@
+import gc
+import os
+import tempfile
+import unittest
+
+from lib.blob import Blob, BlobInfo, BlobStore, digest
+
+
+class BlobStoreTests(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        self.store = BlobStore()
+
+    def testIntern(self):
+        a = self.store.intern(b'foobar')
+        b = self.store.intern(bytes(bytearray(b'foobar')))
+        c = self.store.intern(b'foobaz')
+
+        # ensure equal data shares a blob
+        self.assertIs(a, b)
+        self.assertIsNot(a, c)
+        self.assertEqual(a.data, b'foobar')
+        self.assertEqual(self.store.info(), BlobInfo(1, 2, 2, 12))
+
+    def testAdd(self):
+        blob = Blob(b'foobar')
+        blob.key = digest(b'foobar')
+        self.store.add(blob)
+
+        # ensure a blob taken in under its key is shared with equal data interned later
+        self.assertIs(self.store.intern(b'foobar'), blob)
+        self.assertEqual(self.store.info(), BlobInfo(1, 0, 1, 6))
+
+        # but one whose key is taken isn't
+        clash = Blob(b'foobar')
+        clash.key = blob.key
+        self.store.add(clash)
+        self.assertIs(self.store.intern(b'foobar'), blob)
+
+    def testRelease(self):
+        blob = self.store.intern(b'foobar')
+        self.assertEqual(len(self.store), 1)
+
+        # ensure the blob goes once nothing holds it
+        del blob
+        gc.collect()
+        self.assertEqual(len(self.store), 0)
+        self.assertEqual(self.store.info().size, 0)
+
+
+class BlobStoreBudgetTests(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        # room for two of the blobs below
+        self.store = BlobStore(budget=2000)
+        self.blobs = [self.store.intern(bytes([i]) * 1000) for i in range(3)]
+
+    def testColdCompressed(self):
+        # ensure the oldest blob was compressed to fit the budget
+        self.assertIsNone(self.blobs[0]._data)
+        self.assertIsNotNone(self.blobs[1]._data)
+        self.assertIsNotNone(self.blobs[2]._data)
+        self.assertLess(self.blobs[0].stored, 1000)
+        self.assertEqual(self.store.compression_info().packed, 1)
+        self.assertGreater(self.store.compression_info().ratio, 1)
+
+    def testLoad(self):
+        # ensure reading a cold blob decompresses it and makes the next coldest one go
+        self.assertEqual(self.blobs[0].data, bytes([0]) * 1000)
+        self.assertIsNotNone(self.blobs[0]._data)
+        self.assertIsNone(self.blobs[1]._data)
+        self.assertEqual(self.store.compression_info().unpacks, 1)
+
+    def testInternCold(self):
+        # ensure equal data still shares a blob once it was compressed
+        self.assertIs(self.store.intern(bytes([0]) * 1000), self.blobs[0])
+
+    def testLoadRefreshes(self):
+        # read the oldest hot blob, then add another
+        self.blobs[1].data
+        self.blobs.append(self.store.intern(b'x' * 1000))
+
+        # ensure the unread one went cold instead
+        self.assertIsNotNone(self.blobs[1]._data)
+        self.assertIsNone(self.blobs[2]._data)
+
+    def testIncompressible(self):
+        store = BlobStore(budget=0, compression='lzma')
+        blob = store.intern(bytes(range(10)))
+
+        # ensure data that doesn't compress is left alone
+        self.assertEqual(blob._data, bytes(range(10)))
+        self.assertEqual(store.compression_info().packed, 0)
+
+
+class BlobStoreSpillTests(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        # room for two of the blobs below, the rest spilled
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = BlobStore(budget=2000, spill_dir=self.tmp.name)
+        self.blobs = [self.store.intern(bytes([i]) * 1000) for i in range(6)]
+
+    def tearDown(self):
+        self.blobs = self.store = None
+        gc.collect()
+        self.tmp.cleanup()
+
+        super().tearDown()
+
+    def testColdSpilled(self):
+        # ensure the oldest blobs went to the segment file, in order, without being compressed
+        self.assertListEqual([b.on_disk for b in self.blobs], [True, True, True, True, False, False])
+        self.assertListEqual([b.spilled for b in self.blobs[:4]], [0, 1000, 2000, 3000])
+        self.assertEqual(self.store.compression_info().packed, 0)
+        info = self.store.spill_info()
+        self.assertEqual(info.evictions, 4)
+        self.assertEqual(info.segment_size, 4000)
+
+    def testLoad(self):
+        # ensure reading a spilled blob pages it in, and going cold again doesn't write it twice
+        self.assertEqual(self.blobs[1].data, bytes([1]) * 1000)
+        self.assertFalse(self.blobs[1].on_disk)
+        self.assertTrue(self.blobs[4].on_disk)
+        self.blobs.append(self.store.intern(b'x' * 1000))
+        self.blobs.append(self.store.intern(b'y' * 1000))
+        self.assertTrue(self.blobs[1].on_disk)
+        self.assertEqual(self.blobs[1].spilled, 1000)
+        info = self.store.spill_info()
+        self.assertEqual((info.hits, info.misses), (0, 1))
+        self.assertEqual(info.segment_size, 6000)
+
+        # ensure reading a hot blob is a hit
+        self.assertEqual(self.blobs[-1].data, b'y' * 1000)
+        self.assertEqual(self.store.spill_info().hit_rate, 0.5)
+
+    def testInternSpilled(self):
+        # ensure equal data still shares a blob once it was spilled
+        self.assertIs(self.store.intern(bytes([0]) * 1000), self.blobs[0])
+
+    def testReadAhead(self):
+        # ensure the blobs after one that fit in the budget are paged in with it, in one read as they're side by side
+        self.assertEqual(self.store.read_ahead(self.blobs, 1), bytes([1]) * 1000)
+        self.assertListEqual([b.on_disk for b in self.blobs], [True, False, False, True, True, True])
+        info = self.store.spill_info()
+        self.assertEqual((info.misses, info.read_ahead), (1, 1))
+        self.assertEqual(self.store.page_reads, 1)
+
+        # ensure with room for more, more are read ahead
+        self.store._budget = 10000
+        self.assertEqual(self.store.read_ahead(self.blobs, 0), bytes([0]) * 1000)
+        self.assertFalse(any(b.on_disk for b in self.blobs))
+        self.assertEqual(self.store.page_reads, 3)
+
+    def testCompact(self):
+        self.store.COMPACT_SIZE = 0
+
+        # free some spilled blobs, then spill another
+        del self.blobs[0:3]
+        gc.collect()
+        self.blobs.append(self.store.intern(b'x' * 1000))
+
+        # ensure the segment file was rewritten with only the live blobs
+        self.assertEqual(self.blobs[0].spilled, 0)
+        self.assertEqual(self.blobs[1].spilled, 1000)
+        self.assertEqual(self.store.spill_info().segment_size, 2000)
+        self.assertEqual(self.blobs[0].data, bytes([3]) * 1000)
+        self.assertListEqual(os.listdir(self.tmp.name), [])
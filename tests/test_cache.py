@@ -0,0 +1,84 @@
+import unittest
+
+from lib.cache import CacheInfo, PathCache
+from lib.directory import Directory
+from lib.file import File
+
+
+class PathCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        self.cache = PathCache(2)
+        self.parent = Directory()
+        # entries only hold nodes weakly, so keep them alive here
+        self.foo, self.bar, self.baz = File(), File(), File()
+
+    def testMiss(self):
+        self.assertIsNone(self.cache.get('/foo', 0))
+        self.assertEqual(self.cache.info(), CacheInfo(0, 1, 2, 0))
+
+    def testHit(self):
+        node = File()
+        self.cache.put('/foo', self.parent, 'foo', node, 0)
+
+        # ensure hit returns the resolved tuple
+        self.assertEqual(self.cache.get('/foo', 0), (self.parent, 'foo', node))
+        self.assertEqual(self.cache.info(), CacheInfo(1, 0, 2, 1))
+
+    def testStaleGeneration(self):
+        self.cache.put('/foo', self.parent, 'foo', self.foo, 0)
+
+        # bump the parent generation
+        self.parent.generation += 1
+
+        # ensure stale entry is dropped
+        self.assertIsNone(self.cache.get('/foo', 0))
+        self.assertEqual(self.cache.info().currsize, 0)
+
+    def testStaleEpoch(self):
+        self.cache.put('/foo', self.parent, 'foo', self.foo, 0)
+
+        # ensure stale entry is dropped
+        self.assertIsNone(self.cache.get('/foo', 1))
+        self.assertEqual(self.cache.info().currsize, 0)
+
+    def testMutable(self):
+        node = File()
+        self.cache.put('/foo', self.parent, 'foo', node, 0)
+
+        # ensure a read-only entry doesn't satisfy a mutable lookup
+        self.assertIsNone(self.cache.get('/foo', 0, mutable=True))
+        self.cache.put('/foo', self.parent, 'foo', node, 0, mutable=True)
+        self.assertEqual(self.cache.get('/foo', 0, mutable=True), (self.parent, 'foo', node))
+        self.assertEqual(self.cache.get('/foo', 0), (self.parent, 'foo', node))
+
+    def testEvictLeastRecentlyUsed(self):
+        self.cache.put('/foo', self.parent, 'foo', self.foo, 0)
+        self.cache.put('/bar', self.parent, 'bar', self.bar, 0)
+
+        # use foo so bar is the oldest
+        self.cache.get('/foo', 0)
+        self.cache.put('/baz', self.parent, 'baz', self.baz, 0)
+
+        # ensure bar was evicted
+        self.assertIsNone(self.cache.get('/bar', 0))
+        self.assertIsNotNone(self.cache.get('/foo', 0))
+        self.assertIsNotNone(self.cache.get('/baz', 0))
+
+    def testReleased(self):
+        node = File()
+        self.cache.put('/foo', self.parent, 'foo', node, 0)
+
+        # ensure an entry doesn't keep its node alive, and goes once the node has
+        del node
+        self.assertIsNone(self.cache.get('/foo', 0))
+        self.assertEqual(self.cache.info().currsize, 0)
+
+    def testClear(self):
+        self.cache.put('/foo', self.parent, 'foo', self.foo, 0)
+        self.cache.clear()
+
+        # ensure empty
+        self.assertEqual(self.cache.info().currsize, 0)
@@ -0,0 +1,238 @@
+import os
+import tempfile
+import unittest
+
+from lib.checkpoint import Checkpoint, LazyDirectory, MappedBlob
+from lib.directory import Directory
+from lib.exceptions import NotFoundError
+from lib.filesystem import Filesystem
+
+
+class CheckpointTests(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'checkpoint')
+        self.fs = Filesystem(chunk_size=4)
+        self.fs.mkdir('/school/homework/math', True)
+        self.fs.mkdir('/school/homework/history', True)
+        self.fs.touch('/school/homework/math/notes')
+        self.fs.write('/school/homework/math/notes', 'Lorem ipsum')
+        self.fs.append('/school/homework/math/notes', ' dolor')
+        self.fs.touch('/school/empty')
+        self.fs.cp('/school/homework/math', '/school/math')
+        self.fs.cd('/school/homework')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+        super().tearDown()
+
+    def testRoundTrip(self):
+        self.fs.save_checkpoint(self.path)
+        fs = Filesystem.load_checkpoint(self.path, chunk_size=4)
+
+        # ensure the tree, contents, totals and cwd come back
+        self.assertEqual(fs.pwd(), '/school/homework')
+        self.assertListEqual(fs.ls(), ['math', 'history'])
+        self.assertListEqual(fs.ls('/school'), ['homework', 'empty', 'math'])
+        self.assertEqual(fs.read('math/notes'), b'Lorem ipsum dolor')
+        self.assertEqual(fs.read('/school/math/notes'), b'Lorem ipsum dolor')
+        self.assertEqual(fs.read('/school/empty'), b'')
+        self.assertEqual(fs.du('/'), self.fs.du('/'))
+        self.assertListEqual(fs.find('notes', recursive=True), self.fs.find('notes', recursive=True))
+
+    def testLazy(self):
+        self.fs.save_checkpoint(self.path)
+        fs = Filesystem.load_checkpoint(self.path)
+
+        # ensure nothing past the cwd is read in until it's used, totals aside
+        school = fs._root.children['school']
+        self.assertIs(type(school), Directory)
+        self.assertIsInstance(school.children['math'], LazyDirectory)
+        self.assertEqual(fs.du('/school/math'), (1, 1, 17))
+        math = school.children['math']
+        self.assertIsInstance(math, LazyDirectory)
+        self.assertListEqual(fs.ls('/school/math'), ['notes'])
+        self.assertIs(type(math), Directory)
+
+        # ensure chunks are read the first time they're needed, and shared between the files holding them
+        notes = fs._resolve('/school/homework/math/notes')[2]
+        copy = fs._resolve('/school/math/notes')[2]
+        self.assertIsInstance(notes.chunks[0], MappedBlob)
+        self.assertIsNone(notes.chunks[0]._data)
+        self.assertIs(notes.chunks[0], copy.chunks[0])
+        self.assertEqual(fs.read('/school/math/notes', 0, 5), b'Lorem')
+        self.assertIsNotNone(notes.chunks[0]._data)
+
+    def testStore(self):
+        self.fs.save_checkpoint(self.path)
+        fs = Filesystem.load_checkpoint(self.path, chunk_size=4)
+
+        # ensure chunks are counted in the store before they're read, each one in the checkpoint once
+        chunks = len(Checkpoint(self.path)._spans) // 3
+        self.assertEqual(fs.stats(), (3, 34, 0, chunks, 1.0))
+        notes = fs._resolve('/school/math/notes')[2]
+
+        # ensure they're shared with equal chunks written later
+        fs.touch('/school/lore')
+        fs.write('/school/lore', 'Lore')
+        self.assertIs(fs._resolve('/school/lore')[2].chunks[0], notes.chunks[0])
+        self.assertEqual(fs.stats().blobs, chunks)
+        self.assertEqual(fs._blobs.info().hits, 1)
+
+    def testBudget(self):
+        self.fs.save_checkpoint(self.path)
+        fs = Filesystem.load_checkpoint(self.path, chunk_size=4, memory_budget=8)
+
+        # ensure read chunks are dropped once cold rather than compressed, as they can be read from the map again
+        self.assertEqual(fs.read('/school/math/notes'), b'Lorem ipsum dolor')
+        notes = fs._resolve('/school/math/notes')[2]
+        self.assertLessEqual(sum(chunk._data is not None for chunk in notes.chunks), 2)
+        self.assertEqual(fs.compression_info().packed, 0)
+        self.assertLessEqual(fs.stats().stored, 8)
+        self.assertEqual(fs.read('/school/math/notes'), b'Lorem ipsum dolor')
+
+    def testChanges(self):
+        self.fs.save_checkpoint(self.path)
+        fs = Filesystem.load_checkpoint(self.path)
+
+        # ensure a loaded tree changes like any other, leaving the checkpoint as it was
+        fs.write('math/notes', 'x', 5)
+        fs.append('math/notes', '!')
+        fs.rm('/school/math', True)
+        fs.mv('history', '/history')
+        fs.mkdir('/school/new')
+        self.assertEqual(fs.read('math/notes'), b'Loremxipsum dolor!')
+        self.assertListEqual(fs.ls('/school'), ['homework', 'empty', 'new'])
+        self.assertEqual(fs.du('/'), (6, 2, 18))
+        again = Filesystem.load_checkpoint(self.path)
+        self.assertEqual(again.read('/school/math/notes'), b'Lorem ipsum dolor')
+        self.assertEqual(again.du('/'), self.fs.du('/'))
+
+        # ensure a loaded tree can be saved again, chunks not yet read included
+        fs.save_checkpoint(self.path)
+        again = Filesystem.load_checkpoint(self.path)
+        self.assertEqual(again.read('/school/homework/math/notes'), b'Loremxipsum dolor!')
+        self.assertListEqual(again.ls('/'), ['school', 'history'])
+        self.assertEqual(again.du('/'), fs.du('/'))
+
+    def testIndexes(self):
+        self.fs.save_checkpoint(self.path)
+        fs = Filesystem.load_checkpoint(self.path, path_index=True, trigram_index=True)
+
+        # ensure indexes see the whole tree
+        self.assertListEqual(fs.find('notes', recursive=True), self.fs.find('notes', recursive=True))
+        self.assertListEqual(fs.find('hist', fuzzy=True, recursive=True), ['/school/homework/history'])
+        self.assertListEqual(fs.ls('/school/math'), ['notes'])
+
+    def testNames(self):
+        self.fs.save_checkpoint(self.path)
+        saved = Checkpoint(self.path)
+
+        # ensure every name is kept once however many nodes use it: school, homework, empty, math, history, notes
+        self.assertEqual(len(saved._name_offsets) - 1, 6)
+
+    def testNotCheckpoint(self):
+        with open(self.path, 'wb') as f:
+            f.write(bytes(64))
+
+        self.assertRaises(ValueError, Filesystem.load_checkpoint, self.path)
+        self.assertRaises(FileNotFoundError, Filesystem.load_checkpoint, os.path.join(self.tmp.name, 'nope'))
+
+
+class CheckpointWalTests(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.wal = os.path.join(self.tmp.name, 'wal')
+        self.path = os.path.join(self.tmp.name, 'checkpoint')
+        self.fs = Filesystem(wal=self.wal)
+        self.fs.mkdir('/a/b', True)
+        self.fs.touch('/a/f')
+        self.fs.write('/a/f', 'Lorem')
+        self.fs.cd('/a')
+
+    def tearDown(self):
+        self.fs.close()
+        self.tmp.cleanup()
+
+        super().tearDown()
+
+    def recover(self) -> Filesystem:
+        # as if the process stopped after its last sync
+        self.fs.sync()
+        return Filesystem.recover(self.wal, self.path)
+
+    def testRecover(self):
+        self.fs.save_checkpoint(self.path)
+        self.fs.append('f', ' ipsum')
+        self.fs.mkdir('c')
+
+        # ensure the log starts over from the checkpoint, and the two together get everything back
+        with open(self.wal, 'rb') as f:
+            self.assertNotIn(b'Lorem', f.read())
+        fs = self.recover()
+        self.assertEqual(fs.pwd(), '/a')
+        self.assertListEqual(fs.ls(), ['b', 'f', 'c'])
+        self.assertEqual(fs.read('f'), b'Lorem ipsum')
+        self.assertEqual(fs.du('/'), self.fs.du('/'))
+
+        # ensure it carries on logging to the same log
+        fs.rm('b')
+        fs.close()
+        fs = Filesystem.recover(self.wal, self.path)
+        self.assertListEqual(fs.ls(), ['f', 'c'])
+        fs.close()
+
+    def testRecoverStore(self):
+        self.fs.touch('g')
+        self.fs.write('g', 'Lorem')
+        self.fs.save_checkpoint(self.path)
+        self.fs.touch('h')
+        self.fs.write('h', 'Lorem')
+
+        # ensure chunks from the checkpoint are shared with equal ones replayed from the log
+        fs = self.recover()
+        self.addCleanup(fs.close)
+        self.assertIs(fs._resolve('/a/h')[2].chunks[0], fs._resolve('/a/f')[2].chunks[0])
+        stats = fs.stats()
+        self.assertEqual((stats.files, stats.size, stats.blobs), (3, 15, 1))
+        self.assertEqual(fs._blobs.info().hits, 1)
+
+    def testRecoverBeforeReset(self):
+        # as if the process stopped after saving the checkpoint but before the log started over
+        self.fs.sync()
+        with open(self.wal, 'rb') as f:
+            log = f.read()
+        self.fs.save_checkpoint(self.path)
+        self.fs.mkdir('/lost')
+        self.fs.close()
+        with open(self.wal, 'wb') as f:
+            f.write(log)
+
+        # ensure the changes the checkpoint already has aren't replayed again
+        fs = Filesystem.recover(self.wal, self.path)
+        self.assertEqual(fs.read('/a/f'), b'Lorem')
+        self.assertEqual(fs.du('/'), (3, 1, 5))
+        self.assertRaises(NotFoundError, fs.ls, '/lost')
+        fs.close()
+
+    def testRecoverWrongLog(self):
+        self.fs.save_checkpoint(self.path)
+        other = os.path.join(self.tmp.name, 'other')
+        Filesystem(wal=other).close()
+
+        # ensure a checkpoint isn't matched with some other log
+        self.assertRaises(ValueError, Filesystem.recover, other, self.path)
+
+    def testRecoverNoCheckpoint(self):
+        # ensure a checkpoint that was never saved means replaying the whole log
+        fs = self.recover()
+        self.assertEqual(fs.read('/a/f'), b'Lorem')
+        self.assertEqual(fs.pwd(), '/a')
+        fs.close()
@@ -2,6 +2,7 @@
 import unittest
 
 from lib.directory import Directory
+from lib.file import File
 from lib.node import Node
 
 
@@ -14,6 +15,51 @@ class DirectoryTests(unittest.TestCase):
 
     def testType(self):
         self.assertEqual(self.d.type, Node.TYPE_DIRECTORY)
+        self.assertTrue(self.d.is_dir)
+
+    def testSlots(self):
+        self.assertFalse(hasattr(self.d, '__dict__'))
 
     def testChildren(self):
         self.assertDictEqual(self.d.children, {})
+
+    def testGeneration(self):
+        self.assertEqual(self.d.generation, 0)
+
+    def testTotals(self):
+        self.assertEqual((self.d.dirs, self.d.files, self.d.size), (0, 0, 0))
+
+        # ensure a clone starts with the same totals
+        self.d.dirs, self.d.files, self.d.size = 1, 2, 3
+        c = self.d.clone()
+        self.assertEqual((c.dirs, c.files, c.size), (1, 2, 3))
+
+    def testClone(self):
+        self.d.children['foo'] = File()
+        c = self.d.clone()
+
+        # ensure the clone shares children until either side unshares
+        self.assertIs(c.children, self.d.children)
+        self.assertFalse(self.d.owns('foo'))
+        self.assertFalse(c.owns('foo'))
+
+        c.unshare()
+        self.assertIsNot(c.children, self.d.children)
+        self.assertDictEqual(c.children, self.d.children)
+        self.assertFalse(c.owns('foo'))
+
+    def testSorted(self):
+        self.d.children['foo'] = File()
+        self.d.children['bar'] = File()
+
+        # ensure the order is only kept once asked for
+        self.assertIsNone(self.d.order)
+        self.assertListEqual(list(self.d.sorted()), ['bar', 'foo'])
+        self.assertIs(self.d.sorted(), self.d.order)
+
+        # ensure a clone sorts its own names
+        self.assertIsNone(self.d.clone().order)
+
+    def testOwns(self):
+        self.d.children['foo'] = File()
+        self.assertTrue(self.d.owns('foo'))
@@ -1,6 +1,8 @@
 
+import random
 import unittest
 
+from lib.blob import BlobStore
 from lib.file import File
 from lib.node import Node
 
@@ -14,6 +16,215 @@ class FileTests(unittest.TestCase):
 
     def testType(self):
         self.assertEqual(self.f.type, Node.TYPE_FILE)
+        self.assertFalse(self.f.is_dir)
+
+    def testSlots(self):
+        self.assertFalse(hasattr(self.f, '__dict__'))
 
     def testContents(self):
-        self.assertEqual(self.f.contents, '')
+        self.assertEqual(self.f.contents, b'')
+
+    def testClone(self):
+        self.f.write(b'foobar')
+        c = self.f.clone()
+
+        # ensure the clone is a separate file with the same contents
+        self.assertIsNot(c, self.f)
+        self.assertEqual(c.contents, b'foobar')
+
+        # ensure writing either side doesn't change the other
+        c.append(b'baz')
+        self.f.write(b'F', 0)
+        self.assertEqual(c.contents, b'foobarbaz')
+        self.assertEqual(self.f.contents, b'Foobar')
+
+    def testWriteOffset(self):
+        self.f.write(b'foobar')
+
+        # overwrite in the middle, then past the end
+        self.f.write(b'OO', 1)
+        self.assertEqual(self.f.contents, b'fOObar')
+        self.f.write(b'BAZ', 4)
+        self.assertEqual(self.f.contents, b'fOObBAZ')
+
+        # ensure a gap is filled with zeros
+        self.f.write(b'!', 9)
+        self.assertEqual(self.f.contents, b'fOObBAZ\x00\x00!')
+        self.assertEqual(self.f.size, 10)
+
+    def testRead(self):
+        self.f.write(b'foobar')
+
+        # ensure ranges
+        self.assertEqual(self.f.read(), b'foobar')
+        self.assertEqual(self.f.read(3), b'bar')
+        self.assertEqual(self.f.read(1, 2), b'oo')
+        self.assertEqual(self.f.read(10), b'')
+
+        # ensure views are read only
+        self.assertTrue(self.f.read().readonly)
+
+    def testAppendWhileViewed(self):
+        self.f.write(b'foo')
+        view = self.f.read()
+
+        # ensure appending still works while a view holds the contents
+        self.f.append(b'bar')
+        self.f.write(b'baz', 6)
+        self.assertEqual(self.f.contents, b'foobarbaz')
+        self.assertEqual(view, b'foo')
+
+
+class ChunkedFileTests(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        self.f = File(4)
+
+    def testChunks(self):
+        self.f.write(b'0123456789')
+
+        # ensure a write is sealed into chunks
+        self.assertListEqual([c.data for c in self.f.chunks], [b'0123', b'4567', b'89'])
+        self.assertListEqual(self.f.ends, [4, 8, 10])
+        self.assertEqual(self.f.tail, b'')
+        self.assertEqual(self.f.size, 10)
+
+        # ensure appends carry on from the short chunk in the tail
+        self.f.append(b'ab')
+        self.f.append(b'c')
+        self.assertListEqual([c.data for c in self.f.chunks], [b'0123', b'4567', b'89ab'])
+        self.assertEqual(self.f.tail, b'c')
+        self.assertEqual(self.f.contents, b'0123456789abc')
+
+    def testWriteTouchesOnlyCoveredChunks(self):
+        self.f.write(b'0123456789ab')
+        first, last = self.f.chunks[0], self.f.chunks[2]
+
+        # overwrite across the middle
+        self.f.write(b'XYZ', 3)
+
+        # ensure the chunks either side are the same objects
+        self.assertEqual(self.f.contents, b'012XYZ6789ab')
+        self.assertIs(self.f.chunks[2], last)
+        self.assertIsNot(self.f.chunks[0], first)
+
+    def testCloneSharesChunks(self):
+        self.f.write(b'01234567')
+        self.f.append(b'89')
+        c = self.f.clone()
+
+        # ensure the tail is sealed and every chunk is shared
+        self.assertEqual(self.f.tail, b'')
+        self.assertListEqual(c.chunks, self.f.chunks)
+        c.append(b'ab')
+        c.write(b'X', 0)
+        self.assertEqual(self.f.contents, b'0123456789')
+        self.assertEqual(c.contents, b'X123456789ab')
+
+    def testInsert(self):
+        self.f.write(b'0123456789')
+
+        # insert into a sealed chunk, into the tail and at the end
+        self.f.insert(b'abcdef', 2)
+        self.f.insert(b'!', 15)
+        self.f.insert(b'?', 17)
+
+        # ensure contents and ends are right
+        self.assertEqual(self.f.contents, b'01abcdef2345678!9?')
+        self.assertEqual(self.f.ends[-1] + len(self.f.tail), 18)
+        self.assertEqual(self.f.read(4, 6), b'cdef23')
+
+    def testInsertKeepsChunksFew(self):
+        self.f = File(16)
+        self.f.write(bytes(160))
+        expected = bytearray(160)
+        rand = random.Random(0)
+
+        # insert a byte at a time all over the file
+        for _ in range(500):
+            offset = rand.randrange(self.f.size)
+            self.f.insert(b'x', offset)
+            expected[offset:offset] = b'x'
+
+        # ensure short chunks were merged as they came, so no two side by side would fit in one
+        self.assertEqual(self.f.contents, expected)
+        sizes = [chunk.size for chunk in self.f.chunks]
+        self.assertLessEqual(len(sizes), 2 * len(expected) // 16 + 1)
+        self.assertTrue(all(a + b > 16 for a, b in zip(sizes, sizes[1:])))
+
+    def testIRead(self):
+        self.f.write(b'0123456789')
+
+        # ensure ranges stream chunk by chunk
+        self.assertListEqual([bytes(v) for v in self.f.iread()], [b'0123', b'4567', b'89'])
+        self.assertListEqual([bytes(v) for v in self.f.iread(2, 4)], [b'23', b'45'])
+        self.assertListEqual(list(self.f.iread(20)), [])
+
+    def testNegativeRange(self):
+        self.f.write(b'0123456789')
+
+        # ensure negative offsets and sizes are refused before anything changes
+        self.assertRaises(ValueError, self.f.read, -1)
+        self.assertRaises(ValueError, self.f.read, 0, -1)
+        self.assertRaises(ValueError, self.f.iread, -1)
+        self.assertRaises(ValueError, self.f.write, b'x', -1)
+        self.assertRaises(ValueError, self.f.insert, b'x', -1)
+        self.assertEqual(self.f.contents, b'0123456789')
+
+    def testReadOneChunkIsView(self):
+        self.f.write(b'0123456789')
+
+        # ensure a range inside one chunk is a view of it
+        self.assertIs(self.f.read(4, 2).obj, self.f.chunks[1].data)
+
+    def testMatchesBytearray(self):
+        rand = random.Random(0)
+        expected = bytearray()
+        for _ in range(500):
+            data = bytes(rand.randrange(256) for _ in range(rand.randrange(12)))
+            offset = rand.randrange(len(expected) + 3)
+            op = rand.randrange(4)
+            if op == 0:
+                self.f.append(data)
+                expected += data
+            elif op == 1:
+                self.f.write(data, offset)
+                if offset > len(expected):
+                    expected += bytes(offset - len(expected))
+                expected[offset:offset + len(data)] = data
+            elif op == 2:
+                self.f.insert(data, offset)
+                if offset > len(expected):
+                    expected += bytes(offset - len(expected))
+                expected[offset:offset] = data
+            else:
+                size = rand.randrange(12)
+                self.assertEqual(self.f.read(offset, size), expected[offset:offset + size])
+
+        # ensure the whole file matches
+        self.assertEqual(self.f.contents, expected)
+        self.assertEqual(self.f.size, len(expected))
+        self.assertTrue(all(len(chunk.data) <= 4 for chunk in self.f.chunks))
+
+    def testStore(self):
+        store = BlobStore()
+        self.f = File(4, store)
+        other = File(4, store)
+
+        # write the same contents to both
+        self.f.write(b'01234567ab')
+        other.write(b'01234567ab')
+
+        # ensure every chunk is shared
+        for a, b in zip(self.f.chunks, other.chunks):
+            self.assertIs(a, b)
+        self.assertEqual(len(store), 3)
+
+        # ensure a change to one only rebuilds its own chunk
+        other.write(b'X', 0)
+        self.assertIsNot(other.chunks[0], self.f.chunks[0])
+        self.assertIs(other.chunks[1], self.f.chunks[1])
+        self.assertEqual(self.f.contents, b'01234567ab')
+
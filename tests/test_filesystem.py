@@ -1,5 +1,11 @@
+import gc
+import os
+import sys
+import tempfile
+import threading
 import unittest
 
+from lib.cache import CacheInfo
 from lib.exceptions import (
     DirectoryAlreadyExistsError,
     DirectoryNotEmptyError,
@@ -7,10 +13,14 @@ from lib.exceptions import (
     NotDirectoryError,
     NotFileError,
     NotFoundError,
-    RootError
+    NotLoggableError,
+    ReadOnlyError,
+    RootError,
+    SubdirectoryError
 )
 from lib.filesystem import Filesystem
 from lib.node import Node
+from lib.wal import token
 
 
 class FilesystemTest(unittest.TestCase):
@@ -18,7 +28,10 @@ class FilesystemTest(unittest.TestCase):
     def setUp(self):
         super().setUp()
 
-        self.fs = Filesystem()
+        self.fs = self.filesystem()
+
+    def filesystem(self, **options) -> Filesystem:
+        return Filesystem(**options)
 
     def testPushDirectory(self):
         dirname = 'somedir'
@@ -234,6 +247,43 @@ class FilesystemTest(unittest.TestCase):
         # ensure still dir PWD
         self.assertEqual(self.fs.pwd(), '/{}'.format(dirname))
 
+    def testChangeDirectoryParentParts(self):
+        firstdir = 'first'
+        seconddir = 'second'
+
+        # create dirs
+        self.fs.mkdir('/{}/{}'.format(firstdir, seconddir), True)
+        self.fs.cd('/{}'.format(firstdir))
+
+        # change via parent parts and duplicate slashes
+        self.fs.cd('..//{}/./{}/'.format(firstdir, seconddir))
+
+        # ensure subdir PWD
+        self.assertEqual(self.fs.pwd(), '/{}/{}'.format(firstdir, seconddir))
+
+        # change above root
+        self.fs.cd('../../..')
+
+        # ensure root PWD
+        self.assertEqual(self.fs.pwd(), '/')
+
+    def testChangeDirectoryDeepNotFound(self):
+        firstdir = 'first'
+        seconddir = 'second'
+        filename = 'somefile'
+
+        # create dirs and a file in the first
+        self.fs.mkdir('/{}/{}'.format(firstdir, seconddir), True)
+        self.fs.touch('/{}/{}'.format(firstdir, filename))
+        self.fs.cd(firstdir)
+
+        # change two deep (doesn't exist), ensure exception
+        self.assertRaises(NotFoundError, self.fs.cd, '{}/{}'.format(seconddir, 'nope'))
+
+        # ensure pwd and cwd are both still first
+        self.assertEqual(self.fs.pwd(), '/{}'.format(firstdir))
+        self.assertListEqual(self.fs.ls(), [seconddir, filename])
+
     def testPrintWorkingDir(self):
         dirname = 'somedir'
 
@@ -325,6 +375,85 @@ class FilesystemTest(unittest.TestCase):
         # ensure file in absolute ls
         self.assertIn(filename, self.fs.ls('/{}/{}'.format(dirname, dirname)))
 
+    def testListSorted(self):
+        # create children out of order
+        for name in ['c', 'a', 'b']:
+            self.fs.touch(name)
+        self.fs.mkdir('ab')
+
+        # ensure ls keeps insertion order, and sorts when asked
+        self.assertListEqual(self.fs.ls(), ['c', 'a', 'b', 'ab'])
+        self.assertListEqual(self.fs.ls(sort=True), ['a', 'ab', 'b', 'c'])
+        self.assertListEqual(self.fs.ls(long=True, sort=True)[:2], [(Node.TYPE_FILE, 'a'), (Node.TYPE_DIRECTORY, 'ab')])
+
+        # ensure the order keeps up with changes
+        self.fs.rm('b')
+        self.fs.mv('c', 'aa')
+        self.fs.cp('ab', '0')
+        self.assertListEqual(self.fs.ls(sort=True), ['0', 'a', 'aa', 'ab'])
+
+    def testListPaged(self):
+        names = ['file{:03}'.format(i) for i in range(250)]
+        self.fs.mkdir('/spool')
+        for name in reversed(names):
+            self.fs.touch('/spool/{}'.format(name))
+
+        # ensure pages follow on from each other in order
+        pages = []
+        start_after = None
+        while True:
+            page = self.fs.ls('/spool', sort=True, start_after=start_after, limit=100)
+            if not page:
+                break
+            pages.append(page)
+            start_after = page[-1]
+        self.assertListEqual([len(page) for page in pages], [100, 100, 50])
+        self.assertListEqual(sum(pages, []), names)
+
+        # ensure a prefix only lists matching names, and can be paged too
+        self.assertListEqual(self.fs.ls('/spool', prefix='file10'), names[100:110])
+        self.assertListEqual(self.fs.ls('/spool', prefix='file1', start_after='file195', limit=3), names[196:199])
+        self.assertListEqual(self.fs.ls('/spool', prefix='nope'), [])
+
+        # ensure a limit without an order takes the first in insertion order
+        self.assertListEqual(self.fs.ls('/spool', limit=2), ['file249', 'file248'])
+
+    def testListParentParts(self):
+        firstdir = 'first'
+        seconddir = 'second'
+        filename = 'somefile'
+
+        # create dirs and a file
+        self.fs.mkdir('/{}/{}'.format(firstdir, seconddir), True)
+        self.fs.touch('/{}/{}'.format(firstdir, filename))
+        self.fs.cd('/{}/{}'.format(firstdir, seconddir))
+
+        # ensure parent listed without changing dir
+        self.assertListEqual(self.fs.ls('..'), [seconddir, filename])
+        self.assertListEqual(self.fs.ls('../{}/..//'.format(seconddir)), [seconddir, filename])
+        self.assertEqual(self.fs.pwd(), '/{}/{}'.format(firstdir, seconddir))
+
+        # ensure file read through parent parts
+        self.assertEqual(self.fs.read('../{}'.format(filename)), b'')
+
+    def testExists(self):
+        dirname = 'somedir'
+        filename = 'somefile'
+
+        # create dir & file
+        self.fs.mkdir(dirname)
+        self.fs.touch('/{}/{}'.format(dirname, filename))
+
+        # ensure both exist
+        self.assertTrue(self.fs.exists(dirname))
+        self.assertTrue(self.fs.exists('/{}/{}'.format(dirname, filename)))
+        self.assertTrue(self.fs.exists('/'))
+
+        # ensure missing paths, and paths through files, do not exist
+        self.assertFalse(self.fs.exists('/nope'))
+        self.assertFalse(self.fs.exists('/nope/{}'.format(filename)))
+        self.assertFalse(self.fs.exists('/{}/{}/nope'.format(dirname, filename)))
+
     def testMakeDir(self):
         dirname = 'somedir'
 
@@ -656,7 +785,7 @@ class FilesystemTest(unittest.TestCase):
 
     def testCreateFileAlreadyExists(self):
         filename = 'lipsum.txt'
-        contents = 'Lorem ipsum dolor sit amet'
+        contents = b'Lorem ipsum dolor sit amet'
 
         # create file
         self.fs.touch(filename)
@@ -676,6 +805,361 @@ class FilesystemTest(unittest.TestCase):
         # ensure file contents
         self.assertEqual(self.fs.read(filename), contents)
 
+    def testWriteText(self):
+        filename = 'foobar'
+
+        # write text to a file
+        self.fs.touch(filename)
+        self.fs.write(filename, 'héllo')
+
+        # ensure it's stored as utf-8
+        self.assertEqual(self.fs.read(filename), 'héllo'.encode())
+
+    def testWriteOffset(self):
+        filename = 'foobar'
+
+        # create file
+        self.fs.touch(filename)
+        self.fs.write(filename, b'Lorem ipsum')
+
+        # overwrite part of it and extend it
+        self.fs.write(filename, b'IPSUM dolor', 6)
+
+        # ensure file contents
+        self.assertEqual(self.fs.read(filename), b'Lorem IPSUM dolor')
+
+    def testAppend(self):
+        filename = 'foobar'
+
+        # create file and append to it
+        self.fs.touch(filename)
+        for line in [b'one\n', b'two\n', 'three\n']:
+            self.fs.append(filename, line)
+
+        # ensure file contents
+        self.assertEqual(self.fs.read(filename), b'one\ntwo\nthree\n')
+
+    def testAppendNotFound(self):
+        self.assertRaises(NotFoundError, self.fs.append, 'foobar', b'data')
+
+    def testAppendNotFile(self):
+        dirname = 'foobar'
+
+        # create dir
+        self.fs.mkdir(dirname)
+
+        # ensure exception raised
+        self.assertRaises(NotFileError, self.fs.append, dirname, b'data')
+
+    def testReadRange(self):
+        filename = 'foobar'
+
+        # create file
+        self.fs.touch(filename)
+        self.fs.write(filename, b'Lorem ipsum dolor')
+
+        # ensure ranges
+        self.assertEqual(self.fs.read(filename, 6), b'ipsum dolor')
+        self.assertEqual(self.fs.read(filename, 6, 5), b'ipsum')
+        self.assertEqual(self.fs.read(filename, size=5), b'Lorem')
+
+    def testReadView(self):
+        filename = 'foobar'
+
+        # create file
+        self.fs.touch(filename)
+        self.fs.write(filename, b'Lorem ipsum dolor')
+
+        # ensure a view of the range
+        view = self.fs.read(filename, 6, 5, view=True)
+        self.assertIsInstance(view, memoryview)
+        self.assertEqual(view, b'ipsum')
+
+        # ensure the file can still be appended to
+        self.fs.append(filename, b' sit amet')
+        self.assertEqual(self.fs.read(filename), b'Lorem ipsum dolor sit amet')
+
+    def testInsert(self):
+        filename = 'foobar'
+
+        # create file
+        self.fs.touch(filename)
+        self.fs.write(filename, b'Lorem dolor')
+
+        # insert into the middle
+        self.fs.insert(filename, 'ipsum ', 6)
+
+        # ensure file contents
+        self.assertEqual(self.fs.read(filename), b'Lorem ipsum dolor')
+
+    def testInsertNotFound(self):
+        self.assertRaises(NotFoundError, self.fs.insert, 'foobar', b'data', 0)
+
+    def testNegativeRange(self):
+        self.fs.touch('empty')
+        self.fs.touch('foobar')
+        self.fs.write('foobar', b'Lorem ipsum')
+
+        # ensure every entry point refuses a negative offset or size, even on a file never written to
+        for filename in ['empty', 'foobar']:
+            self.assertRaises(ValueError, self.fs.read, filename, -1)
+            self.assertRaises(ValueError, self.fs.read, filename, 0, -1)
+            self.assertRaises(ValueError, self.fs.iread, filename, -1)
+            self.assertRaises(ValueError, self.fs.iread, filename, 0, -1)
+            self.assertRaises(ValueError, self.fs.write, filename, b'x', -1)
+            self.assertRaises(ValueError, self.fs.insert, filename, b'x', -1)
+
+        # ensure nothing changed
+        self.assertEqual(self.fs.read('empty'), b'')
+        self.assertEqual(self.fs.read('foobar'), b'Lorem ipsum')
+        self.assertEqual(self.fs.du(), (1, 2, 11))
+
+    def testIterRead(self):
+        self.fs = self.filesystem(chunk_size=4)
+        filename = 'foobar'
+
+        # create file
+        self.fs.touch(filename)
+        self.fs.write(filename, b'Lorem ipsum')
+
+        # ensure the range streams in chunks
+        self.assertListEqual([bytes(v) for v in self.fs.iread(filename, 2)], [b're', b'm ip', b'sum'])
+
+    def testIterReadNotFound(self):
+        self.assertRaises(NotFoundError, self.fs.iread, 'foobar')
+
+    def testAppendCopy(self):
+        # create a file and copy it
+        self.fs.touch('/src')
+        self.fs.write('/src', b'foo')
+        self.fs.cp('/src', '/dst')
+
+        # append to each
+        self.fs.append('/src', b'bar')
+        self.fs.append('/dst', b'baz')
+
+        # ensure neither sees the other's append
+        self.assertEqual(self.fs.read('/src'), b'foobar')
+        self.assertEqual(self.fs.read('/dst'), b'foobaz')
+
+    def testMakedirsMany(self):
+        self.fs.mkdir('/tenants/t0', True)
+        self.fs.cd('/tenants')
+
+        # create many paths sharing parents, some already there, absolute and relative
+        self.fs.makedirs_many(['/tenants/t0/logs', 't1/logs', 't1/data/cache', './t2/../t3', '/tenants/t0'])
+
+        # ensure every dir exists once, climbed out of ones included, and the totals were kept
+        self.assertListEqual(self.fs.ls(sort=True), ['t0', 't1', 't2', 't3'])
+        self.assertListEqual(self.fs.ls('t1', sort=True), ['data', 'logs'])
+        self.assertListEqual(self.fs.find('logs', recursive=True), ['/tenants/t0/logs', '/tenants/t1/logs'])
+        self.assertEqual(self.fs.du('/'), (10, 0, 0))
+        self.assertEqual(self.fs.du('t1'), (4, 0, 0))
+
+    def testMakedirsManyFileInTheWay(self):
+        self.fs.mkdir('/somedir')
+        self.fs.touch('/somedir/somefile')
+
+        # ensure nothing is created if a file is in the way of any path
+        self.assertRaises(FileAlreadyExistsError, self.fs.makedirs_many, ['/a/b', '/somedir/somefile/c'])
+        self.assertListEqual(self.fs.ls(), ['somedir'])
+        self.assertEqual(self.fs.du('/'), (2, 1, 0))
+
+    def testMakedirsManyClimbing(self):
+        self.fs.touch('f')
+
+        # ensure paths that climb make the same dirs mkdir -p does, relative to the cwd or not
+        self.fs.makedirs_many(['m/../x', '/a/b/../../c', '../../p'])
+        self.fs.mkdir('n/../y', True)
+        self.assertListEqual(self.fs.ls(sort=True), ['a', 'c', 'f', 'm', 'n', 'p', 'x', 'y'])
+        self.assertListEqual(self.fs.ls('/a'), ['b'])
+        self.assertEqual(self.fs.du('/'), (9, 1, 0))
+
+        # and a file climbed out of is in the way for both
+        self.assertRaises(FileAlreadyExistsError, self.fs.makedirs_many, ['f/../z'])
+        self.assertRaises(FileAlreadyExistsError, self.fs.mkdir, 'f/../z', True)
+        self.assertFalse(self.fs.exists('z'))
+
+    def testMakedirsManyCopy(self):
+        # copy a dir then create under both sides
+        self.fs.mkdir('/src/child', True)
+        self.fs.cp('/src', '/dst')
+        self.fs.makedirs_many(['/src/child/a', '/dst/child/b'])
+
+        # ensure neither side sees the other's dirs
+        self.assertListEqual(self.fs.ls('/src/child'), ['a'])
+        self.assertListEqual(self.fs.ls('/dst/child'), ['b'])
+        self.assertEqual(self.fs.du('/src'), (3, 0, 0))
+
+    def testMakeDirectoryIntermediateError(self):
+        self.fs.touch('/somefile')
+
+        # make dirs, climb back out and hit a file
+        self.assertRaises(FileAlreadyExistsError, self.fs.mkdir, '/x/y/../../somefile/z', True)
+
+        # ensure the dirs made before the error are counted
+        self.assertListEqual(self.fs.ls('/x'), ['y'])
+        self.assertEqual(self.fs.du('/'), (3, 1, 0))
+
+    def testBatch(self):
+        # populate a tree in one batch
+        results = self.fs.batch([
+            ('mkdir', '/somedir'),
+            ('mkdir', '/somedir/child'),
+            ('touch', '/somedir/child/a'),
+            ('write', '/somedir/child/a', 'Lorem'),
+            ('touch', '/somedir/child/b'),
+            ('write', '/somedir/child/b', b'ipsum', 2),
+            ('mkdir', '/other/deep', True),
+            ('touch', 'rel'),
+        ])
+
+        # ensure every op worked, in order
+        self.assertListEqual(results, [None] * 8)
+        self.assertEqual(self.fs.read('/somedir/child/a'), b'Lorem')
+        self.assertEqual(self.fs.read('/somedir/child/b'), b'\0\0ipsum')
+        self.assertListEqual(self.fs.ls(), ['somedir', 'other', 'rel'])
+        self.assertEqual(self.fs.du('/'), (5, 3, 12))
+
+    def testBatchErrors(self):
+        self.fs.touch('/somefile')
+
+        # ensure a failed op gets its error and the rest carry on
+        results = self.fs.batch([
+            ('touch', '/missing/a'),
+            ('mkdir', '/somefile'),
+            ('write', '/nope', 'data'),
+            ('touch', '/somefile/a'),
+            ('rm', '/'),
+            ('touch', '/a'),
+        ])
+        self.assertIsInstance(results[0], NotFoundError)
+        self.assertEqual(str(results[0]), str(NotFoundError('missing')))
+        self.assertIsInstance(results[1], FileAlreadyExistsError)
+        self.assertIsInstance(results[2], NotFoundError)
+        self.assertIsInstance(results[3], NotDirectoryError)
+        self.assertIsInstance(results[4], RootError)
+        self.assertIsNone(results[5])
+        self.assertTrue(self.fs.exists('/a'))
+
+        # ensure an op that isn't batchable is refused
+        self.assertRaises(ValueError, self.fs.batch, [('cp', '/a', '/b')])
+
+    def testBatchRemove(self):
+        self.fs.mkdir('/somedir/child', True)
+
+        # remove a dir the batch has already resolved through, then use its path again
+        results = self.fs.batch([
+            ('touch', '/somedir/child/a'),
+            ('rm', '/somedir', True),
+            ('touch', '/somedir/child/b'),
+            ('mkdir', '/somedir'),
+            ('mkdir', '/somedir/child'),
+            ('touch', '/somedir/child/b'),
+        ])
+        self.assertIsNone(results[1])
+        self.assertIsInstance(results[2], NotFoundError)
+        self.assertListEqual(self.fs.ls('/somedir/child'), ['b'])
+        self.assertEqual(self.fs.du('/'), (3, 1, 0))
+
+    def testBatchCopy(self):
+        # copy a dir then change both sides in a batch
+        self.fs.mkdir('/src')
+        self.fs.touch('/src/a')
+        self.fs.write('/src/a', 'foo')
+        self.fs.cp('/src', '/dst')
+        self.fs.batch([
+            ('write', '/dst/a', 'bar'),
+            ('touch', '/dst/b'),
+            ('rm', '/src/a'),
+        ])
+
+        # ensure neither side sees the other's changes
+        self.assertListEqual(self.fs.ls('/src'), [])
+        self.assertListEqual(self.fs.ls('/dst'), ['a', 'b'])
+        self.assertEqual(self.fs.read('/dst/a'), b'bar')
+        self.assertEqual(self.fs.du('/src'), (1, 0, 0))
+        self.assertEqual(self.fs.du('/dst'), (1, 2, 3))
+
+    def testStats(self):
+        contents = b'Lorem ipsum dolor sit amet'
+
+        # write the same contents to a file, copy it and write them to another
+        self.fs.touch('/src')
+        self.fs.write('/src', contents)
+        self.fs.cp('/src', '/dst')
+        self.fs.touch('/other')
+        self.fs.write('/other', contents)
+
+        # ensure the contents are only stored once
+        stats = self.fs.stats()
+        self.assertEqual(stats.files, 3)
+        self.assertEqual(stats.size, 3 * len(contents))
+        self.assertEqual(stats.stored, len(contents))
+        self.assertEqual(stats.blobs, 1)
+        self.assertEqual(stats.dedup_ratio, 3)
+
+        # ensure removing every copy releases them, though their paths were cached
+        for path in ['/src', '/dst', '/other']:
+            self.assertEqual(self.fs.read(path), contents)
+            self.fs.rm(path)
+        gc.collect()
+        self.assertEqual(self.fs.stats(), (0, 0, 0, 0, 1.0))
+
+        # as does removing the dir holding them
+        self.fs.mkdir('/logs')
+        for i in range(3):
+            self.fs.touch('/logs/f{}'.format(i))
+            self.fs.write('/logs/f{}'.format(i), bytes([i]) * 100)
+            self.assertEqual(self.fs.read('/logs/f{}'.format(i)), bytes([i]) * 100)
+        self.fs.rm('/logs', True)
+        gc.collect()
+        self.assertEqual(self.fs.stats(), (0, 0, 0, 0, 1.0))
+
+    def testMemoryBudget(self):
+        self.fs = self.filesystem(chunk_size=1024, memory_budget=4096)
+        contents = b'Lorem ipsum dolor sit amet\n' * 1000
+
+        # write more than the budget
+        self.fs.touch('/cold')
+        self.fs.write('/cold', contents)
+        self.fs.touch('/hot')
+        self.fs.write('/hot', contents.upper())
+
+        # ensure most of it was compressed
+        self.assertLess(self.fs.stats().stored, len(contents))
+        self.assertGreater(self.fs.compression_info().ratio, 1)
+
+        # ensure reads see the contents as written
+        self.assertEqual(self.fs.read('/cold'), contents)
+        self.assertEqual(self.fs.read('/hot', 27, 27), b'LOREM IPSUM DOLOR SIT AMET\n')
+        self.assertGreater(self.fs.compression_info().unpacks, 0)
+
+    def testSpill(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            self.fs = self.filesystem(chunk_size=1024, memory_budget=4096, spill_dir=tmp)
+            contents = b''.join(i.to_bytes(2, 'big') for i in range(12800))
+
+            # write more than the budget
+            self.fs.touch('/cold')
+            self.fs.write('/cold', contents)
+            self.fs.touch('/hot')
+            self.fs.write('/hot', contents[::-1])
+
+            # ensure most of it went to disk rather than being compressed
+            self.assertLessEqual(self.fs.stats().stored, 4096)
+            self.assertEqual(self.fs.compression_info().packed, 0)
+            self.assertGreater(self.fs.spill_info().evictions, 0)
+
+            # ensure reads and changes see the contents as written
+            self.assertEqual(self.fs.read('/cold'), contents)
+            self.assertEqual(self.fs.read('/hot', 256, 3), contents[::-1][256:259])
+            self.fs.write('/cold', b'xyz', 5000)
+            self.assertEqual(self.fs.read('/cold', 4999, 5), contents[4999:5000] + b'xyz' + contents[5003:5004])
+            self.assertGreater(self.fs.spill_info().misses, 0)
+            self.fs = None
+            gc.collect()
+
     def testCreateFileDirAlreadyExists(self):
         dirname = 'foobar'
         filename = 'foobar'
@@ -723,7 +1207,7 @@ class FilesystemTest(unittest.TestCase):
 
     def testWriteReadFile(self):
         filename = 'lipsum.txt'
-        contents = 'Lorem ipsum dolor sit amet'
+        contents = b'Lorem ipsum dolor sit amet'
 
         # create file
         self.fs.touch(filename)
@@ -756,7 +1240,7 @@ class FilesystemTest(unittest.TestCase):
     def testWriteReadFileAbsolute(self):
         dirname = 'somedir'
         filename = 'lipsum.txt'
-        contents = 'Lorem ipsum dolor sit amet'
+        contents = b'Lorem ipsum dolor sit amet'
 
         # create dir
         self.fs.mkdir(dirname)
@@ -870,14 +1354,16 @@ class FilesystemTest(unittest.TestCase):
     def testMoveDirCollisionOverwrite(self):
         src = 'old'
         dst = 'new'
+        after = 'zzz'
         filename = 'sentinel'
 
         # create dirs
         self.fs.mkdir(src)
         self.fs.mkdir(dst)
+        self.fs.touch(after)
 
         # ensure dirs exists
-        self.assertListEqual(self.fs.ls(), [src, dst])
+        self.assertListEqual(self.fs.ls(), [src, dst, after])
 
         # create a file in src to check for later
         self.fs.pushdir(src)
@@ -888,8 +1374,8 @@ class FilesystemTest(unittest.TestCase):
         # move dir
         self.fs.mv(src, dst, True)
 
-        # ensure dirs exist
-        self.assertListEqual(self.fs.ls(), [dst])
+        # ensure dirs exist, with the overwritten name where it was
+        self.assertListEqual(self.fs.ls(), [dst, after])
 
         # change into new name and check for sentinel file
         self.fs.pushdir(dst)
@@ -960,14 +1446,16 @@ class FilesystemTest(unittest.TestCase):
     def testMoveFileCollisionOverwrite(self):
         src = 'old'
         dst = 'new'
-        contents = 'sentinel'
+        after = 'zzz'
+        contents = b'sentinel'
 
         # create files
         self.fs.touch(src)
         self.fs.touch(dst)
+        self.fs.touch(after)
 
         # ensure files exist
-        self.assertListEqual(self.fs.ls(), [src, dst])
+        self.assertListEqual(self.fs.ls(), [src, dst, after])
 
         # add contents to src to check for later
         self.fs.write(src, contents)
@@ -976,8 +1464,8 @@ class FilesystemTest(unittest.TestCase):
         # move file
         self.fs.mv(src, dst, True)
 
-        # ensure files exists
-        self.assertListEqual(self.fs.ls(), [dst])
+        # ensure files exists, with the overwritten name where it was
+        self.assertListEqual(self.fs.ls(), [dst, after])
 
         # read new name and check for sentinel value
         self.assertEqual(self.fs.read(dst), contents)
@@ -986,7 +1474,7 @@ class FilesystemTest(unittest.TestCase):
         parent = 'somedir'
         src = 'old'
         dst = 'new'
-        contents = 'sentinel'
+        contents = b'sentinel'
 
         # create parent dir
         self.fs.mkdir(parent)
@@ -1009,6 +1497,48 @@ class FilesystemTest(unittest.TestCase):
         # read new name and check for sentinel value
         self.assertEqual(self.fs.read('/{}/{}'.format(parent, dst)), contents)
 
+    def testMoveDirIntoItselfError(self):
+        dirname = 'somedir'
+
+        # create dir
+        self.fs.mkdir(dirname)
+
+        # ensure exception raised
+        self.assertRaises(SubdirectoryError, self.fs.mv, dirname, '/{}/{}'.format(dirname, dirname))
+
+        # ensure dir still exists
+        self.assertListEqual(self.fs.ls(), [dirname])
+
+    def testMoveFileDestinationNotFound(self):
+        filename = 'somefile'
+
+        # create file
+        self.fs.touch(filename)
+
+        # ensure exception raised
+        self.assertRaises(NotFoundError, self.fs.mv, filename, '/nope/{}'.format(filename))
+
+        # ensure file was not lost
+        self.assertListEqual(self.fs.ls(), [filename])
+
+    def testMoveCopyClimbingDestination(self):
+        self.fs.mkdir('/c/x', True)
+        self.fs.touch('/f')
+        self.fs.write('/f', b'foo')
+
+        # ensure a destination climbing through the node moved or replaced is found before it goes
+        self.fs.mv('/c/x', '/c/x/../y')
+        self.assertListEqual(self.fs.ls('/c'), ['y'])
+        self.assertEqual(self.fs.du('/c'), (2, 0, 0))
+        self.assertListEqual(self.fs.find('y', recursive=True), ['/c/y'])
+        self.fs.mv('/c', '/c/../a')
+        self.assertEqual(self.fs.du('/'), (3, 1, 3))
+        self.assertListEqual(self.fs.find('y', recursive=True), ['/a/y'])
+        self.fs.cp('/f', '/a/../a', True)
+        self.assertEqual(self.fs.read('/a'), b'foo')
+        self.assertEqual(self.fs.du('/'), (1, 2, 6))
+        self.assertListEqual(self.fs.find('y', recursive=True), [])
+
     def testCopyDir(self):
         src = 'old'
         dst = 'new'
@@ -1061,14 +1591,16 @@ class FilesystemTest(unittest.TestCase):
     def testCopyDirCollisionOverwrite(self):
         src = 'old'
         dst = 'new'
+        after = 'zzz'
         filename = 'sentinel'
 
         # create dirs
         self.fs.mkdir(src)
         self.fs.mkdir(dst)
+        self.fs.touch(after)
 
         # ensure dirs exists
-        self.assertListEqual(self.fs.ls(), [src, dst])
+        self.assertListEqual(self.fs.ls(), [src, dst, after])
 
         # create a file in src to check for later
         self.fs.pushdir(src)
@@ -1079,8 +1611,8 @@ class FilesystemTest(unittest.TestCase):
         # move dir
         self.fs.cp(src, dst, True)
 
-        # ensure dirs exist
-        self.assertListEqual(self.fs.ls(), [src, dst])
+        # ensure dirs exist, with the overwritten name where it was
+        self.assertListEqual(self.fs.ls(), [src, dst, after])
 
         # change into old name and check for sentinel file
         self.fs.pushdir(src)
@@ -1114,7 +1646,7 @@ class FilesystemTest(unittest.TestCase):
     def testCopyFile(self):
         src = 'old'
         dst = 'new'
-        contents = 'foobar'
+        contents = b'foobar'
 
         # create file
         self.fs.touch(src)
@@ -1163,14 +1695,16 @@ class FilesystemTest(unittest.TestCase):
     def testCopyFileCollisionOverwrite(self):
         src = 'old'
         dst = 'new'
-        contents = 'sentinel'
+        after = 'zzz'
+        contents = b'sentinel'
 
         # create files
         self.fs.touch(src)
         self.fs.touch(dst)
+        self.fs.touch(after)
 
         # ensure files exist
-        self.assertListEqual(self.fs.ls(), [src, dst])
+        self.assertListEqual(self.fs.ls(), [src, dst, after])
 
         # add contents to src to check for later
         self.fs.write(src, contents)
@@ -1179,8 +1713,8 @@ class FilesystemTest(unittest.TestCase):
         # move file
         self.fs.cp(src, dst, True)
 
-        # ensure files exists
-        self.assertListEqual(self.fs.ls(), [src, dst])
+        # ensure files exists, with the overwritten name where it was
+        self.assertListEqual(self.fs.ls(), [src, dst, after])
 
         # read old name and check for sentinel value
         self.assertEqual(self.fs.read(src), contents)
@@ -1192,7 +1726,7 @@ class FilesystemTest(unittest.TestCase):
         parent = 'somedir'
         src = 'old'
         dst = 'new'
-        contents = 'sentinel'
+        contents = b'sentinel'
 
         # create parent dir
         self.fs.mkdir(parent)
@@ -1215,6 +1749,138 @@ class FilesystemTest(unittest.TestCase):
         # read new name and check for sentinel value
         self.assertEqual(self.fs.read('/{}/{}'.format(parent, dst)), contents)
 
+    def testCopyDirNestedWrites(self):
+        # create a nested tree with a file
+        self.fs.mkdir('/old/child/grandchild', True)
+        self.fs.touch('/old/child/grandchild/somefile')
+        self.fs.write('/old/child/grandchild/somefile', 'old')
+
+        # copy the tree
+        self.fs.cp('/old', '/new')
+
+        # ensure the copy reads the same
+        self.assertEqual(self.fs.read('/new/child/grandchild/somefile'), b'old')
+
+        # write through the copy and through the source
+        self.fs.write('/new/child/grandchild/somefile', 'new')
+        self.fs.touch('/old/child/grandchild/otherfile')
+        self.fs.mkdir('/new/child/newdir')
+
+        # ensure neither side sees the other's changes
+        self.assertEqual(self.fs.read('/old/child/grandchild/somefile'), b'old')
+        self.assertEqual(self.fs.read('/new/child/grandchild/somefile'), b'new')
+        self.assertListEqual(self.fs.ls('/old/child/grandchild'), ['somefile', 'otherfile'])
+        self.assertListEqual(self.fs.ls('/new/child/grandchild'), ['somefile'])
+        self.assertListEqual(self.fs.ls('/old/child'), ['grandchild'])
+        self.assertListEqual(self.fs.ls('/new/child'), ['grandchild', 'newdir'])
+
+    def testCopyDirRemoveFromCopy(self):
+        # create and copy a tree
+        self.fs.mkdir('/old/child', True)
+        self.fs.touch('/old/child/somefile')
+        self.fs.cp('/old', '/new')
+
+        # remove from the copy
+        self.fs.rm('/new/child/somefile')
+        self.fs.rm('/new/child')
+
+        # ensure the source is untouched
+        self.assertListEqual(self.fs.ls('/old/child'), ['somefile'])
+        self.assertListEqual(self.fs.ls('/new'), [])
+
+    def testCopyDirChangeInsideCwd(self):
+        # create a tree, then copy it while inside it
+        self.fs.mkdir('/old/child', True)
+        self.fs.touch('/old/child/somefile')
+        self.fs.cd('/old/child')
+        self.fs.cp('/old', '/new')
+
+        # change things relative to the cwd
+        self.fs.write('somefile', 'cwd')
+        self.fs.touch('otherfile')
+
+        # ensure the cwd still reads its own changes
+        self.assertEqual(self.fs.read('somefile'), b'cwd')
+        self.assertEqual(self.fs.read('/old/child/somefile'), b'cwd')
+        self.assertListEqual(self.fs.ls(), ['somefile', 'otherfile'])
+
+        # ensure the copy is untouched
+        self.assertEqual(self.fs.read('/new/child/somefile'), b'')
+        self.assertListEqual(self.fs.ls('/new/child'), ['somefile'])
+
+    def testRemoveCwdAncestor(self):
+        self.fs.mkdir('/a/b/c', True)
+        self.fs.mkdir('/x/y', True)
+
+        # ensure removing a dir above the cwd moves the cwd up to its parent, which relative changes then use
+        self.fs.cd('/a/b/c')
+        self.fs.rm('/a/b', True)
+        self.assertEqual(self.fs.pwd(), '/a')
+        self.fs.touch('f')
+        self.assertListEqual(self.fs.ls('/a'), ['f'])
+
+        # as does moving it away, or replacing it with a copy
+        self.fs.cd('/x/y')
+        self.fs.mv('/x', '/moved')
+        self.assertEqual(self.fs.pwd(), '/')
+        self.fs.cd('/moved/y')
+        self.fs.cp('/a', '/moved', True)
+        self.assertEqual(self.fs.pwd(), '/')
+        self.fs.mkdir('z')
+
+        # or removing it in a batch
+        self.fs.cd('/moved')
+        self.fs.batch([('rm', '/moved', True)])
+        self.assertEqual(self.fs.pwd(), '/')
+        self.fs.touch('g')
+
+        # ensure the totals only count what's left in the tree
+        self.assertListEqual(self.fs.ls(), ['a', 'z', 'g'])
+        self.assertEqual(self.fs.du(), (3, 2, 0))
+
+    def testParentPartsBeforeAndAfterCopy(self):
+        def changes():
+            self.fs.mkdir('/a/b/c', True)
+
+            # ensure climbing to a dir can't remove it, but climbing past one can
+            self.assertRaises(NotFoundError, self.fs.rm, '/a/b/..', True)
+            self.assertRaises(NotFoundError, self.fs.rm, '/a/b/c/../..', True)
+            self.fs.touch('/a/b/../f')
+            self.fs.mv('/a/b/c/../../f', '/a/b/../g')
+            self.fs.rm('/a/b/c/../../b', True)
+            return self.fs.ls('/a'), tuple(self.fs.du('/a'))
+
+        # ensure the same changes do the same once a dir has been copied
+        before = changes()
+        self.fs.rm('/a', True)
+        self.fs.mkdir('/x')
+        self.fs.cp('/x', '/copy')
+        self.assertEqual(changes(), before)
+        self.assertEqual(before, (['g'], (1, 1, 0)))
+
+    def testCopyDirIntoItself(self):
+        # create a tree and copy it into its own subtree
+        self.fs.mkdir('/old/child', True)
+        self.fs.cp('/old', '/old/child/copy')
+
+        # ensure the copy holds the tree as it was
+        self.assertListEqual(self.fs.ls('/old/child/copy'), ['child'])
+        self.assertListEqual(self.fs.ls('/old/child/copy/child'), [])
+
+    def testCopyDirReadAfterAbsoluteWrite(self):
+        # create a tree and cd into the copy
+        self.fs.mkdir('/old/child', True)
+        self.fs.touch('/old/child/somefile')
+        self.fs.cp('/old', '/new')
+        self.fs.cd('/new/child')
+
+        # write through an absolute path
+        self.fs.write('/new/child/somefile', 'new')
+
+        # ensure the cwd sees the write, and the source doesn't
+        self.assertEqual(self.fs.read('somefile'), b'new')
+        self.assertEqual(self.fs.read('/old/child/somefile'), b'')
+
     def testFind(self):
         dirs = ['foo', 'bar', 'baz', 'bin']
 
@@ -1293,3 +1959,749 @@ class FilesystemTest(unittest.TestCase):
             '/{}/{}'.format(dirname, filename),
             '/{}/{}/{}'.format(dirname, dirname, filename),
         ])
+
+    def testIterFind(self):
+        # create the same name at several levels, out of alphabetical order
+        self.fs.mkdir('/b/c', True)
+        self.fs.mkdir('/a', True)
+        for path in ['/b/c/x', '/b/x', '/a/x', '/x']:
+            self.fs.touch(path)
+
+        # ensure a generator in the same order as find
+        results = self.fs.ifind('x', recursive=True)
+        self.assertEqual(next(results), '/x')
+        self.assertListEqual(list(results), ['/a/x', '/b/x', '/b/c/x'])
+        self.assertListEqual(self.fs.find('x', recursive=True), ['/x', '/a/x', '/b/x', '/b/c/x'])
+
+    def testIterFindLimit(self):
+        # create the same name at several levels
+        self.fs.mkdir('/a/b', True)
+        for path in ['/x', '/a/x', '/a/b/x']:
+            self.fs.touch(path)
+
+        # ensure results stop at the limit
+        self.assertListEqual(list(self.fs.ifind('x', recursive=True, limit=2)), ['/x', '/a/x'])
+        self.assertListEqual(list(self.fs.ifind('x', recursive=True, limit=0)), [])
+
+    def testIterFindLimitWithinDepth(self):
+        # create the same name in many dirs of one level, out of alphabetical order, and below them
+        for d in ['m', 'c', 'x', 'a', 'q']:
+            self.fs.mkdir('/{}/deep'.format(d), True)
+            self.fs.touch('/{}/f'.format(d))
+            self.fs.touch('/{}/deep/f'.format(d))
+
+        # ensure a limit inside a level still gets that level's first matches in order
+        self.assertListEqual(list(self.fs.ifind('f', recursive=True, limit=3)), ['/a/f', '/c/f', '/m/f'])
+        self.assertListEqual(list(self.fs.ifind('f', True, True, limit=6))[-1:], ['/a/deep/f'])
+
+    def testIterFindMaxDepth(self):
+        # create the same name at several levels
+        self.fs.mkdir('/a/b', True)
+        for path in ['/x', '/a/x', '/a/b/x']:
+            self.fs.touch(path)
+        self.fs.cd('/a')
+
+        # ensure depth is relative to the cwd
+        self.assertListEqual(list(self.fs.ifind('x', recursive=True, max_depth=1)), ['/a/x'])
+        self.assertListEqual(list(self.fs.ifind('x', recursive=True, max_depth=2)), ['/a/x', '/a/b/x'])
+        self.assertListEqual(list(self.fs.ifind('x', True, True, max_depth=2)), ['/a/x', '/a/b/x'])
+
+    def testDiskUsage(self):
+        # create some dirs & files
+        self.fs.mkdir('/a/b', True)
+        self.fs.touch('/a/x')
+        self.fs.touch('/a/b/y')
+        self.fs.write('/a/x', b'foo')
+        self.fs.write('/a/b/y', b'foobar')
+
+        # ensure counts include the dir itself
+        self.assertEqual(self.fs.du('/a'), (2, 2, 9))
+        self.assertEqual(self.fs.du('/a/x'), (0, 1, 3))
+        self.assertEqual(self.fs.du(), (3, 2, 9))
+
+        # ensure missing paths error
+        self.assertRaises(NotFoundError, self.fs.du, '/nope')
+
+    def testDiskUsageChanges(self):
+        self.fs.mkdir('/a/b', True)
+        self.fs.touch('/a/b/y')
+        self.fs.write('/a/b/y', b'foobar')
+
+        # change files in every way
+        self.fs.append('/a/b/y', b'baz')
+        self.fs.write('/a/b/y', b'!', 20)
+        self.fs.insert('/a/b/y', b'12', 0)
+        self.assertEqual(self.fs.du('/a'), (2, 1, 23))
+
+        # copy, move & remove
+        self.fs.cp('/a', '/c')
+        self.assertEqual(self.fs.du(), (5, 2, 46))
+        self.fs.mv('/c/b', '/a/moved')
+        self.assertEqual(self.fs.du('/a'), (3, 2, 46))
+        self.assertEqual(self.fs.du('/c'), (1, 0, 0))
+        self.fs.rm('/a/b', True)
+        self.assertEqual(self.fs.du('/a'), (2, 1, 23))
+
+        # overwrite a dir with a file, relative to the cwd
+        self.fs.cd('/a')
+        self.fs.mkdir('p/q/../r', True)
+        self.assertEqual(self.fs.du('p'), (3, 0, 0))
+        self.fs.cp('moved/y', 'p', True)
+        self.assertEqual(self.fs.du(), (2, 2, 46))
+        self.assertEqual(self.fs.du('/'), (4, 2, 46))
+
+    def testDiskUsageMoveOntoItself(self):
+        self.fs.mkdir('/a/d', True)
+        self.fs.touch('/a/f')
+        self.fs.write('/a/f', b'foo')
+
+        # ensure forced moves onto themselves leave everything as it was
+        self.fs.mv('/a/f', '/a/f', True)
+        self.fs.cd('/a')
+        self.fs.mv('d', './d', True)
+        self.assertEqual(self.fs.read('/a/f'), b'foo')
+        self.assertTrue(self.fs.exists('/a/d'))
+        self.assertEqual(self.fs.du('/a'), (2, 1, 3))
+        self.assertEqual(self.fs.du('/'), (3, 1, 3))
+
+    def testDiskUsageMatchesWalk(self):
+        def walked(path):
+            # count a subtree the slow way through ls & read
+            dirs = files = size = 0
+            stack = [path]
+            while stack:
+                p = stack.pop()
+                dirs += 1
+                for kind, name in self.fs.ls(p, True):
+                    child = '{}/{}'.format(p.rstrip('/'), name)
+                    if kind == Node.TYPE_DIRECTORY:
+                        stack.append(child)
+                    else:
+                        files += 1
+                        size += len(self.fs.read(child))
+            return dirs, files, size
+
+        # build a tree, then change it through copies and moves
+        for i in range(4):
+            self.fs.mkdir('/t{}/d{}'.format(i, i), True)
+            self.fs.touch('/t{}/d{}/f'.format(i, i))
+            self.fs.write('/t{}/d{}/f'.format(i, i), b'x' * i)
+        self.fs.cp('/t1', '/t0/t1')
+        self.fs.append('/t0/t1/d1/f', b'yy')
+        self.fs.mv('/t2', '/t0/t1/t2')
+        self.fs.rm('/t3/d3/f')
+        self.fs.cp('/t0', '/t3/d3/t0')
+
+        # ensure every dir's totals match walking it
+        for path in ['/', '/t0', '/t0/t1', '/t3', '/t3/d3/t0/t1/t2']:
+            self.assertEqual(tuple(self.fs.du(path)), walked(path), path)
+
+    def testDeepTree(self):
+        depth = 3 * sys.getrecursionlimit()
+        path = '/d' * depth
+
+        # create a chain deeper than the recursion limit with a file at the bottom
+        self.fs.mkdir(path, True)
+        self.fs.touch('{}/x'.format(path))
+
+        # ensure find, cp & du all reach the bottom
+        self.assertListEqual(self.fs.find('x', recursive=True), ['{}/x'.format(path)])
+        self.fs.cp('/d', '/copy')
+        self.assertEqual(self.fs.read('/copy{}/x'.format(path[2:])), b'')
+        self.assertEqual(self.fs.du('/copy'), (depth, 1, 0))
+
+        # ensure the whole chain can be removed
+        self.fs.rm('/d', True)
+        self.assertFalse(self.fs.exists('/d'))
+
+
+class FilesystemCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        self.fs = Filesystem()
+
+    def testCacheHit(self):
+        path = '/somedir/somefile'
+        contents = b'foobar'
+
+        # create & write file
+        self.fs.mkdir('/somedir')
+        self.fs.touch(path)
+        self.fs.write(path, contents)
+
+        # ensure repeated reads hit
+        hits = self.fs.cache_info().hits
+        self.assertEqual(self.fs.read(path), contents)
+        self.assertEqual(self.fs.read(path), contents)
+        self.assertEqual(self.fs.cache_info().hits, hits + 2)
+
+    def testCacheRelativeNotCached(self):
+        filename = 'somefile'
+
+        # create file relative and read it
+        self.fs.touch(filename)
+        self.fs.read(filename)
+
+        # ensure nothing cached
+        self.assertEqual(self.fs.cache_info(), CacheInfo(0, 0, 1024, 0))
+
+    def testCacheDisabled(self):
+        self.fs = Filesystem(cache_size=0)
+
+        # create & read file
+        self.fs.touch('/somefile')
+        self.fs.read('/somefile')
+
+        # ensure no cache
+        self.assertEqual(self.fs.cache_info(), CacheInfo(0, 0, 0, 0))
+
+    def testCacheSize(self):
+        self.fs = Filesystem(cache_size=2)
+
+        # create & read files
+        for filename in ['foo', 'bar', 'baz']:
+            self.fs.touch('/{}'.format(filename))
+            self.fs.read('/{}'.format(filename))
+
+        # ensure size is bounded
+        self.assertEqual(self.fs.cache_info().currsize, 2)
+
+    def testCacheRemoveFile(self):
+        path = '/somedir/somefile'
+
+        # create & read file
+        self.fs.mkdir('/somedir')
+        self.fs.touch(path)
+        self.fs.read(path)
+
+        # remove file
+        self.fs.rm(path)
+
+        # ensure file not found
+        self.assertRaises(NotFoundError, self.fs.read, path)
+
+    def testCacheRemoveDir(self):
+        path = '/somedir/child/somefile'
+
+        # create & read file
+        self.fs.mkdir('/somedir/child', True)
+        self.fs.touch(path)
+        self.fs.read(path)
+
+        # remove parent dir
+        self.fs.rm('/somedir', True)
+
+        # ensure file not found
+        self.assertRaises(NotFoundError, self.fs.read, path)
+
+    def testCacheRemoveReplaceWithDir(self):
+        path = '/somedir/foobar'
+
+        # create & read file
+        self.fs.mkdir('/somedir')
+        self.fs.touch(path)
+        self.fs.read(path)
+
+        # replace with dir
+        self.fs.rm(path)
+        self.fs.mkdir(path)
+
+        # ensure not a file
+        self.assertRaises(NotFileError, self.fs.read, path)
+
+    def testCacheMoveDir(self):
+        contents = b'foobar'
+
+        # create, write & read file
+        self.fs.mkdir('/old/child', True)
+        self.fs.touch('/old/child/somefile')
+        self.fs.write('/old/child/somefile', contents)
+        self.fs.read('/old/child/somefile')
+
+        # move parent dir
+        self.fs.mv('/old', '/new')
+
+        # ensure file moved
+        self.assertRaises(NotFoundError, self.fs.read, '/old/child/somefile')
+        self.assertEqual(self.fs.read('/new/child/somefile'), contents)
+
+    def testCacheCopyOverwrite(self):
+        contents = b'foobar'
+
+        # create, write & read files
+        self.fs.touch('/src')
+        self.fs.touch('/dst')
+        self.fs.write('/src', contents)
+        self.fs.read('/dst')
+
+        # copy over dst
+        self.fs.cp('/src', '/dst', True)
+
+        # ensure new contents in dst
+        self.assertEqual(self.fs.read('/dst'), contents)
+
+        # ensure dst is not the src file
+        self.fs.write('/src', 'changed')
+        self.assertEqual(self.fs.read('/dst'), contents)
+
+    def testCacheCopyDirWrite(self):
+        # create, write & read a file, then copy its dir
+        self.fs.mkdir('/old')
+        self.fs.touch('/old/somefile')
+        self.fs.write('/old/somefile', 'old')
+        self.fs.cp('/old', '/new')
+        self.assertEqual(self.fs.read('/new/somefile'), b'old')
+
+        # write through the copy
+        self.fs.write('/new/somefile', 'new')
+
+        # ensure cached reads see the write on one side only
+        self.assertEqual(self.fs.read('/new/somefile'), b'new')
+        self.assertEqual(self.fs.read('/old/somefile'), b'old')
+
+
+class FilesystemPathIndexTest(FilesystemTest):
+
+    def setUp(self):
+        super().setUp()
+
+        self.fs = Filesystem(path_index=True)
+
+    def testIndexRemoveForce(self):
+        # create a subtree
+        self.fs.mkdir('/somedir/child/grandchild', True)
+        self.fs.touch('/somedir/child/somefile')
+        self.assertEqual(len(self.fs._path_index), 4)
+
+        # remove it (forced)
+        self.fs.rm('/somedir', True)
+
+        # ensure only root is left
+        self.assertEqual(len(self.fs._path_index), 1)
+        self.assertFalse(self.fs.exists('/somedir/child/somefile'))
+
+    def testIndexMoveDir(self):
+        # create a subtree
+        self.fs.mkdir('/old/child', True)
+        self.fs.touch('/old/child/somefile')
+
+        # move it
+        self.fs.mv('/old', '/new')
+
+        # ensure the subtree is indexed under its new path only
+        self.assertNotIn('/old/child', self.fs._path_index)
+        self.assertIn('/new/child', self.fs._path_index)
+        self.assertFalse(self.fs.exists('/old/child/somefile'))
+        self.assertTrue(self.fs.exists('/new/child/somefile'))
+
+    def testIndexCopyDirOverwrite(self):
+        # create subtrees
+        self.fs.mkdir('/src/child', True)
+        self.fs.mkdir('/dst/other', True)
+
+        # copy over dst
+        self.fs.cp('/src', '/dst', True)
+
+        # ensure the copy replaced the dst subtree
+        self.assertNotIn('/dst/other', self.fs._path_index)
+        self.assertIn('/dst/child', self.fs._path_index)
+
+        # ensure copies are separate nodes
+        self.fs.touch('/dst/child/somefile')
+        self.assertFalse(self.fs.exists('/src/child/somefile'))
+
+
+class FilesystemNameIndexTest(FilesystemTest):
+
+    def setUp(self):
+        super().setUp()
+
+        self.fs = Filesystem(name_index=True)
+
+    def testIndexFindUnderCwd(self):
+        filename = 'config'
+
+        # create the same name in separate subtrees
+        self.fs.mkdir('/a/b', True)
+        self.fs.mkdir('/c', True)
+        self.fs.touch('/{}'.format(filename))
+        self.fs.touch('/a/{}'.format(filename))
+        self.fs.touch('/a/b/{}'.format(filename))
+        self.fs.touch('/c/{}'.format(filename))
+
+        # ensure only matches under the cwd are found
+        self.fs.cd('/a')
+        self.assertListEqual(self.fs.find(filename, recursive=True), ['/a/{}'.format(filename),
+                                                                      '/a/b/{}'.format(filename)])
+        self.assertListEqual(self.fs.find(filename), ['/a/{}'.format(filename)])
+
+    def testIndexFindAfterMoveCopyRemove(self):
+        filename = 'config'
+
+        # create a subtree with the name in it
+        self.fs.mkdir('/old/child', True)
+        self.fs.touch('/old/child/{}'.format(filename))
+
+        # move, copy & remove parts of the tree
+        self.fs.mv('/old', '/new')
+        self.fs.cp('/new', '/copy')
+        self.fs.rm('/new/child', True)
+
+        # ensure only the copy is found
+        self.assertListEqual(self.fs.find(filename, recursive=True), ['/copy/child/{}'.format(filename)])
+
+        # ensure removing the last one drops the name, leaving only "new"
+        self.fs.rm('/copy', True)
+        self.assertEqual(self.fs.find(filename, recursive=True), [])
+        self.assertEqual(len(self.fs._name_index), 1)
+
+
+class FilesystemTrigramIndexTest(FilesystemNameIndexTest):
+
+    def setUp(self):
+        super().setUp()
+
+        self.fs = Filesystem(trigram_index=True)
+
+    def testIndexFindFuzzyRename(self):
+        # create some files
+        self.fs.mkdir('/a/b', True)
+        self.fs.touch('/a/foobar')
+        self.fs.touch('/a/b/barbaz')
+        self.fs.touch('/binzip')
+
+        # rename one
+        self.fs.mv('/a/b/barbaz', '/a/b/bazbin')
+
+        # ensure renamed file matches by its new name only
+        self.assertListEqual(self.fs.find('bar', fuzzy=True, recursive=True), ['/a/foobar'])
+        self.assertListEqual(self.fs.find('bin', fuzzy=True, recursive=True), ['/binzip', '/a/b/bazbin'])
+
+        # ensure non-recursive only finds the cwd
+        self.fs.cd('/a')
+        self.assertListEqual(self.fs.find('ba', fuzzy=True), ['/a/foobar'])
+
+
+class FilesystemThreadSafeTest(FilesystemTest):
+
+    def filesystem(self, **options) -> Filesystem:
+        return Filesystem(thread_safe=True, **options)
+
+    def testConcurrent(self):
+        self.fs.mkdir('/shared')
+        self.fs.touch('/shared/file')
+        self.fs.write('/shared/file', 'Lorem ipsum')
+        errors = []
+
+        def reads():
+            try:
+                for _ in range(200):
+                    self.assertEqual(self.fs.read('/shared/file'), b'Lorem ipsum')
+                    self.fs.ls('/shared', sort=True)
+                    self.fs.find('file', recursive=True)
+                    usage = self.fs.du('/')
+                    # totals are never seen half updated
+                    self.assertEqual(usage.size, 11 * usage.files)
+            except Exception as e:
+                errors.append(e)
+
+        def writes(n: int):
+            try:
+                for i in range(50):
+                    path = '/w{}/d{}/f'.format(n, i)
+                    self.fs.mkdir('/w{}/d{}'.format(n, i), True)
+                    self.fs.cp('/shared/file', path)
+                    self.fs.cd('/w{}'.format(n))
+                    self.fs.rm('d{}'.format(i), True)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=reads) for _ in range(4)]
+        threads += [threading.Thread(target=writes, args=(n,)) for n in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # ensure nothing went wrong and the tree adds up
+        self.assertListEqual(errors, [])
+        self.assertEqual(self.fs.du('/'), (4, 1, 11))
+
+    def testLazyUnderLock(self):
+        self.fs.mkdir('/a')
+        self.fs.touch('/a/f')
+        self.fs.write('/a/f', 'Lorem')
+
+        # ensure lazy results are taken while the lock is held
+        found = self.fs.ifind('f', recursive=True)
+        chunks = self.fs.iread('/a/f')
+        self.fs.rm('/a', True)
+        self.assertListEqual(list(found), ['/a/f'])
+        self.assertEqual(b''.join(chunks), b'Lorem')
+        self.assertEqual(self.fs._lock._readers, 0)
+
+    def testSnapshotSharesLock(self):
+        # ensure a snapshot reads under the same lock as the filesystem changes
+        self.assertIs(self.fs.snapshot()._lock, self.fs._lock)
+
+
+class FilesystemSnapshotTest(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        self.fs = Filesystem()
+        self.fs.mkdir('/dir/child', True)
+        self.fs.touch('/dir/child/somefile')
+        self.fs.write('/dir/child/somefile', 'old')
+
+    def testSnapshotUnchanged(self):
+        snap = self.fs.snapshot()
+
+        # change the live filesystem every way we can
+        self.fs.write('/dir/child/somefile', 'ne')
+        self.fs.append('/dir/child/somefile', 'w')
+        self.fs.touch('/dir/child/otherfile')
+        self.fs.mkdir('/dir/newdir')
+        self.fs.cp('/dir/child', '/dir/copy')
+        self.fs.mv('/dir/copy', '/moved')
+        self.fs.rm('/dir/child/otherfile')
+
+        # ensure the snapshot still reads as it was
+        self.assertListEqual(snap.ls('/'), ['dir'])
+        self.assertListEqual(snap.ls('/dir'), ['child'])
+        self.assertListEqual(snap.ls('/dir/child'), ['somefile'])
+        self.assertEqual(snap.read('/dir/child/somefile'), b'old')
+        self.assertListEqual(snap.find('somefile', recursive=True), ['/dir/child/somefile'])
+
+        # ensure the live filesystem has the changes
+        self.assertEqual(self.fs.read('/dir/child/somefile'), b'new')
+        self.assertListEqual(self.fs.ls('/'), ['dir', 'moved'])
+        self.assertListEqual(self.fs.ls('/dir'), ['child', 'newdir'])
+
+    def testSnapshotCwd(self):
+        self.fs.cd('/dir/child')
+        snap = self.fs.snapshot()
+
+        # ensure the snapshot starts in the same cwd
+        self.assertEqual(snap.pwd(), '/dir/child')
+        self.assertEqual(snap.read('somefile'), b'old')
+
+        # ensure it can move around on its own
+        snap.cd('..')
+        self.assertEqual(snap.pwd(), '/dir')
+        self.assertEqual(self.fs.pwd(), '/dir/child')
+
+    def testSnapshotReadOnly(self):
+        snap = self.fs.snapshot()
+
+        # ensure every change raises
+        self.assertRaises(ReadOnlyError, snap.mkdir, '/newdir')
+        self.assertRaises(ReadOnlyError, snap.rm, '/dir', True)
+        self.assertRaises(ReadOnlyError, snap.touch, '/newfile')
+        self.assertRaises(ReadOnlyError, snap.write, '/dir/child/somefile', 'new')
+        self.assertRaises(ReadOnlyError, snap.append, '/dir/child/somefile', 'new')
+        self.assertRaises(ReadOnlyError, snap.insert, '/dir/child/somefile', 'new', 0)
+        self.assertRaises(ReadOnlyError, snap.mv, '/dir', '/moved')
+        self.assertRaises(ReadOnlyError, snap.cp, '/dir', '/copy')
+        self.assertRaises(ReadOnlyError, snap.restore, snap)
+        self.assertRaises(ReadOnlyError, snap.batch, [('touch', '/newfile')])
+        self.assertRaises(ReadOnlyError, snap.makedirs_many, ['/newdir'])
+        self.assertRaises(ReadOnlyError, snap.import_tree, '.', '/newdir')
+
+    def testRestore(self):
+        snap = self.fs.snapshot()
+
+        # change the live filesystem, then restore
+        self.fs.write('/dir/child/somefile', 'new')
+        self.fs.rm('/dir/child/somefile')
+        self.fs.mkdir('/newdir')
+        self.fs.restore(snap)
+
+        # ensure it's back as it was
+        self.assertListEqual(self.fs.ls('/'), ['dir'])
+        self.assertEqual(self.fs.read('/dir/child/somefile'), b'old')
+
+        # ensure changing it again doesn't change the snapshot, so it can be restored twice
+        self.fs.write('/dir/child/somefile', 'new')
+        self.assertEqual(snap.read('/dir/child/somefile'), b'old')
+        self.fs.restore(snap)
+        self.assertEqual(self.fs.read('/dir/child/somefile'), b'old')
+
+    def testRestoreCwd(self):
+        snap = self.fs.snapshot()
+
+        # ensure the cwd is kept if it's in the snapshot
+        self.fs.cd('/dir/child')
+        self.fs.restore(snap)
+        self.assertEqual(self.fs.pwd(), '/dir/child')
+        self.assertEqual(self.fs.read('somefile'), b'old')
+
+        # or goes back to root if it isn't
+        self.fs.mkdir('/newdir')
+        self.fs.cd('/newdir')
+        self.fs.restore(snap)
+        self.assertEqual(self.fs.pwd(), '/')
+
+        # or the nearest dir above it that is
+        self.fs.mkdir('/dir/child/new/deeper', True)
+        self.fs.cd('/dir/child/new/deeper')
+        self.fs.restore(snap)
+        self.assertEqual(self.fs.pwd(), '/dir/child')
+        self.fs.touch('f')
+        self.assertEqual(self.fs.du('/dir'), (2, 2, 3))
+
+    def testRestoreIndexes(self):
+        self.fs = Filesystem(path_index=True, trigram_index=True)
+        self.fs.mkdir('/dir/child', True)
+        self.fs.touch('/dir/child/somefile')
+        snap = self.fs.snapshot()
+
+        # change the live filesystem, then restore
+        self.fs.mv('/dir/child', '/moved')
+        self.fs.touch('/dir/newfile')
+        self.fs.restore(snap)
+
+        # ensure the indexes match the restored tree
+        self.assertListEqual(self.fs.find('somefile', recursive=True), ['/dir/child/somefile'])
+        self.assertListEqual(self.fs.find('newfile', recursive=True), [])
+        self.assertListEqual(self.fs.find('ome', fuzzy=True, recursive=True), ['/dir/child/somefile'])
+        self.assertListEqual(self.fs.ls('/dir/child'), ['somefile'])
+        self.assertRaises(NotFoundError, self.fs.ls, '/moved')
+
+
+class FilesystemWalTest(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.wal = os.path.join(self.tmp.name, 'wal')
+        self.fs = Filesystem(wal=self.wal)
+
+    def tearDown(self):
+        self.fs.close()
+        self.tmp.cleanup()
+
+        super().tearDown()
+
+    def recover(self) -> Filesystem:
+        # as if the process stopped after its last sync
+        self.fs.sync()
+        return Filesystem.recover(self.wal)
+
+    def testRecover(self):
+        # make every kind of change, some relative to the cwd
+        self.fs.mkdir('/somedir/child', True)
+        self.fs.cd('/somedir')
+        self.fs.touch('child/somefile')
+        self.fs.write('child/somefile', 'Lorem ipsum')
+        self.fs.append('child/somefile', b' dolor')
+        self.fs.insert('child/somefile', ',', 11)
+        self.fs.cp('child', 'copy')
+        self.fs.mv('copy/somefile', '/moved')
+        self.fs.rm('/somedir/copy')
+        self.fs.makedirs_many(['/a/b', '/a/c'])
+        self.fs.batch([('touch', '/a/b/f'), ('write', '/a/b/f', b'data'), ('rm', '/a/c')])
+
+        # ensure replaying the log gets everything back, cwd included
+        fs = self.recover()
+        self.assertEqual(fs.pwd(), '/somedir')
+        self.assertListEqual(fs.ls(), ['child'])
+        self.assertEqual(fs.read('child/somefile'), b'Lorem ipsum, dolor')
+        self.assertEqual(fs.read('/moved'), b'Lorem ipsum, dolor')
+        self.assertListEqual(fs.ls('/a'), ['b'])
+        self.assertEqual(fs.read('/a/b/f'), b'data')
+        self.assertEqual(fs.du('/'), self.fs.du('/'))
+        fs.close()
+
+    def testRecoverFailedChanges(self):
+        # make changes that fail, one after doing part of its work
+        self.fs.touch('/somefile')
+        self.assertRaises(NotFoundError, self.fs.rm, '/nope')
+        self.assertRaises(FileAlreadyExistsError, self.fs.mkdir, '/somefile/b', True)
+        self.fs.mkdir('/a/b', True)
+        self.assertRaises(FileAlreadyExistsError, self.fs.mkdir, '/x/y/../../somefile/z', True)
+        self.assertRaises(ValueError, self.fs.write, '/somefile', b'x', -1)
+
+        # ensure they fail the same way again, leaving what they did
+        fs = self.recover()
+        self.assertListEqual(fs.ls(), ['somefile', 'a', 'x'])
+        self.assertEqual(fs.du('/'), (5, 1, 0))
+        fs.close()
+
+    def testRecoverContinues(self):
+        self.fs.touch('/a')
+        fs = self.recover()
+
+        # ensure the recovered filesystem carries on with the same log
+        fs.touch('/b')
+        fs.sync()
+        again = Filesystem.recover(self.wal)
+        self.assertListEqual(again.ls(), ['a', 'b'])
+        fs.close()
+        again.close()
+
+    def testRecoverTornTail(self):
+        self.fs.touch('/a')
+        self.fs.touch('/b')
+        self.fs.sync()
+
+        # tear the last record, as a crash mid-write would
+        with open(self.wal, 'r+b') as f:
+            f.truncate(os.path.getsize(self.wal) - 1)
+        fs = Filesystem.recover(self.wal)
+
+        # ensure the whole records are replayed and the torn one is dropped from the log
+        self.assertListEqual(fs.ls(), ['a'])
+        fs.touch('/c')
+        fs.sync()
+        again = Filesystem.recover(self.wal)
+        self.assertListEqual(again.ls(), ['a', 'c'])
+        fs.close()
+        again.close()
+
+    def testRecoverMissing(self):
+        fs = Filesystem.recover(os.path.join(self.tmp.name, 'new'))
+
+        # ensure a missing log starts empty
+        self.assertListEqual(fs.ls(), [])
+        fs.close()
+
+    def testExistingLog(self):
+        self.fs.touch('/a')
+        self.fs.sync()
+
+        # ensure a new filesystem won't start over an existing log
+        self.assertRaises(FileExistsError, Filesystem, wal=self.wal)
+
+    def testEmptyLog(self):
+        self.fs.close()
+        old = token(self.wal)
+
+        # ensure a log holding only its begin record is started over under a new token
+        self.fs = Filesystem(wal=self.wal)
+        self.assertNotEqual(token(self.wal), old)
+        self.fs.touch('/a')
+        fs = self.recover()
+        self.addCleanup(fs.close)
+        self.assertListEqual(fs.ls(), ['a'])
+
+    def testRestore(self):
+        snap = self.fs.snapshot()
+
+        # ensure restoring a snapshot is refused, as it couldn't be replayed
+        self.assertRaises(NotLoggableError, self.fs.restore, snap)
+
+    def testSnapshotNotLogged(self):
+        self.fs.touch('/a')
+        snap = self.fs.snapshot()
+        snap.cd('/')
+        self.fs.sync()
+
+        # ensure moving around a snapshot doesn't write to the log
+        fs = self.recover()
+        self.addCleanup(fs.close)
+        self.assertListEqual(fs.ls(), ['a'])
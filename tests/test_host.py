@@ -0,0 +1,89 @@
+import os
+import tempfile
+import unittest
+
+from lib.exceptions import DirectoryAlreadyExistsError, NotFoundError
+from lib.filesystem import Filesystem
+from lib.inode import InodeFilesystem
+
+
+class HostTests(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        self.fs = Filesystem()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.host = self.tmp.name
+
+        # a small fixture tree on the host
+        os.makedirs(os.path.join(self.host, 'src', 'a', 'b'))
+        os.makedirs(os.path.join(self.host, 'src', 'empty'))
+        for path, data in [('top.txt', b'Lorem ipsum'), ('a/one.bin', bytes(range(256)) * 10), ('a/b/two', b'')]:
+            with open(os.path.join(self.host, 'src', path), 'wb') as f:
+                f.write(data)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+        super().tearDown()
+
+    def testImport(self):
+        self.fs.import_tree(os.path.join(self.host, 'src'), '/fixtures/src')
+
+        # ensure the tree and contents came across
+        self.assertListEqual(self.fs.ls('/fixtures/src', sort=True), ['a', 'empty', 'top.txt'])
+        self.assertListEqual(self.fs.ls('/fixtures/src/a/b'), ['two'])
+        self.assertEqual(self.fs.read('/fixtures/src/top.txt'), b'Lorem ipsum')
+        self.assertEqual(self.fs.read('/fixtures/src/a/one.bin'), bytes(range(256)) * 10)
+        self.assertEqual(self.fs.du('/fixtures/src'), (4, 3, 2571))
+
+    def testImportWorkers(self):
+        self.fs.import_tree(os.path.join(self.host, 'src'), '/', workers=4)
+
+        # ensure threads read the same contents
+        self.assertEqual(self.fs.read('/a/one.bin'), bytes(range(256)) * 10)
+        self.assertEqual(self.fs.du('/'), (4, 3, 2571))
+
+    def testImportConflict(self):
+        self.fs.mkdir('/dest/top.txt', True)
+
+        # ensure a dir in the way of a file is an error
+        self.assertRaises(DirectoryAlreadyExistsError, self.fs.import_tree, os.path.join(self.host, 'src'), '/dest')
+
+    def testImportMissing(self):
+        self.assertRaises(FileNotFoundError, self.fs.import_tree, os.path.join(self.host, 'nope'), '/')
+
+    def testExport(self):
+        self.fs.import_tree(os.path.join(self.host, 'src'), '/src')
+        self.fs.append('/src/top.txt', ' dolor')
+        self.fs.export_tree('/src', os.path.join(self.host, 'out'), workers=2)
+
+        # ensure the host tree matches, including changes since the import
+        out = os.path.join(self.host, 'out')
+        self.assertListEqual(sorted(os.listdir(out)), ['a', 'empty', 'top.txt'])
+        with open(os.path.join(out, 'top.txt'), 'rb') as f:
+            self.assertEqual(f.read(), b'Lorem ipsum dolor')
+        with open(os.path.join(out, 'a', 'one.bin'), 'rb') as f:
+            self.assertEqual(f.read(), bytes(range(256)) * 10)
+        self.assertEqual(os.path.getsize(os.path.join(out, 'a', 'b', 'two')), 0)
+
+    def testExportFile(self):
+        self.fs.touch('/somefile')
+        self.fs.write('/somefile', 'Lorem ipsum')
+        self.fs.export_tree('/somefile', os.path.join(self.host, 'somefile'))
+
+        # ensure a single file is written as a file
+        with open(os.path.join(self.host, 'somefile'), 'rb') as f:
+            self.assertEqual(f.read(), b'Lorem ipsum')
+
+    def testExportMissing(self):
+        self.assertRaises(NotFoundError, self.fs.export_tree, '/nope', os.path.join(self.host, 'out'))
+
+
+class InodeHostTests(HostTests):
+
+    def setUp(self):
+        super().setUp()
+
+        self.fs = InodeFilesystem()
@@ -0,0 +1,117 @@
+import unittest
+
+from lib.directory import Directory
+from lib.file import File
+from lib.index import NameIndex, PathIndex, TrigramIndex
+
+
+class PathIndexTests(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        self.index = PathIndex()
+
+    def testDirsOnly(self):
+        d = Directory()
+        self.index.add('/foo', d)
+        self.index.add('/foo/bar', File())
+
+        # ensure only the dir is indexed
+        self.assertIs(self.index.get('/foo'), d)
+        self.assertIsNone(self.index.get('/foo/bar'))
+        self.assertEqual(len(self.index), 1)
+
+    def testRemove(self):
+        self.index.add('/foo', Directory())
+        self.index.remove('/foo', Directory())
+
+        # ensure removed
+        self.assertNotIn('/foo', self.index)
+
+    def testClear(self):
+        self.index.add('/foo', Directory())
+        self.index.clear()
+
+        # ensure empty
+        self.assertEqual(len(self.index), 0)
+
+
+class NameIndexTests(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        self.index = NameIndex()
+
+    def testPaths(self):
+        self.index.add('/foo', Directory())
+        self.index.add('/foo/bar', File())
+        self.index.add('/bar', File())
+
+        # ensure both bars
+        self.assertSetEqual(self.index.paths('bar'), {'/foo/bar', '/bar'})
+        self.assertSetEqual(self.index.paths('baz'), set())
+
+    def testRemove(self):
+        self.index.add('/foo/bar', File())
+        self.index.add('/bar', File())
+        self.index.remove('/bar', File())
+
+        # ensure one bar left
+        self.assertSetEqual(self.index.paths('bar'), {'/foo/bar'})
+
+        # ensure the name goes with the last path
+        self.index.remove('/foo/bar', File())
+        self.assertEqual(len(self.index), 0)
+
+    def testClear(self):
+        self.index.add('/foo/bar', File())
+        self.index.clear()
+
+        # ensure nothing is found
+        self.assertEqual(len(self.index), 0)
+        self.assertListEqual(self.index.names_containing('bar'), [])
+
+    def testNamesContaining(self):
+        for name in ['foobar', 'barbaz', 'binzip']:
+            self.index.add('/{}'.format(name), File())
+
+        # ensure substring matches
+        self.assertListEqual(sorted(self.index.names_containing('bar')), ['barbaz', 'foobar'])
+
+
+class TrigramIndexTests(NameIndexTests):
+
+    def setUp(self):
+        super().setUp()
+
+        self.index = TrigramIndex()
+
+    def testNamesContainingShort(self):
+        for name in ['foobar', 'barbaz', 'binzip']:
+            self.index.add('/{}'.format(name), File())
+
+        # ensure short queries still match
+        self.assertListEqual(sorted(self.index.names_containing('z')), ['barbaz', 'binzip'])
+
+    def testNamesContainingCandidatesChecked(self):
+        # every trigram of "abcab" is in "abcxbcab" but not the text itself
+        self.index.add('/abcxbcab', File())
+        self.index.add('/xabcabx', File())
+
+        # ensure only the real match
+        self.assertListEqual(self.index.names_containing('abcab'), ['xabcabx'])
+
+    def testPostingsRemoved(self):
+        self.index.add('/foobar', File())
+        self.index.add('/dir/foobar', File())
+        self.index.remove('/foobar', File())
+
+        # ensure postings stay while a path has the name
+        self.assertListEqual(self.index.names_containing('oba'), ['foobar'])
+
+        # ensure postings go with the last path
+        self.index.remove('/dir/foobar', File())
+        self.assertListEqual(self.index.names_containing('oba'), [])
+        self.assertDictEqual(self.index._grams, {})
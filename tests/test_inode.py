@@ -0,0 +1,71 @@
+from lib.inode import DIRECTORY, FILE, FREE, ROOT, InodeFilesystem
+from tests import test_filesystem
+
+
+# imported as a module so discovery doesn't run the Filesystem tests a second time
+class InodeFilesystemTest(test_filesystem.FilesystemTest):
+
+    def filesystem(self, **options) -> InodeFilesystem:
+        # there's no path cache to size
+        options.pop('cache_size', None)
+        return InodeFilesystem(**options)
+
+    def testColumns(self):
+        # create a dir and a file in it
+        self.fs.mkdir('/somedir')
+        self.fs.touch('/somedir/somefile')
+        self.fs.write('/somedir/somefile', b'Lorem ipsum')
+
+        # ensure every node is a row in the columns
+        self.assertEqual(len(self.fs), 3)
+        self.assertEqual(list(self.fs._kind), [DIRECTORY, DIRECTORY, FILE])
+        self.assertEqual(list(self.fs._parent), [-1, ROOT, 1])
+        self.assertEqual(self.fs._names, ['somedir', 'somefile'])
+        self.assertEqual(list(self.fs._bytes), [11, 11, 11])
+
+    def testNamesShared(self):
+        # create the same name in many dirs
+        for i in range(10):
+            self.fs.mkdir('/dir{}/somefile'.format(i), True)
+
+        # ensure the name is only kept once
+        self.assertEqual(self.fs._names.count('somefile'), 1)
+
+    def testInodeReuse(self):
+        # create a subtree and remove it
+        self.fs.mkdir('/somedir/child/grandchild', True)
+        self.fs.rm('/somedir', True)
+
+        # ensure its inodes are free
+        self.assertEqual(len(self.fs), 1)
+        self.assertEqual(list(self.fs._kind), [DIRECTORY, FREE, FREE, FREE])
+
+        # ensure new nodes reuse them rather than growing the columns
+        self.fs.mkdir('/other/child', True)
+        self.fs.touch('/other/child/somefile')
+        self.assertEqual(len(self.fs._kind), 4)
+        self.assertEqual(self.fs.find('somefile', recursive=True), ['/other/child/somefile'])
+
+    def testRemoveCwd(self):
+        # change into a subtree and remove it
+        self.fs.mkdir('/somedir/child', True)
+        self.fs.cd('/somedir/child')
+        self.fs.rm('/somedir', True)
+
+        # ensure the cwd moves up out of it, as its inodes may be reused
+        self.assertEqual(self.fs.pwd(), '/')
+        self.fs.mkdir('/other')
+        self.assertEqual(self.fs.ls(), ['other'])
+
+    def testCopyIntoItself(self):
+        # create a subtree and copy it below itself
+        self.fs.mkdir('/somedir/child', True)
+        self.fs.touch('/somedir/child/somefile')
+        self.fs.write('/somedir/child/somefile', b'Lorem ipsum')
+        self.fs.cp('/somedir', '/somedir/child/copy')
+
+        # ensure the copy is taken before it's attached
+        self.assertEqual(self.fs.ls('/somedir/child/copy/child'), ['somefile'])
+        self.assertFalse(self.fs.exists('/somedir/child/copy/child/copy'))
+        self.assertEqual(self.fs.du('/somedir'), (4, 2, 22))
+
@@ -0,0 +1,24 @@
+import unittest
+
+from lib.path import abspath, join
+
+
+class PathTests(unittest.TestCase):
+
+    def testJoin(self):
+        # ensure root and trailing slashes aren't doubled
+        self.assertEqual(join('/', 'foo'), '/foo')
+        self.assertEqual(join('/foo', 'bar'), '/foo/bar')
+        self.assertEqual(join('foo/', 'bar'), 'foo/bar')
+
+    def testAbspath(self):
+        cwd = ['foo', 'bar']
+
+        # ensure relative paths start from the cwd and absolute ones ignore it
+        self.assertEqual(abspath('baz', cwd), '/foo/bar/baz')
+        self.assertEqual(abspath('./baz/../qux', cwd), '/foo/bar/qux')
+        self.assertEqual(abspath('/baz', cwd), '/baz')
+
+        # ensure climbing stops at root and the cwd isn't changed
+        self.assertEqual(abspath('../../../..', cwd), '/')
+        self.assertListEqual(cwd, ['foo', 'bar'])
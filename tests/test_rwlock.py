@@ -0,0 +1,126 @@
+import threading
+import time
+import unittest
+
+from lib.rwlock import RWLock, reader, writer
+
+
+class Counter:
+    def __init__(self):
+        self._lock = RWLock()
+        self.value = 0
+
+    @reader
+    def get(self) -> int:
+        return self.value
+
+    @writer
+    def add(self, n: int) -> int:
+        self.value += n
+        # a writer can read
+        return self.get()
+
+    @reader
+    def upgrade(self):
+        self.add(1)
+
+
+class RWLockTests(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        self.lock = RWLock()
+
+    def hold(self, acquire, release, entered: threading.Event, leave: threading.Event) -> threading.Thread:
+        # hold the lock on another thread until told to let go
+        def run():
+            acquire()
+            entered.set()
+            leave.wait(5)
+            release()
+        thread = threading.Thread(target=run)
+        thread.start()
+        return thread
+
+    def testReadersShare(self):
+        entered, leave = threading.Event(), threading.Event()
+        thread = self.hold(self.lock.acquire_read, self.lock.release_read, entered, leave)
+        self.assertTrue(entered.wait(5))
+
+        # ensure a second reader gets in while the first holds it
+        done = threading.Event()
+        second = self.hold(self.lock.acquire_read, self.lock.release_read, done, leave)
+        self.assertTrue(done.wait(5))
+        leave.set()
+        thread.join()
+        second.join()
+
+    def testWriterExcludes(self):
+        entered, leave = threading.Event(), threading.Event()
+        thread = self.hold(self.lock.acquire_write, self.lock.release_write, entered, leave)
+        self.assertTrue(entered.wait(5))
+
+        # ensure neither readers nor writers get in until the writer is done
+        read, written = threading.Event(), threading.Event()
+        readers = [self.hold(self.lock.acquire_read, self.lock.release_read, read, leave),
+                   self.hold(self.lock.acquire_write, self.lock.release_write, written, leave)]
+        self.assertFalse(read.wait(0.05))
+        self.assertFalse(written.wait(0.05))
+        leave.set()
+        self.assertTrue(read.wait(5))
+        self.assertTrue(written.wait(5))
+        for t in [thread] + readers:
+            t.join()
+
+    def testWriterFirst(self):
+        entered, leave = threading.Event(), threading.Event()
+        thread = self.hold(self.lock.acquire_read, self.lock.release_read, entered, leave)
+        self.assertTrue(entered.wait(5))
+
+        # a writer waits for the reader
+        written, write_leave = threading.Event(), threading.Event()
+        waiting = self.hold(self.lock.acquire_write, self.lock.release_write, written, write_leave)
+        deadline = time.monotonic() + 5
+        while not self.lock._waiting and time.monotonic() < deadline:
+            time.sleep(0.001)
+
+        # ensure a new reader waits behind it rather than keeping it out
+        read = threading.Event()
+        late = self.hold(self.lock.acquire_read, self.lock.release_read, read, write_leave)
+        self.assertFalse(read.wait(0.05))
+        leave.set()
+        self.assertTrue(written.wait(5))
+        self.assertFalse(read.is_set())
+        write_leave.set()
+        self.assertTrue(read.wait(5))
+        for t in (thread, waiting, late):
+            t.join()
+
+    def testReentrant(self):
+        counter = Counter()
+
+        # ensure a writer can call readers and readers can nest
+        self.assertEqual(counter.add(2), 2)
+        self.lock = counter._lock
+        self.lock.acquire_read()
+        self.assertEqual(counter.get(), 2)
+        self.lock.release_read()
+        self.assertEqual(self.lock._readers, 0)
+        self.assertIsNone(self.lock._writer)
+
+    def testNoUpgrade(self):
+        counter = Counter()
+
+        # ensure a reader can't become a writer, and the lock is let go
+        self.assertRaises(RuntimeError, counter.upgrade)
+        self.assertEqual(counter._lock._readers, 0)
+        self.assertEqual(counter.add(1), 1)
+
+    def testNoLock(self):
+        counter = Counter()
+        counter._lock = None
+
+        # ensure without a lock the methods just run
+        self.assertEqual(counter.add(3), 3)
+        self.assertEqual(counter.get(), 3)
@@ -0,0 +1,64 @@
+import random
+import unittest
+
+from lib.sortedlist import SortedList
+
+
+class SmallSortedList(SortedList):
+    __slots__ = ()
+    LOAD = 4
+
+
+class SortedListTests(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        self.names = SortedList(['c', 'a', 'b'])
+
+    def testSorted(self):
+        self.assertListEqual(list(self.names), ['a', 'b', 'c'])
+        self.assertEqual(len(self.names), 3)
+
+    def testAddRemove(self):
+        self.names.add('aa')
+        self.names.remove('b')
+
+        # ensure the order is kept
+        self.assertListEqual(list(self.names), ['a', 'aa', 'c'])
+        self.assertEqual(len(self.names), 3)
+
+    def testRemoveMissing(self):
+        self.assertRaises(ValueError, self.names.remove, 'd')
+        self.assertRaises(ValueError, self.names.remove, 'bb')
+
+    def testRange(self):
+        self.names.add('ba')
+
+        # ensure ranges start after a name and stop at the end of a prefix
+        self.assertListEqual(list(self.names.irange('a')), ['b', 'ba', 'c'])
+        self.assertListEqual(list(self.names.irange('aa')), ['b', 'ba', 'c'])
+        self.assertListEqual(list(self.names.irange(prefix='b')), ['b', 'ba'])
+        self.assertListEqual(list(self.names.irange('b', 'b')), ['ba'])
+        self.assertListEqual(list(self.names.irange('a', 'c')), ['c'])
+        self.assertListEqual(list(self.names.irange('c')), [])
+
+    def testBlocks(self):
+        # use small blocks so they split and empty
+        self.names = SmallSortedList()
+        rand = random.Random(0)
+        expected = []
+        for _ in range(2000):
+            name = str(rand.randrange(500))
+            if name in expected:
+                self.names.remove(name)
+                expected.remove(name)
+            else:
+                self.names.add(name)
+                expected.append(name)
+
+        # ensure it matches sorting a plain list
+        expected.sort()
+        self.assertListEqual(list(self.names), expected)
+        self.assertEqual(len(self.names), len(expected))
+        self.assertListEqual(list(self.names.irange('250', '3')), [n for n in expected if n > '250' and n.startswith('3')])
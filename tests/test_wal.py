@@ -0,0 +1,133 @@
+import os
+import tempfile
+import time
+import unittest
+
+from lib.wal import BEGIN, WriteAheadLog, empty, encode, records, token
+
+
+class WriteAheadLogTests(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'wal')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+        super().tearDown()
+
+    def read(self) -> list:
+        with open(self.path, 'rb') as f:
+            return [(op, args, kwargs) for _, op, args, kwargs in records(f) if op != BEGIN]
+
+    def testRoundTrip(self):
+        log = WriteAheadLog(self.path)
+        log.log('write', ('/foo', b'\x00bar', 3), {})
+        log.log('mkdir', ('/a/b',), {'create_intermediate': True})
+        log.log('makedirs_many', (['/x', '/y'],), {})
+        log.log('ls', (None, False, 'é'), {})
+        log.close()
+
+        # ensure every value comes back as it went in
+        self.assertListEqual(self.read(), [
+            ('write', ['/foo', b'\x00bar', 3], {}),
+            ('mkdir', ['/a/b'], {'create_intermediate': True}),
+            ('makedirs_many', [['/x', '/y']], {}),
+            ('ls', [None, False, 'é'], {}),
+        ])
+
+    def testTornTail(self):
+        with open(self.path, 'wb') as f:
+            f.write(encode('touch', ('/a',), {}))
+            f.write(encode('touch', ('/b',), {})[:-1])
+
+        # ensure reading stops at the torn record
+        self.assertListEqual(self.read(), [('touch', ['/a'], {})])
+
+    def testCorrupt(self):
+        record = encode('touch', ('/b',), {})
+        record[-1] ^= 0xff
+        with open(self.path, 'wb') as f:
+            f.write(encode('touch', ('/a',), {}))
+            f.write(record)
+            f.write(encode('touch', ('/c',), {}))
+
+        # ensure reading stops at a record that fails its checksum
+        self.assertListEqual(self.read(), [('touch', ['/a'], {})])
+
+    def testSyncEachRecord(self):
+        log = WriteAheadLog(self.path, group_size=0)
+        for i in range(5):
+            log.log('touch', ('/f{}'.format(i),), {})
+
+        # ensure every record was synced on its own
+        self.assertEqual(log.syncs, 5)
+        self.assertEqual(len(self.read()), 5)
+        log.close()
+
+    def testGroupCommit(self):
+        log = WriteAheadLog(self.path, group_size=1024, group_delay=60)
+        for i in range(5):
+            log.log('touch', ('/f{}'.format(i),), {})
+
+        # ensure records wait for their group
+        self.assertEqual(log.syncs, 0)
+        self.assertListEqual(self.read(), [])
+
+        # ensure filling the group syncs it in one go
+        log.log('write', ('/f0', bytes(1024)), {})
+        self.assertEqual(log.syncs, 1)
+        self.assertEqual(len(self.read()), 6)
+        log.close()
+
+    def testGroupDelay(self):
+        log = WriteAheadLog(self.path, group_size=1024, group_delay=0.01)
+        log.log('touch', ('/a',), {})
+
+        # ensure a group that doesn't fill is synced once its delay is up
+        deadline = time.monotonic() + 5
+        while log.syncs == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(log.syncs, 1)
+        self.assertEqual(len(self.read()), 1)
+        log.close()
+
+    def testBegin(self):
+        log = WriteAheadLog(self.path)
+        log.log('touch', ('/a',), {})
+        log.close()
+
+        # ensure a new log starts with its token, which is kept when it's opened again
+        with open(self.path, 'rb') as f:
+            self.assertEqual(next(records(f))[1:3], (BEGIN, [log.token]))
+        self.assertEqual(token(self.path), log.token)
+        log = WriteAheadLog(self.path)
+        self.assertEqual(log.token, token(self.path))
+        log.close()
+        self.assertIsNone(token(os.path.join(self.tmp.name, 'missing')))
+
+    def testEmpty(self):
+        # ensure a missing log and one holding only its begin record are empty, and one with a change isn't
+        self.assertTrue(empty(self.path))
+        log = WriteAheadLog(self.path)
+        log.sync()
+        self.assertTrue(empty(self.path))
+        log.log('touch', ('/a',), {})
+        log.close()
+        self.assertFalse(empty(self.path))
+
+    def testReset(self):
+        log = WriteAheadLog(self.path, group_delay=60)
+        log.log('touch', ('/a',), {})
+        old = log.token
+        log.reset()
+        log.log('touch', ('/b',), {})
+        log.close()
+
+        # ensure a reset log holds only what came after it, under a new token
+        self.assertNotEqual(log.token, old)
+        self.assertEqual(token(self.path), log.token)
+        self.assertListEqual(self.read(), [('touch', ['/b'], {})])